@@ -0,0 +1,73 @@
+"""
+Vínculos cliente ↔ loja/rede em lote (POST /admin/clients/stores/bulk e /networks/bulk).
+
+Modos, para cada cliente da lista:
+- grant:  adiciona os ids que faltam
+- revoke: remove os ids informados
+- sync:   deixa exatamente os ids informados (adiciona os que faltam, remove o resto)
+
+Tudo numa transação: 1 SELECT dos vínculos atuais, diff em memória, INSERTs em lotes
+(executemany, ignorando conflito) e um DELETE por conjunto — em vez de 3–4 queries por par.
+"""
+from sqlalchemy import and_, delete, insert
+from sqlalchemy.orm import Session
+
+from app.catalog import bump_catalog_version, ACCESS_KEY
+
+ACCESS_MODES = ("grant", "revoke", "sync")
+ACCESS_BATCH_SIZE = 1000
+
+
+def _insert_ignoring_conflicts(db: Session, model):
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
+def apply_access(db: Session, model, target_col, client_ids: list[str], target_ids: list[str], mode: str) -> dict:
+    """Aplica o modo aos pares (cliente, alvo) e faz commit. Retorna as contagens."""
+    clients, targets = set(client_ids), set(target_ids)
+    target_name = target_col.key
+
+    current = set(
+        db.query(model.user_id, target_col).filter(model.user_id.in_(clients)).all()
+    )
+    wanted = {(c, t) for c in clients for t in targets}
+
+    if mode == "grant":
+        to_add, to_remove = wanted - current, set()
+    elif mode == "revoke":
+        to_add, to_remove = set(), wanted & current
+    else:  # sync
+        to_add, to_remove = wanted - current, current - wanted
+
+    rows = [{"user_id": c, target_name: t} for c, t in sorted(to_add)]
+    stmt = _insert_ignoring_conflicts(db, model)
+    for i in range(0, len(rows), ACCESS_BATCH_SIZE):
+        db.execute(stmt, rows[i:i + ACCESS_BATCH_SIZE])
+
+    if to_remove:
+        # o mesmo conjunto de alvos vale para todos os clientes: um DELETE só
+        cond = model.user_id.in_(clients)
+        if mode == "revoke":
+            cond = and_(cond, target_col.in_(targets))
+        elif targets:
+            cond = and_(cond, target_col.not_in(targets))
+        db.execute(delete(model).where(cond).execution_options(synchronize_session=False))
+
+    if to_add or to_remove:
+        bump_catalog_version(db, ACCESS_KEY)
+    db.commit()
+
+    return {
+        "mode": mode,
+        "clients": len(clients),
+        "added": len(to_add),
+        "removed": len(to_remove),
+        "unchanged": len(wanted & current) if mode != "revoke" else len(wanted - current),
+    }
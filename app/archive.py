@@ -0,0 +1,128 @@
+"""
+Arquivamento de tickets encerrados (hot/cold).
+
+Tickets CONCLUIDO/CANCELADO mais antigos que ARCHIVE_AFTER_DAYS são movidos,
+junto com ticket_updates e ticket_closures, para as tabelas *_archive.
+Cada lote é uma transação: se o job cair no meio, basta rodar de novo.
+
+Leitura com fallback para o arquivo: GET /tickets/{id}, /updates, /batch e /as-of. Não há rota
+de exportação no projeto; uma nova deve usar find_archived_ticket/list_archived_updates.
+
+Uso manual:
+    python -m app.archive [dias] [tamanho_do_lote]
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Ticket, TicketUpdate, TicketClosure, TicketSnapshot,
+    tickets_archive, ticket_updates_archive, ticket_closures_archive,
+)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVABLE_STATUSES = ("CONCLUIDO", "CANCELADO")
+
+# (tabela quente, tabela de arquivo, coluna com o id do ticket)
+# filhos antes do ticket: o DELETE respeita as FKs da tabela quente
+_MOVES = (
+    (TicketUpdate.__table__, ticket_updates_archive, "ticket_id"),
+    (TicketClosure.__table__, ticket_closures_archive, "ticket_id"),
+    (Ticket.__table__, tickets_archive, "id"),
+)
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move um lote de tickets encerrados antes de `cutoff`. Retorna quantos moveu."""
+    ids = db.execute(
+        select(Ticket.id)
+        .where(
+            Ticket.status.in_(ARCHIVABLE_STATUSES),
+            func.coalesce(Ticket.closed_at, Ticket.updated_at) < cutoff,
+        )
+        .order_by(Ticket.id)
+        .limit(batch_size)
+    ).scalars().all()
+
+    if not ids:
+        return 0
+
+    try:
+        # snapshots do replay são só cache: no arquivo o replay parte do zero
+        db.execute(delete(TicketSnapshot.__table__).where(TicketSnapshot.ticket_id.in_(ids)))
+        for hot, cold, key in _MOVES:
+            cols = [c.name for c in cold.columns]
+            db.execute(
+                insert(cold).from_select(
+                    cols,
+                    select(*[hot.c[name] for name in cols]).where(hot.c[key].in_(ids)),
+                )
+            )
+            db.execute(delete(hot).where(hot.c[key].in_(ids)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(ids)
+
+
+def archive_closed_tickets(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    size = batch_size or ARCHIVE_BATCH_SIZE
+
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(db, cutoff, size)
+        if not moved:
+            break
+        total += moved
+        batches += 1
+    return total
+
+
+# ---------- Leitura com fallback para o arquivo ----------
+def find_archived_ticket(db: Session, ticket_id: str):
+    return db.execute(select(tickets_archive).where(tickets_archive.c.id == ticket_id)).first()
+
+
+def find_archived_closure(db: Session, ticket_id: str):
+    return db.execute(
+        select(ticket_closures_archive).where(ticket_closures_archive.c.ticket_id == ticket_id)
+    ).first()
+
+
+def list_archived_updates(db: Session, ticket_id: str):
+    return db.execute(
+        select(ticket_updates_archive)
+        .where(ticket_updates_archive.c.ticket_id == ticket_id)
+        .order_by(ticket_updates_archive.c.created_at.asc())
+    ).all()
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    args = sys.argv[1:]
+    db = SessionLocal()
+    try:
+        n = archive_closed_tickets(
+            db,
+            older_than_days=int(args[0]) if len(args) > 0 else None,
+            batch_size=int(args[1]) if len(args) > 1 else None,
+        )
+        print(f"{n} chamados arquivados")
+    finally:
+        db.close()
@@ -0,0 +1,100 @@
+"""
+Anexos dos chamados (fotos antes/depois, documentos).
+
+Fluxo do upload (retomável, no estilo tus):
+1) POST /tickets/{id}/attachments        -> cria o anexo (UPLOADING) com nome, tipo e tamanho
+2) PATCH .../attachments/{aid}           -> envia um pedaço do arquivo; header Upload-Offset = bytes já confirmados
+3) HEAD  .../attachments/{aid}           -> consulta o Upload-Offset para retomar depois de uma queda
+Ao receber o último byte o anexo vira READY, entra na timeline (ATTACHMENT) e,
+se for imagem, um job gera miniatura e versão reduzida num pool de processos.
+
+Downloads: GET .../attachments/{aid}/content?variant=original|thumb|medium,
+com suporte a Range. Com ATTACHMENTS_ACCEL_PREFIX (nginx + X-Accel-Redirect)
+o arquivo sai por sendfile no proxy, sem passar pelo Python.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import TicketAttachment
+from app.storage import storage
+from app.thumbs import render_variants
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENTS_MAX_BYTES = int(os.getenv("ATTACHMENTS_MAX_BYTES", str(25 * 1024 * 1024)))
+ATTACHMENTS_CHUNK_BYTES = int(os.getenv("ATTACHMENTS_CHUNK_BYTES", str(1024 * 1024)))  # sugestão ao app
+ATTACHMENTS_THUMB_WORKERS = int(os.getenv("ATTACHMENTS_THUMB_WORKERS", "2"))
+ATTACHMENTS_THUMB_TIMEOUT = int(os.getenv("ATTACHMENTS_THUMB_TIMEOUT", "120"))
+ATTACHMENTS_ACCEL_PREFIX = os.getenv("ATTACHMENTS_ACCEL_PREFIX")  # ex.: /_protected/attachments
+
+UPLOAD_OFFSET_HEADER = "Upload-Offset"
+UPLOAD_LENGTH_HEADER = "Upload-Length"
+
+ATTACHMENT_KINDS = {"ANTES", "DEPOIS", "OUTRO"}
+ATTACHMENT_CONTENT_TYPES = {
+    "image/jpeg", "image/png", "image/webp", "image/heic",
+    "application/pdf",
+}
+IMAGE_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic"}
+
+# nome -> lado máximo em pixels
+VARIANTS = {"thumb": 320, "medium": 1600}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def storage_key(ticket_id: str, attachment_id: str) -> str:
+    return f"{ticket_id}/{attachment_id}"
+
+
+def variant_key(a: TicketAttachment, variant: str) -> str:
+    return a.storage_key if variant == "original" else f"{a.storage_key}.{variant}.jpg"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: o processo principal tem threads (jobs, despacho) e fork com threads pode travar
+        _pool = ProcessPoolExecutor(
+            max_workers=ATTACHMENTS_THUMB_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def build_variants(db: Session, attachment_id: str) -> None:
+    """Gera as miniaturas de um anexo READY (handler do job attachments.variants)."""
+    a = db.query(TicketAttachment).filter(TicketAttachment.id == attachment_id).first()
+    if not a or a.status != "READY" or a.variants_status != "PENDING":
+        return
+
+    src = storage.local_path(a.storage_key)
+    targets = {name: (storage.local_path(variant_key(a, name)), side) for name, side in VARIANTS.items()}
+    future = _get_pool().submit(render_variants, src, targets)
+    try:
+        a.width, a.height = future.result(timeout=ATTACHMENTS_THUMB_TIMEOUT)
+        a.variants_status = "READY"
+    except BrokenProcessPool:
+        # um filho morreu (OOM, kill): recria o pool e o job tenta de novo
+        shutdown_pool()
+        raise
+    except ImportError:
+        logger.warning("Pillow não instalado: anexo %s sem miniatura", a.id)
+        a.variants_status = "SKIPPED"
+    except Exception:
+        # imagem corrompida/formato não suportado não adianta repetir
+        logger.exception("falha ao gerar miniaturas do anexo %s", a.id)
+        a.variants_status = "FAILED"
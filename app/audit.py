@@ -0,0 +1,91 @@
+"""
+Consulta global da trilha de auditoria (ticket_updates) — GET /admin/audit.
+
+Índices que servem a consulta (sempre ordenada por created_at desc, id desc):
+- (created_by_user_id, created_at)  -> ?user_id=
+- (event_type, created_at)          -> ?event_type=
+- (created_at, id)                  -> só período / sem filtro
+- Postgres: GIN jsonb_path_ops em payload_json::jsonb -> ?payload.<campo>=<valor>
+  (no SQLite o filtro de payload cai em json_extract, sem índice)
+"""
+import json
+import logging
+import re
+
+from sqlalchemy import cast, func, literal, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+
+from app.models import TicketUpdate
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_PARAM_PREFIX = "payload."
+_PAYLOAD_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+
+# CONCURRENTLY: não trava escrita em ticket_updates enquanto o índice é criado.
+# Se o build falha no meio, o Postgres deixa o índice INVALID (existe, mas não é usado):
+# o IF NOT EXISTS pularia para sempre, então um inválido é apagado e criado de novo.
+_PG_AUDIT_INDEXES = {
+    "ix_ticket_updates_payload_gin":
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ticket_updates_payload_gin "
+        "ON ticket_updates USING gin ((payload_json::jsonb) jsonb_path_ops)",
+}
+
+_PG_INDEX_VALID_SQL = text(
+    "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+    "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+)
+
+
+def ensure_audit_indexes(engine: Engine) -> None:
+    """Índice GIN do payload no Postgres (sem efeito no SQLite)."""
+    if engine.dialect.name != "postgresql":
+        return
+    for name, ddl in _PG_AUDIT_INDEXES.items():
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                if conn.execute(_PG_INDEX_VALID_SQL, {"name": name}).scalar() is False:
+                    logger.warning("audit: índice %s inválido (build interrompido), recriando", name)
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                conn.execute(text(ddl))
+        except Exception:
+            # ex.: payload_json com texto que não é JSON; o filtro funciona, só sem índice
+            logger.warning("audit: índice %s não criado", name, exc_info=True)
+
+
+def payload_filters(query_params) -> dict:
+    """`?payload.to=CONCLUIDO&payload.tech_id=...` -> {"to": "CONCLUIDO", "tech_id": "..."}."""
+    out = {}
+    for key, value in query_params.multi_items():
+        if not key.startswith(PAYLOAD_PARAM_PREFIX):
+            continue
+        field = key[len(PAYLOAD_PARAM_PREFIX):]
+        if not _PAYLOAD_KEY.match(field):
+            raise ValueError(f"campo de payload inválido: {field!r}")
+        out[field] = _payload_value(value)
+    return out
+
+
+def _payload_value(raw: str):
+    # números/booleanos/null como no JSON gravado; o resto é texto
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return raw
+    return value if isinstance(value, (int, float, bool)) or value is None else raw
+
+
+def payload_match(dialect_name: str, filters: dict) -> list:
+    """Condições de filtro sobre payload_json para o dialeto do banco."""
+    if not filters:
+        return []
+    if dialect_name == "postgresql":
+        # @> com o objeto inteiro: uma condição só, servida pelo GIN jsonb_path_ops
+        expr = cast(TicketUpdate.payload_json, JSONB)
+        return [expr.op("@>")(cast(literal(json.dumps(filters)), JSONB))]
+    conds = []
+    for field, value in filters.items():
+        extracted = func.json_extract(TicketUpdate.payload_json, f"$.{field}")
+        conds.append(extracted.is_(None) if value is None else extracted == value)
+    return conds
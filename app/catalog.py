@@ -0,0 +1,156 @@
+"""
+Catálogo de lojas/redes em memória (id → nome, cnpj, ativo, rede, localização).
+
+- Carregado no startup; leituras não vão ao banco.
+- Escritas em lojas/redes incrementam `catalog_versions` na mesma transação
+  (bump_catalog_version) e atualizam o catálogo local (write-through).
+- Os outros workers conferem a versão no banco no máximo a cada
+  CATALOG_CHECK_SECONDS e recarregam se mudou.
+- Lojas com latitude/longitude também entram no índice espacial (app/geo.py).
+"""
+import os
+import threading
+import time
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models import CatalogVersion, Network, Store
+from app.geo import GeoGrid
+
+CATALOG_KEY = "catalog"
+ACCESS_KEY = "access"  # vínculos cliente ↔ loja/rede (escopo do CLIENT)
+CATALOG_CHECK_SECONDS = float(os.getenv("CATALOG_CHECK_SECONDS", "5"))
+
+
+class StoreEntry(NamedTuple):
+    id: str
+    name: str
+    cnpj: str
+    active: bool
+    network_id: Optional[str]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class NetworkEntry(NamedTuple):
+    id: str
+    name: str
+    active: bool
+
+
+_STORE_COLUMNS = (Store.id, Store.name, Store.cnpj, Store.active, Store.network_id, Store.latitude, Store.longitude)
+
+
+def _store_entry(s) -> StoreEntry:
+    return StoreEntry(s.id, s.name, s.cnpj, bool(s.active), s.network_id, s.latitude, s.longitude)
+
+
+def _network_entry(n) -> NetworkEntry:
+    return NetworkEntry(n.id, n.name, bool(n.active))
+
+
+def bump_catalog_version(db: Session, key: str = CATALOG_KEY) -> int:
+    """Incrementa a versão (antes do commit da escrita). Retorna a nova versão."""
+    db.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.name == key)
+        .values(version=CatalogVersion.version + 1)
+    )
+    return db.query(CatalogVersion.version).filter(CatalogVersion.name == key).scalar() or 0
+
+
+def catalog_versions(db: Session) -> dict[str, int]:
+    return dict(db.query(CatalogVersion.name, CatalogVersion.version).all())
+
+
+class Catalog:
+    def __init__(self):
+        self.stores: dict[str, StoreEntry] = {}
+        self.networks: dict[str, NetworkEntry] = {}
+        self.geo = GeoGrid()
+        self.version: Optional[int] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _db_version(self, db: Session) -> int:
+        return db.query(CatalogVersion.version).filter(CatalogVersion.name == CATALOG_KEY).scalar() or 0
+
+    def load(self, db: Session) -> None:
+        version = self._db_version(db)
+        stores = {
+            s.id: _store_entry(s)
+            for s in db.query(*_STORE_COLUMNS).all()
+        }
+        networks = {n.id: _network_entry(n) for n in db.query(Network.id, Network.name, Network.active).all()}
+        geo = GeoGrid()
+        for e in stores.values():
+            geo.upsert(e.id, e.latitude, e.longitude)
+        with self.lock:
+            self.stores, self.networks, self.geo = stores, networks, geo
+            self.version = version
+            self.checked_at = time.monotonic()
+
+    def refresh_if_stale(self, db: Session) -> None:
+        if self.version is not None and time.monotonic() - self.checked_at < CATALOG_CHECK_SECONDS:
+            return
+        if self._db_version(db) != self.version:
+            self.load(db)
+        else:
+            self.checked_at = time.monotonic()
+
+    # ---------- leitura ----------
+    def store(self, db: Session, store_id: str) -> Optional[StoreEntry]:
+        self.refresh_if_stale(db)
+        entry = self.stores.get(store_id)
+        if entry is None:
+            # loja criada por outro worker e ainda não vista aqui
+            row = db.query(*_STORE_COLUMNS).filter(Store.id == store_id).first()
+            if row:
+                entry = _store_entry(row)
+                with self.lock:
+                    self.stores[store_id] = entry
+                    self.geo.upsert(entry.id, entry.latitude, entry.longitude)
+        return entry
+
+    def store_name(self, db: Session, store_id: str) -> Optional[str]:
+        entry = self.store(db, store_id)
+        return entry.name if entry else None
+
+    def store_names(self, db: Session, store_ids: Iterable[str]) -> dict[str, str]:
+        out = {}
+        for sid in set(store_ids):
+            entry = self.store(db, sid)
+            if entry:
+                out[sid] = entry.name
+        return out
+
+    def nearby_stores(self, db: Session, lat: float, lon: float, radius_km: float) -> list[tuple[StoreEntry, float]]:
+        """Lojas ativas com localização dentro do raio, da mais perto para a mais longe."""
+        self.refresh_if_stale(db)
+        stores, geo = self.stores, self.geo
+        out = []
+        for store_id, km in geo.within(lat, lon, radius_km):
+            entry = stores.get(store_id)
+            if entry and entry.active:
+                out.append((entry, km))
+        return out
+
+    # ---------- write-through ----------
+    def written(self, new_version: int, stores=(), networks=()) -> None:
+        """Chamar depois do commit de uma escrita que fez bump_catalog_version."""
+        with self.lock:
+            if self.version is not None and new_version == self.version + 1:
+                for s in stores:
+                    entry = self.stores[s.id] = _store_entry(s)
+                    self.geo.upsert(entry.id, entry.latitude, entry.longitude)
+                for n in networks:
+                    self.networks[n.id] = _network_entry(n)
+                self.version = new_version
+            else:
+                # outro worker escreveu no meio: recarrega tudo na próxima leitura
+                self.version = None
+
+
+catalog = Catalog()
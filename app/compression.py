@@ -0,0 +1,89 @@
+"""
+Compressão de respostas.
+
+- gzip: sempre disponível (starlette GZipMiddleware)
+- brotli: usado quando o pacote `brotli` estiver instalado e o cliente aceitar `br`
+
+Respostas menores que COMPRESS_MIN_SIZE bytes não são comprimidas, nem as rotas de
+UNCOMPRESSED_PATHS (download de anexo: arquivo já comprimido, servido com Range —
+comprimir por cima quebraria os offsets).
+"""
+import os
+import re
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware as _StarletteGZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+UNCOMPRESSED_PATHS = re.compile(r"^/tickets/[^/]+/attachments/[^/]+/content$")
+
+
+def compressible(scope: Scope) -> bool:
+    return scope["type"] == "http" and not UNCOMPRESSED_PATHS.match(scope["path"])
+
+
+class BrotliMiddleware:
+    """
+    Comprime respostas não-streaming com brotli. Se não comprimir, a resposta
+    segue intacta (e o GZipMiddleware de fora pode comprimir com gzip).
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_SIZE, quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.quality = quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not compressible(scope) or brotli is None or "br" not in Headers(scope=scope).get("Accept-Encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        passthrough = False
+
+        async def send_br(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if message.get("more_body", False) or len(body) < self.minimum_size or "content-encoding" in headers:
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = brotli.compress(body, quality=self.quality)
+            headers["Content-Encoding"] = "br"
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_br)
+
+
+class GZipMiddleware(_StarletteGZipMiddleware):
+    """GZipMiddleware do starlette, respeitando UNCOMPRESSED_PATHS."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not compressible(scope):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
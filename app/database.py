@@ -1,21 +1,81 @@
 
 import os
+import time
+from fastapi import Request, Response
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
 
-# Compat: se vier sem +psycopg, ajusta automaticamente
-if DATABASE_URL and DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+# Depois de uma escrita, as leituras do mesmo cliente ficam no primário por N segundos
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+PRIMARY_STICKY_COOKIE = "primary_until"
+PRIMARY_STICKY_HEADER = "X-Primary-Until"
+
+
+def _normalize_url(url):
+    # Compat: se vier sem +psycopg, ajusta automaticamente
+    if url and url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
+
+DATABASE_URL = _normalize_url(DATABASE_URL)
+DATABASE_REPLICA_URL = _normalize_url(DATABASE_REPLICA_URL)
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Réplica de leitura (opcional). Sem DATABASE_REPLICA_URL, tudo vai para o primário.
+replica_engine = create_engine(DATABASE_REPLICA_URL, pool_pre_ping=True) if DATABASE_REPLICA_URL else engine
+ReplicaSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if DATABASE_REPLICA_URL else SessionLocal
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def _primary_sticky(request: Request) -> bool:
+    raw = request.cookies.get(PRIMARY_STICKY_COOKIE) or request.headers.get(PRIMARY_STICKY_HEADER)
+    if not raw:
+        return False
+    try:
+        return float(raw) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    """
+    Sessão para handlers GET somente leitura:
+    - réplica, se configurada
+    - primário, se o cliente escreveu há pouco (read-your-writes)
+    """
+    if ReplicaSessionLocal is SessionLocal or _primary_sticky(request):
+        db = SessionLocal()
+    else:
+        db = ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def read_source(db) -> str:
+    """"replica" ou "primary": de onde a sessão lê (entra na chave de caches de leitura)."""
+    return "replica" if db.get_bind() is replica_engine and replica_engine is not engine else "primary"
+
+
+def mark_primary_sticky(response: Response) -> None:
+    """Marca o cliente para ler do primário pelos próximos REPLICA_STICKY_SECONDS."""
+    until = f"{time.time() + REPLICA_STICKY_SECONDS:.3f}"
+    response.set_cookie(PRIMARY_STICKY_COOKIE, until, max_age=REPLICA_STICKY_SECONDS, httponly=True)
+    response.headers[PRIMARY_STICKY_HEADER] = until
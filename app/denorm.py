@@ -0,0 +1,157 @@
+"""
+Cópia de dados da loja no chamado: tickets.network_id e tickets.store_name.
+
+Com as duas colunas a listagem de chamados (filtro por rede, escopo do CLIENT por rede,
+nome da loja na resposta) não precisa do JOIN com stores: o filtro por rede e a
+ordenação por data saem do índice (network_id, opened_at).
+
+- create_ticket grava as duas colunas a partir do catálogo
+- PATCH /admin/stores/{id} que troca a rede reescreve tickets.network_id na mesma
+  transação (move_store_tickets: um UPDATE pelo índice de store_id) — a rede decide o
+  acesso do CLIENT, então não pode ficar para depois
+- troca de nome (e a rede no arquivo) vai para o job "tickets.store_denorm": reescreve os
+  chamados da loja em lotes de DENORM_BATCH_SIZE (um commit por lote), sempre com o valor
+  atual da loja — renomear duas vezes seguidas dá o mesmo resultado
+- chamados de antes dessas colunas (store_name nulo): job "tickets.denorm_backfill",
+  enfileirado na subida da API quando necessário, ou `python -m app.denorm backfill`.
+  Até lá network_id é nulo: ticket_network_id()/network_filter() caem na rede da loja
+
+Entre o commit do admin e o fim do job a listagem pode mostrar o nome antigo da loja.
+"""
+import os
+import sys
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Ticket, Store, tickets_archive
+
+DENORM_BATCH_SIZE = int(os.getenv("DENORM_BATCH_SIZE", "1000"))
+
+STORE_REWRITE_JOB = "tickets.store_denorm"
+BACKFILL_JOB = "tickets.denorm_backfill"
+
+# quentes primeiro; o arquivo também guarda as colunas (mesmo layout)
+_TABLES = (Ticket.__table__, tickets_archive)
+
+
+def ticket_network_id():
+    """Rede do chamado para o escopo do CLIENT: a cópia, ou a da loja se o backfill ainda não passou."""
+    store_network = select(Store.network_id).where(Store.id == Ticket.store_id).correlate(Ticket).scalar_subquery()
+    return func.coalesce(Ticket.network_id, store_network)
+
+
+def network_filter(network_id: str):
+    """Chamados da rede: pelo índice (network_id, opened_at), mais os ainda sem a cópia."""
+    return or_(
+        Ticket.network_id == network_id,
+        and_(
+            Ticket.network_id.is_(None),
+            Ticket.store_id.in_(select(Store.id).where(Store.network_id == network_id)),
+        ),
+    )
+
+
+def move_store_tickets(db: Session, store_id: str, network_id) -> None:
+    """Na transação que troca a rede da loja: os chamados (quentes) mudam de rede junto."""
+    db.execute(
+        update(Ticket)
+        .where(Ticket.store_id == store_id, Ticket.network_id.is_distinct_from(network_id))
+        .values(network_id=network_id)
+    )
+
+
+def rewrite_store_tickets(db: Session, store_id: str, batch_size: int = DENORM_BATCH_SIZE) -> int:
+    """Alinha store_name/network_id dos chamados da loja com a loja. Retorna quantos reescreveu."""
+    store = db.execute(select(Store.id, Store.name, Store.network_id).where(Store.id == store_id)).first()
+    if store is None:
+        return 0
+
+    total = 0
+    for table in _TABLES:
+        stale = (
+            select(table.c.id)
+            .where(
+                table.c.store_id == store.id,
+                or_(
+                    table.c.store_name.is_distinct_from(store.name),
+                    table.c.network_id.is_distinct_from(store.network_id),
+                ),
+            )
+            .limit(batch_size)
+        )
+        while True:
+            ids = db.execute(stale).scalars().all()
+            if not ids:
+                break
+            db.execute(
+                update(table)
+                .where(table.c.id.in_(ids))
+                .values(store_name=store.name, network_id=store.network_id)
+            )
+            db.commit()
+            total += len(ids)
+    return total
+
+
+def backfill(db: Session, batch_size: int = DENORM_BATCH_SIZE) -> int:
+    """Preenche as colunas dos chamados antigos (store_name nulo), em lotes."""
+    total = 0
+    for table in _TABLES:
+        while True:
+            rows = db.execute(
+                select(table.c.id, table.c.store_id)
+                .where(table.c.store_name.is_(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            by_store: dict[str, list[str]] = {}
+            for ticket_id, store_id in rows:
+                by_store.setdefault(store_id, []).append(ticket_id)
+            stores = {
+                s.id: s for s in db.query(Store.id, Store.name, Store.network_id).filter(Store.id.in_(list(by_store)))
+            }
+            for store_id, ids in by_store.items():
+                s = stores.get(store_id)
+                # loja apagada: marca com "" para o lote não voltar
+                db.execute(
+                    update(table)
+                    .where(table.c.id.in_(ids))
+                    .values(store_name=s.name if s else "", network_id=s.network_id if s else None)
+                )
+            db.commit()
+            total += len(rows)
+    return total
+
+
+def schedule_backfill() -> None:
+    """Na subida: enfileira o backfill se há chamado sem as colunas e o job ainda não está na fila."""
+    from app.database import SessionLocal
+    from app.jobs import enqueue
+    from app.models import Job
+
+    db = SessionLocal()
+    try:
+        if db.execute(select(Ticket.id).where(Ticket.store_name.is_(None)).limit(1)).first() is None:
+            return
+        if db.query(Job.id).filter(Job.type == BACKFILL_JOB, Job.status.in_(("PENDING", "RUNNING"))).first():
+            return
+        enqueue(db, BACKFILL_JOB)
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["backfill"]:
+        from app.database import SessionLocal
+
+        session = SessionLocal()
+        try:
+            print(f"{backfill(session)} chamados preenchidos")
+        finally:
+            session.close()
+    else:
+        print(__doc__)
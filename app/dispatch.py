@@ -0,0 +1,382 @@
+"""
+Despacho automático de chamados (opcional: DISPATCH_ENABLED=1).
+
+- Fila em memória dos chamados ABERTO sem técnico: URGENTE na frente,
+  mas um NORMAL antigo envelhece e passa a competir (DISPATCH_URGENT_HEAD_START_MINUTES).
+- Índice de carga dos técnicos ativos (ATRIBUIDO + EM_ATENDIMENTO).
+- Atribui em lotes, com o mesmo registro de auditoria do /assign (ASSIGN + STATUS_CHANGE),
+  em nome do usuário "sistema" (payload.auto = true) — não do técnico.
+- Roda em um worker só. A fila é reconstruída do banco no startup e a cada
+  DISPATCH_REBUILD_SECONDS; a cada ciclo ele também busca os chamados ABERTO alterados
+  desde o ciclo anterior, então o que foi criado/reaberto em outro worker entra em até
+  DISPATCH_INTERVAL_SECONDS.
+
+Simulação (sem banco real):
+    DATABASE_URL=sqlite:// python -m app.dispatch simulate [chamados] [tecnicos]
+"""
+import heapq
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import and_, func, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Ticket, User, ROLE_TECH
+from app.seed import system_user_id
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_ENABLED = os.getenv("DISPATCH_ENABLED", "0") == "1"
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "5"))
+DISPATCH_REBUILD_SECONDS = float(os.getenv("DISPATCH_REBUILD_SECONDS", "60"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "200"))
+DISPATCH_MAX_LOAD_PER_TECH = int(os.getenv("DISPATCH_MAX_LOAD_PER_TECH", "5"))
+DISPATCH_URGENT_HEAD_START_MINUTES = int(os.getenv("DISPATCH_URGENT_HEAD_START_MINUTES", "240"))
+
+ACTIVE_STATUSES = ("ATRIBUIDO", "EM_ATENDIMENTO")
+# margem do catch_up: updated_at é gravado antes do commit, que pode chegar depois do ciclo
+CATCH_UP_OVERLAP_SECONDS = 30
+
+
+def _ts(dt: Optional[datetime]) -> float:
+    if dt is None:
+        return time.time()
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)  # datetime.utcnow() / SQLite: naive em UTC
+    return dt.timestamp()
+
+
+class DispatchQueue:
+    """Estrutura pura (sem banco): heap de chamados + heap de técnicos por carga."""
+
+    def __init__(self, max_load: int = DISPATCH_MAX_LOAD_PER_TECH,
+                 urgent_head_start: float = DISPATCH_URGENT_HEAD_START_MINUTES * 60):
+        self.max_load = max_load
+        self.urgent_head_start = urgent_head_start
+        self._tickets: list[tuple[float, str]] = []
+        self._queued: dict[str, float] = {}  # ticket_id -> opened_ts
+        self._load: dict[str, int] = {}
+        self._techs: list[tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    # --- chamados ---
+    def push_ticket(self, ticket_id: str, priority: str, opened_ts: float) -> None:
+        if ticket_id in self._queued:
+            return
+        key = opened_ts - (self.urgent_head_start if priority == "URGENTE" else 0)
+        self._queued[ticket_id] = opened_ts
+        heapq.heappush(self._tickets, (key, ticket_id))
+
+    def discard_ticket(self, ticket_id: str) -> None:
+        # remoção preguiçosa: a entrada do heap é ignorada quando sair
+        self._queued.pop(ticket_id, None)
+
+    def clear_tickets(self) -> None:
+        self._tickets.clear()
+        self._queued.clear()
+
+    # --- técnicos ---
+    def set_techs(self, loads: dict[str, int]) -> None:
+        self._load = dict(loads)
+        self._techs = [(n, tid) for tid, n in self._load.items()]
+        heapq.heapify(self._techs)
+
+    def add_load(self, tech_id: str, delta: int) -> None:
+        if tech_id not in self._load:
+            return
+        self._load[tech_id] = max(0, self._load[tech_id] + delta)
+        heapq.heappush(self._techs, (self._load[tech_id], tech_id))
+
+    def loads(self) -> dict[str, int]:
+        return dict(self._load)
+
+    def _least_loaded(self) -> Optional[str]:
+        while self._techs:
+            n, tid = self._techs[0]
+            if self._load.get(tid) != n:
+                heapq.heappop(self._techs)  # entrada velha
+                continue
+            return tid if n < self.max_load else None
+        return None
+
+    # --- casamento ---
+    def match(self, limit: int) -> list[tuple[str, str, float]]:
+        """Retorna [(ticket_id, tech_id, opened_ts)] e já contabiliza a carga."""
+        out = []
+        while self._tickets and len(out) < limit:
+            tech_id = self._least_loaded()
+            if tech_id is None:
+                break
+            _, ticket_id = heapq.heappop(self._tickets)
+            opened = self._queued.pop(ticket_id, None)
+            if opened is None:
+                continue
+            self.add_load(tech_id, +1)
+            out.append((ticket_id, tech_id, opened))
+        return out
+
+
+class Dispatcher:
+    def __init__(self):
+        self.queue = DispatchQueue()
+        self.lock = threading.Lock()
+        self.last_rebuild = 0.0
+        self.last_catch_up: Optional[datetime] = None
+        self.assigned = 0
+        self.conflicts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- estado ----------
+    def rebuild(self, db: Session) -> None:
+        started = datetime.utcnow()
+        rows = (
+            db.query(Ticket.id, Ticket.priority, Ticket.opened_at)
+            .filter(Ticket.status == "ABERTO", Ticket.assigned_tech_id.is_(None))
+            .all()
+        )
+        with self.lock:
+            self.queue.clear_tickets()
+            for tid, priority, opened_at in rows:
+                self.queue.push_ticket(tid, priority, _ts(opened_at))
+            self.last_rebuild = time.time()
+        self.last_catch_up = started
+
+    def catch_up(self, db: Session) -> int:
+        """Chamados ABERTO alterados desde a última passada (criados/reabertos em outros workers)."""
+        now = datetime.utcnow()
+        q = db.query(Ticket.id, Ticket.priority, Ticket.opened_at).filter(
+            Ticket.status == "ABERTO", Ticket.assigned_tech_id.is_(None)
+        )
+        if self.last_catch_up is not None:
+            q = q.filter(Ticket.updated_at >= self.last_catch_up - timedelta(seconds=CATCH_UP_OVERLAP_SECONDS))
+        rows = q.all()
+        with self.lock:
+            for tid, priority, opened_at in rows:
+                self.queue.push_ticket(tid, priority, _ts(opened_at))
+        self.last_catch_up = now
+        return len(rows)
+
+    def enqueue(self, ticket: Ticket) -> None:
+        with self.lock:
+            self.queue.push_ticket(ticket.id, ticket.priority, _ts(ticket.opened_at))
+
+    def discard(self, ticket_id: str) -> None:
+        with self.lock:
+            self.queue.discard_ticket(ticket_id)
+
+    def _tech_loads(self, db: Session) -> dict[str, tuple[str, int]]:
+        rows = (
+            db.query(User.id, User.username, func.count(Ticket.id))
+            .outerjoin(
+                Ticket,
+                and_(Ticket.assigned_tech_id == User.id, Ticket.status.in_(ACTIVE_STATUSES)),
+            )
+            .filter(User.role == ROLE_TECH, User.active == True)
+            .group_by(User.id, User.username)
+            .all()
+        )
+        return {uid: (username, n) for uid, username, n in rows}
+
+    # ---------- ciclo ----------
+    def run_once(self, db: Session, batch_size: int = DISPATCH_BATCH_SIZE) -> int:
+        from app.routers.tickets import add_update  # evita import circular
+        from app.rollup import record_status_change
+        from app.queue_cache import touch as touch_queue
+
+        techs = self._tech_loads(db)
+        with self.lock:
+            self.queue.set_techs({tid: n for tid, (_, n) in techs.items()})
+            pairs = self.queue.match(batch_size)
+
+        if not pairs:
+            return 0
+
+        now = datetime.utcnow()
+        actor = system_user_id(db)
+        done = 0
+        info = {
+            r.id: r for r in db.query(Ticket.id, Ticket.store_id, Ticket.type, Ticket.priority)
+            .filter(Ticket.id.in_([p[0] for p in pairs]))
+        }
+        for ticket_id, tech_id, opened_ts in pairs:
+            res = db.execute(
+                update(Ticket)
+                .where(
+                    Ticket.id == ticket_id,
+                    Ticket.status == "ABERTO",
+                    Ticket.assigned_tech_id.is_(None),
+                )
+                .values(
+                    assigned_tech_id=tech_id, status="ATRIBUIDO", assigned_at=now, updated_at=now,
+                    # SLA: sai do prazo de atribuição e entra no de conclusão (ver app/sla.py)
+                    sla_due_at=Ticket.sla_close_due_at, sla_kind="CLOSE",
+                    version=Ticket.version + 1,
+                )
+            )
+            if res.rowcount != 1:
+                # alguém assumiu antes (ou mudou de status): devolve a carga
+                self.conflicts += 1
+                with self.lock:
+                    self.queue.add_load(tech_id, -1)
+                continue
+
+            add_update(
+                db, ticket_id, actor, "ASSIGN",
+                note="Atribuído automaticamente",
+                payload={"username": techs[tech_id][0], "tech_id": tech_id, "auto": True},
+            )
+            add_update(db, ticket_id, actor, "STATUS_CHANGE", payload={"from": "ABERTO", "to": "ATRIBUIDO", "auto": True})
+            row = info[ticket_id]
+            assigned = SimpleNamespace(
+                id=ticket_id, status="ATRIBUIDO", store_id=row.store_id,
+                assigned_tech_id=tech_id, type=row.type, priority=row.priority,
+            )
+            record_status_change(db, assigned, "ABERTO", now)
+            touch_queue(db, assigned, "ABERTO")
+
+            wait = max(0.0, time.time() - opened_ts)
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            done += 1
+
+        db.commit()
+        self.assigned += done
+        return done
+
+    @property
+    def running(self) -> bool:
+        """Só o worker com o lock "dispatch" (e DISPATCH_ENABLED) tem a thread — e a fila em memória."""
+        return bool(self._thread and self._thread.is_alive())
+
+    def status(self) -> dict:
+        with self.lock:
+            queued = len(self.queue)
+            loads = self.queue.loads()
+        return {
+            "enabled": DISPATCH_ENABLED,
+            "running": self.running,
+            "queued": queued,
+            "tech_loads": loads,
+            "assigned": self.assigned,
+            "conflicts": self.conflicts,
+            "avg_wait_seconds": (self.wait_total / self.assigned) if self.assigned else None,
+            "max_wait_seconds": self.wait_max if self.assigned else None,
+        }
+
+    # ---------- thread ----------
+    def _loop(self) -> None:
+        while not self._stop.wait(DISPATCH_INTERVAL_SECONDS):
+            db = SessionLocal()
+            try:
+                if time.time() - self.last_rebuild >= DISPATCH_REBUILD_SECONDS:
+                    self.rebuild(db)
+                else:
+                    self.catch_up(db)
+                self.run_once(db)
+            except Exception:
+                db.rollback()
+                logger.exception("dispatch: falha no ciclo")
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        db = SessionLocal()
+        try:
+            self.rebuild(db)
+        finally:
+            db.close()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=DISPATCH_INTERVAL_SECONDS + 1)
+
+
+dispatcher = Dispatcher()
+
+
+# ---------- Simulação ----------
+def simulate(n_tickets: int = 5000, n_techs: int = 50, seed: int = 42) -> dict:
+    """
+    Chegadas de chamados (10% URGENTE) e atendimento com duração aleatória,
+    com ciclos de despacho a cada DISPATCH_INTERVAL_SECONDS. Mede espera na fila
+    (tempo simulado) e a vazão do casamento (tempo real).
+    """
+    rnd = random.Random(seed)
+    q = DispatchQueue()
+    techs = {f"tech-{i}": 0 for i in range(n_techs)}
+    q.set_techs(techs)
+
+    step = DISPATCH_INTERVAL_SECONDS
+    arrivals = sorted(rnd.uniform(0, n_tickets * 2.0) for _ in range(n_tickets))
+    prio = {f"t-{i}": ("URGENTE" if rnd.random() < 0.1 else "NORMAL") for i in range(n_tickets)}
+    finishing: list[tuple[float, str]] = []
+
+    waits = {"URGENTE": [], "NORMAL": []}
+    match_time = 0.0
+    matched = 0
+    now = 0.0
+    i = 0
+    while matched < n_tickets:
+        while i < n_tickets and arrivals[i] <= now:
+            q.push_ticket(f"t-{i}", prio[f"t-{i}"], arrivals[i])
+            i += 1
+        while finishing and finishing[0][0] <= now:
+            _, tech = heapq.heappop(finishing)
+            q.add_load(tech, -1)
+
+        t0 = time.perf_counter()
+        pairs = q.match(DISPATCH_BATCH_SIZE)
+        match_time += time.perf_counter() - t0
+
+        for ticket_id, tech, opened in pairs:
+            waits[prio[ticket_id]].append(now - opened)
+            heapq.heappush(finishing, (now + rnd.expovariate(1 / 600.0), tech))
+        matched += len(pairs)
+        now += step
+
+    def pct(xs, p):
+        xs = sorted(xs)
+        return round(xs[min(len(xs) - 1, int(p * len(xs)))], 1) if xs else None
+
+    return {
+        "tickets": n_tickets,
+        "techs": n_techs,
+        "matches_per_second": round(matched / match_time) if match_time else None,
+        "wait_seconds": {
+            p: {"p50": pct(w, 0.5), "p95": pct(w, 0.95), "max": pct(w, 1.0)}
+            for p, w in waits.items()
+        },
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "simulate":
+        import json
+        print(json.dumps(simulate(*(int(a) for a in args[1:3])), indent=2))
+    else:
+        db = SessionLocal()
+        try:
+            dispatcher.rebuild(db)
+            print(f"{dispatcher.run_once(db)} chamados atribuídos")
+        finally:
+            db.close()
@@ -0,0 +1,56 @@
+"""
+GET condicional (ETag / If-None-Match → 304) para as listagens do catálogo.
+
+O ETag sai das versões em `catalog_versions` (uma leitura por PK), então o 304
+é respondido sem rodar a query da listagem. Para CLIENT o ETag inclui o usuário
+e a versão dos vínculos de acesso.
+
+Cache-Control: a resposta da equipe (TECH/ADMIN) é a mesma para todos, então vai
+`public` (CDN/proxy pode guardar, revalidando sempre; Vary: Authorization). A de
+CLIENT depende do usuário e fica `private`.
+
+etag_matches também serve ao If-Match das escritas em chamados (ETag = Ticket.version).
+"""
+import hashlib
+import os
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from app.catalog import catalog_versions, CATALOG_KEY, ACCESS_KEY
+from app.models import User, ROLE_CLIENT
+
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "0"))
+CATALOG_CACHE_CONTROL = f"public, max-age={CATALOG_MAX_AGE}, must-revalidate"
+CLIENT_CACHE_CONTROL = f"private, max-age={CATALOG_MAX_AGE}, must-revalidate"
+
+
+def catalog_etag(db: Session, user: User, *parts) -> str:
+    versions = catalog_versions(db)
+    if user.role == ROLE_CLIENT:
+        scope = ("client", user.id, versions.get(ACCESS_KEY, 0))
+    else:
+        scope = ("staff",)
+    raw = "|".join(str(p) for p in (versions.get(CATALOG_KEY, 0), *scope, *parts))
+    return 'W/"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def cache_headers(etag: str, user: User) -> dict:
+    cache_control = CLIENT_CACHE_CONTROL if user.role == ROLE_CLIENT else CATALOG_CACHE_CONTROL
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Authorization"}
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """`header` = valor de If-None-Match/If-Match (lista separada por vírgula ou *)."""
+    tags = {t.strip() for t in header.split(",")}
+    # comparação fraca: ignora o prefixo W/
+    return "*" in tags or etag.removeprefix("W/") in {t.removeprefix("W/") for t in tags}
+
+
+def not_modified(request: Request, etag: str, user: User) -> Response | None:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return None
+    if etag_matches(inm, etag):
+        return Response(status_code=304, headers=cache_headers(etag, user))
+    return None
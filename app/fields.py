@@ -0,0 +1,29 @@
+"""
+Sparse fieldsets: `?fields=id,status,store_name`.
+
+A projeção vai até o SELECT (só as colunas pedidas são lidas do banco);
+a resposta sai como JSON simples, sem passar pelo response_model completo.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+
+
+def parse_fields(raw: Optional[str], allowed: Iterable[str], required: Iterable[str] = ("id",)) -> Optional[list[str]]:
+    if not raw:
+        return None
+    allowed = set(allowed)
+    wanted = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"fields inválidos: {', '.join(unknown)}")
+    return list(dict.fromkeys([*required, *wanted]))
+
+
+def _json_value(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def project(row, fields: list[str]) -> dict:
+    return {f: _json_value(getattr(row, f)) for f in fields}
@@ -0,0 +1,171 @@
+"""
+Localização das lojas: índice espacial em memória e ordem de rota.
+
+- GeoGrid: grade de células de GEO_CELL_DEGREES graus (padrão 0.1° ≈ 11 km). Busca por raio
+  olha só as células que cobrem o círculo e calcula a distância (haversine) dos candidatos.
+  Mantido pelo catálogo (app/catalog.py): reconstruído no load e atualizado loja a loja
+  nas escritas do admin.
+- route_order: sequência de visita (vizinho mais próximo + 2-opt), para poucas dezenas de pontos.
+
+Benchmark: python -m app.geo bench [lojas] [consultas]
+"""
+import math
+import os
+import random
+import sys
+import threading
+import time
+from typing import Optional
+
+GEO_CELL_DEGREES = float(os.getenv("GEO_CELL_DEGREES", "0.1"))
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoGrid:
+    def __init__(self, cell: float = GEO_CELL_DEGREES):
+        self.cell = cell
+        self.lock = threading.Lock()
+        self._cells: dict[tuple[int, int], dict[str, tuple[float, float]]] = {}
+        self._where: dict[str, tuple[int, int]] = {}
+
+    def _key(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def upsert(self, item_id: str, lat: Optional[float], lon: Optional[float]) -> None:
+        with self.lock:
+            self._remove(item_id)
+            if lat is None or lon is None:
+                return
+            key = self._key(lat, lon)
+            self._cells.setdefault(key, {})[item_id] = (lat, lon)
+            self._where[item_id] = key
+
+    def remove(self, item_id: str) -> None:
+        with self.lock:
+            self._remove(item_id)
+
+    def _remove(self, item_id: str) -> None:
+        key = self._where.pop(item_id, None)
+        if key is not None:
+            bucket = self._cells.get(key)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self._cells[key]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list[tuple[str, float]]:
+        """[(id, km)] dentro do raio, do mais perto para o mais longe."""
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        # perto dos polos cos→0: limita para não varrer o mundo inteiro
+        dlon = min(180.0, radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01)))
+        (i0, j0), (i1, j1) = self._key(lat - dlat, lon - dlon), self._key(lat + dlat, lon + dlon)
+        out = []
+        with self.lock:
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+                buckets = [b for (i, j), b in self._cells.items() if i0 <= i <= i1 and j0 <= j <= j1]
+            else:
+                buckets = [b for b in (self._cells.get((i, j)) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)) if b]
+            candidates = [(item_id, p) for b in buckets for item_id, p in b.items()]
+        for item_id, (plat, plon) in candidates:
+            # pré-filtro barato pela caixa antes do haversine
+            if abs(plat - lat) > dlat:
+                continue
+            km = haversine_km(lat, lon, plat, plon)
+            if km <= radius_km:
+                out.append((item_id, km))
+        out.sort(key=lambda x: x[1])
+        return out
+
+
+# ---------- rota ----------
+def path_km(start: tuple[float, float], points: list[tuple[float, float]], order: list[int]) -> float:
+    total, cur = 0.0, start
+    for i in order:
+        total += haversine_km(cur[0], cur[1], points[i][0], points[i][1])
+        cur = points[i]
+    return total
+
+
+def route_order(start: tuple[float, float], points: list[tuple[float, float]], max_passes: int = 20) -> list[int]:
+    """Índices de `points` na ordem de visita a partir de `start` (caminho aberto, sem volta)."""
+    n = len(points)
+    if n <= 1:
+        return list(range(n))
+
+    # vizinho mais próximo
+    left = set(range(n))
+    order, cur = [], start
+    while left:
+        nxt = min(left, key=lambda i: haversine_km(cur[0], cur[1], points[i][0], points[i][1]))
+        order.append(nxt)
+        left.remove(nxt)
+        cur = points[nxt]
+
+    # 2-opt: inverte trechos enquanto encurtar o caminho
+    def node(k):
+        return start if k < 0 else points[order[k]]
+
+    def d(a, b):
+        return haversine_km(a[0], a[1], b[0], b[1])
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                a, b = node(i - 1), node(i)
+                c = node(j)
+                e = node(j + 1) if j + 1 < n else None
+                before = d(a, b) + (d(c, e) if e else 0.0)
+                after = d(a, c) + (d(b, e) if e else 0.0)
+                if after + 1e-9 < before:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+# ---------- benchmark ----------
+def bench(stores: int = 50_000, queries: int = 2_000, radius_km: float = 15.0) -> dict:
+    """Lojas aleatórias no Sudeste; tempo médio/p99 de within() no raio."""
+    rnd = random.Random(42)
+    grid = GeoGrid()
+    t0 = time.perf_counter()
+    for i in range(stores):
+        grid.upsert(str(i), rnd.uniform(-25.0, -19.0), rnd.uniform(-48.0, -40.0))
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    times, found = [], 0
+    for _ in range(queries):
+        lat, lon = rnd.uniform(-25.0, -19.0), rnd.uniform(-48.0, -40.0)
+        t = time.perf_counter()
+        found += len(grid.within(lat, lon, radius_km))
+        times.append((time.perf_counter() - t) * 1000)
+    times.sort()
+    return {
+        "stores": stores,
+        "radius_km": radius_km,
+        "build_ms": round(build_ms, 1),
+        "avg_ms": round(sum(times) / len(times), 3),
+        "p99_ms": round(times[int(len(times) * 0.99)], 3),
+        "avg_results": round(found / queries, 1),
+    }
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["bench"]:
+        args = sys.argv[2:]
+        print(bench(int(args[0]) if args else 50_000, int(args[1]) if len(args) > 1 else 2_000))
+    else:
+        print(__doc__)
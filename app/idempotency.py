@@ -0,0 +1,261 @@
+"""
+Idempotency-Key para escritas (POST/PUT/PATCH/DELETE).
+
+- Primeira execução: grava a chave como IN_PROGRESS, executa e guarda a resposta (2xx).
+- Retry com a mesma chave: devolve a resposta guardada (header Idempotent-Replayed: true)
+  sem tocar no handler.
+- Retry concorrente: espera a primeira terminar (até IDEMPOTENCY_WAIT_SECONDS).
+- Mesma chave com outro método/rota/corpo: 422.
+- Falha (não-2xx) libera a chave para nova tentativa.
+- Chaves expiram após IDEMPOTENCY_TTL_HOURS (limpeza periódica).
+
+Registrado por dentro da compressão: guarda o corpo sem compressão e todos os headers
+da resposta (ETag, X-Next-Cursor...); o replay passa pelo gzip/brotli como uma resposta normal.
+Middleware ASGI puro (como BrotliMiddleware): o que não tem Idempotency-Key passa direto,
+e a resposta chega à compressão numa mensagem só, com Content-Length.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+from app.security import decode_token
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# IN_PROGRESS mais velho que isso é de um worker que morreu: pode ser assumido
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+CLEANUP_EVERY_SECONDS = 600
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+_last_cleanup = 0.0
+
+
+def _user_scope(headers: Headers):
+    auth = headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return None
+    try:
+        return decode_token(auth[7:]).get("uid")
+    except ValueError:
+        return None
+
+
+# ---------- operações no banco (síncronas, rodam no threadpool) ----------
+def _claim(key: str, method: str, path: str, request_hash: str):
+    """Tenta registrar a chave. Retorna None se conseguiu, ou a linha existente."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.add(IdempotencyKey(
+            key=key, method=method, path=path, request_hash=request_hash,
+            state="IN_PROGRESS", created_at=now,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        ))
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            db.rollback()
+
+        row = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if row and row.state == "IN_PROGRESS":
+            created = row.created_at.replace(tzinfo=None) if row.created_at else now
+            if (now - created).total_seconds() > IDEMPOTENCY_LOCK_SECONDS:
+                # dono sumiu: assume a chave
+                row.created_at = now
+                db.commit()
+                return None
+        if row:
+            db.expunge(row)
+        return row
+    finally:
+        db.close()
+
+
+def _load(key: str):
+    db = SessionLocal()
+    try:
+        row = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if row:
+            db.expunge(row)
+        return row
+    finally:
+        db.close()
+
+
+def _finish(key: str, status: int, body: bytes, headers: list[tuple[str, str]]) -> None:
+    db = SessionLocal()
+    try:
+        row = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if row:
+            row.state = "DONE"
+            row.response_status = status
+            row.response_body = body
+            row.content_type = next((v for k, v in headers if k == "content-type"), None)
+            row.response_headers = json.dumps(headers)
+            db.commit()
+    finally:
+        db.close()
+
+
+def _release(key: str) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        db.commit()
+    finally:
+        db.close()
+
+
+def cleanup_expired() -> int:
+    db = SessionLocal()
+    try:
+        n = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())).rowcount
+        db.commit()
+        return n
+    finally:
+        db.close()
+
+
+# ---------- middleware ----------
+def _stored_headers(raw_headers: list[tuple[bytes, bytes]]) -> list[tuple[str, str]]:
+    return [
+        (k.decode("latin-1").lower(), v.decode("latin-1"))
+        for k, v in raw_headers
+        if k.lower() != b"content-length"
+    ]
+
+
+def _replay(row: IdempotencyKey) -> Response:
+    out = Response(content=row.response_body or b"", status_code=row.response_status or 200)
+    if row.response_headers:
+        stored = [(k, v) for k, v in json.loads(row.response_headers)]
+    else:  # chave gravada antes de response_headers existir
+        stored = [("content-type", row.content_type)] if row.content_type else []
+    # raw_headers do Response já tem o content-length do corpo guardado
+    out.raw_headers += [(k.encode("latin-1"), v.encode("latin-1")) for k, v in stored]
+    out.headers["Idempotent-Replayed"] = "true"
+    return out
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break  # cliente desconectou
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _last_cleanup
+
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        raw_key = headers.get(IDEMPOTENCY_HEADER)
+        uid = _user_scope(headers) if raw_key else None
+        if not uid:
+            # sem chave, ou sem usuário válido (o handler devolve 401)
+            await self.app(scope, receive, send)
+            return
+
+        if time.monotonic() - _last_cleanup > CLEANUP_EVERY_SECONDS:
+            _last_cleanup = time.monotonic()
+            await run_in_threadpool(cleanup_expired)
+
+        key = f"{uid}:{raw_key[:200]}"
+        method, path = scope["method"], scope["path"]
+        body = await _read_body(receive)
+        request_hash = hashlib.sha256(body).hexdigest()
+
+        while True:
+            existing = await run_in_threadpool(_claim, key, method, path, request_hash)
+            if existing is None:
+                break
+            if (existing.method, existing.path, existing.request_hash) != (method, path, request_hash):
+                response = JSONResponse(
+                    status_code=422,
+                    content={"detail": "Idempotency-Key já usada em outra requisição"},
+                )
+                await response(scope, receive, send)
+                return
+
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+            while existing is not None and existing.state == "IN_PROGRESS" and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                existing = await run_in_threadpool(_load, key)
+
+            if existing is None:
+                continue  # a primeira tentativa falhou e liberou a chave: quem chega agora executa
+            if existing.state != "DONE":
+                response = JSONResponse(
+                    status_code=409,
+                    content={"detail": "Requisição com esta Idempotency-Key ainda em processamento"},
+                )
+            else:
+                response = _replay(existing)
+            await response(scope, receive, send)
+            return
+
+        await self._execute(scope, receive, send, key, body)
+
+    async def _execute(self, scope: Scope, receive: Receive, send: Send, key: str, body: bytes) -> None:
+        body_sent = False
+
+        async def receive_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start: Message = {}
+        chunks: list[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive_body, capture)
+        except Exception:
+            await run_in_threadpool(_release, key)
+            raise
+
+        status = start.get("status", 500)
+        content = b"".join(chunks)
+        raw_headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+        if 200 <= status < 300:
+            await run_in_threadpool(_finish, key, status, content, _stored_headers(raw_headers))
+        else:
+            await run_in_threadpool(_release, key)
+
+        raw_headers.append((b"content-length", str(len(content)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": content})
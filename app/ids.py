@@ -0,0 +1,144 @@
+"""
+Ids dos registros: UUIDv7 (RFC 9562) em texto.
+
+UUIDv7 começa pelo timestamp em ms, então ids novos caem sempre no fim do
+índice B-tree (em vez de espalhados como no uuid4): menos page splits e
+índices de tickets/ticket_updates mais compactos e "quentes" no cache.
+
+Colunas de id usam o tipo UUIDStr: String em todo lugar e, no Postgres com
+DB_NATIVE_UUID=1, a coluna nativa UUID (16 bytes). O valor no Python/API
+continua sendo a string "xxxxxxxx-xxxx-...". Para converter um banco existente:
+    python -m app.migrate uuid      # depois: DB_NATIVE_UUID=1 e reiniciar
+
+Benchmark de inserção/tamanho de índice (uuid4 texto x uuid7 texto x uuid7 nativo):
+    python -m app.ids bench [linhas]
+"""
+import os
+import secrets
+import sys
+import threading
+import time
+import uuid
+
+from sqlalchemy import String
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.types import TypeDecorator
+
+DB_NATIVE_UUID = os.getenv("DB_NATIVE_UUID", "0") == "1"
+_NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+_lock = threading.Lock()
+_last_ms = 0
+_seq = 0
+
+
+def uuid7() -> uuid.UUID:
+    """UUIDv7 monotônico no processo: contador de 12 bits (rand_a) dentro do mesmo ms."""
+    global _last_ms, _seq
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _seq = secrets.randbits(11)  # começa na metade de baixo: sobra espaço para incrementar
+        else:
+            _seq += 1
+            if _seq > 0xFFF:
+                # estourou o contador no mesmo ms: empresta o próximo ms
+                _last_ms += 1
+                _seq = secrets.randbits(11)
+        ms, seq = _last_ms, _seq
+
+    value = (ms & (2**48 - 1)) << 80
+    value |= 0x7 << 76
+    value |= seq << 64
+    value |= 0b10 << 62
+    value |= secrets.randbits(62)
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    return str(uuid7())
+
+
+class UUIDStr(TypeDecorator):
+    """Id em texto na aplicação; UUID nativo no Postgres quando DB_NATIVE_UUID=1."""
+
+    impl = String
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return str
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql" and DB_NATIVE_UUID:
+            return dialect.type_descriptor(PG_UUID(as_uuid=False))
+        return dialect.type_descriptor(String())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not (dialect.name == "postgresql" and DB_NATIVE_UUID):
+            return value
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            # id malformado vindo da URL: compara com o uuid nulo (não existe) -> 404, e não erro 500 do cast
+            return _NIL_UUID
+
+
+# ---------- Benchmark ----------
+def bench(rows: int = 200_000, batch: int = 5_000) -> list[dict]:
+    """Insere `rows` linhas em tabelas temporárias e mede tempo e tamanho do índice da PK."""
+    from sqlalchemy import text
+    from app.database import engine
+
+    pg = engine.dialect.name == "postgresql"
+    variants = [("uuid4_text", "text", lambda: str(uuid.uuid4())), ("uuid7_text", "text", new_id)]
+    if pg:
+        variants.append(("uuid7_native", "uuid", new_id))
+
+    out = []
+    for name, col_type, gen in variants:
+        table = f"bench_ids_{name}"
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            conn.execute(text(f"CREATE TABLE {table} (id {col_type} PRIMARY KEY, payload text)"))
+
+        start = time.perf_counter()
+        for i in range(0, rows, batch):
+            params = [{"id": gen(), "p": "x" * 40} for _ in range(min(batch, rows - i))]
+            with engine.begin() as conn:
+                cast = "CAST(:id AS uuid)" if col_type == "uuid" else ":id"
+                conn.execute(text(f"INSERT INTO {table} (id, payload) VALUES ({cast}, :p)"), params)
+        elapsed = time.perf_counter() - start
+
+        index_bytes = None
+        with engine.begin() as conn:
+            if pg:
+                index_bytes = conn.execute(text(f"SELECT pg_relation_size('{table}_pkey')")).scalar()
+            elif engine.dialect.name == "sqlite":
+                try:  # dbstat só existe se o SQLite foi compilado com ele
+                    index_bytes = conn.execute(
+                        text("SELECT SUM(pgsize) FROM dbstat WHERE name = :n"),
+                        {"n": f"sqlite_autoindex_{table}_1"},
+                    ).scalar()
+                except Exception:
+                    index_bytes = None
+            conn.execute(text(f"DROP TABLE {table}"))
+
+        out.append({
+            "variant": name,
+            "rows": rows,
+            "seconds": round(elapsed, 2),
+            "rows_per_second": int(rows / elapsed),
+            "pk_index_mb": round(index_bytes / 1024 / 1024, 1) if index_bytes is not None else None,
+        })
+    return out
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["bench"]:
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+        for r in bench(n):
+            print(r)
+    else:
+        print(__doc__)
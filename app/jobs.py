@@ -0,0 +1,333 @@
+"""
+Jobs em background (in-process), no estilo outbox.
+
+- `enqueue(db, tipo, payload)` só adiciona a linha na sessão: o job nasce junto
+  com o commit da transação do endpoint (e some no rollback).
+- Um pool de threads (JOBS_WORKERS) reivindica jobs com FOR UPDATE SKIP LOCKED
+  no Postgres; no SQLite a reivindicação é serializada.
+- Falhas voltam para a fila com backoff exponencial até max_attempts.
+- Cada tipo tem limite de concorrência (`@job_handler(..., concurrency=N)`), contado no
+  banco (jobs RUNNING do tipo): vale para todos os workers do `python -m app.serve`.
+- Enquanto roda, o job renova locked_at a cada JOBS_HEARTBEAT_SECONDS; só volta para a
+  fila o RUNNING sem renovação há JOBS_STUCK_SECONDS (worker morreu).
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import event, func, text, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Job
+from app.ids import new_id
+
+logger = logging.getLogger(__name__)
+
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "1") == "1"
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "2"))
+JOBS_BACKOFF_SECONDS = float(os.getenv("JOBS_BACKOFF_SECONDS", "5"))
+# RUNNING sem heartbeat há mais que isso = worker morreu; o job volta para a fila
+JOBS_STUCK_SECONDS = int(os.getenv("JOBS_STUCK_SECONDS", "120"))
+JOBS_HEARTBEAT_SECONDS = float(os.getenv("JOBS_HEARTBEAT_SECONDS", "30"))
+# serializa a reivindicação entre processos no Postgres (contagem por tipo + claim)
+_CLAIM_LOCK_KEY = 0x6A6F6273
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobType(NamedTuple):
+    fn: Callable[[Session, dict], None]
+    concurrency: int
+    max_attempts: int
+
+
+_handlers: dict[str, JobType] = {}
+
+
+def job_handler(job_type: str, concurrency: int = 1, max_attempts: int = 5):
+    """Registra `fn(db, payload)` para o tipo. O commit do trabalho fica a cargo do runner."""
+    def deco(fn):
+        _handlers[job_type] = JobType(fn, concurrency, max_attempts)
+        return fn
+    return deco
+
+
+def enqueue(
+    db: Session,
+    job_type: str,
+    payload: Optional[dict] = None,
+    delay_seconds: float = 0,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    if job_type not in _handlers:
+        raise ValueError(f"job sem handler: {job_type}")
+    now = datetime.utcnow()
+    job = Job(
+        id=new_id(),
+        type=job_type,
+        payload_json=json.dumps(payload or {}, ensure_ascii=False),
+        status="PENDING",
+        attempts=0,
+        max_attempts=max_attempts or _handlers[job_type].max_attempts,
+        run_at=now + timedelta(seconds=delay_seconds),
+        created_at=now,
+    )
+    db.add(job)
+    db.info["jobs_enqueued"] = True
+    return job
+
+
+def requeue(db: Session, job: Job) -> None:
+    """Volta um job para a fila do zero (retry manual); os workers acordam no commit."""
+    job.status = "PENDING"
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    job.locked_at = None
+    job.locked_by = None
+    db.info["jobs_enqueued"] = True
+
+
+class _Heartbeat:
+    """Renova locked_at do job numa thread própria enquanto o handler roda."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"jobs-heartbeat-{job_id[:8]}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(JOBS_HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(Job)
+                    .where(Job.id == self.job_id, Job.status == "RUNNING", Job.locked_by == WORKER_ID)
+                    .values(locked_at=datetime.utcnow())
+                )
+                db.commit()
+            except Exception:
+                logger.warning("jobs: falha no heartbeat de %s", self.job_id, exc_info=True)
+            finally:
+                db.close()
+
+
+class JobRunner:
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._claim_lock = threading.Lock()
+        self._running: Counter = Counter()
+        self._threads: list[threading.Thread] = []
+        self.processed = 0
+        self.failed = 0
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    # ---------- reivindicação ----------
+    def _claim(self, db: Session) -> Optional[Job]:
+        with self._claim_lock:
+            if db.bind.dialect.name == "postgresql":
+                db.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _CLAIM_LOCK_KEY})
+            running = dict(
+                db.query(Job.type, func.count(Job.id)).filter(Job.status == "RUNNING").group_by(Job.type).all()
+            )
+            free = [t for t, h in _handlers.items() if running.get(t, 0) < h.concurrency]
+            if not free:
+                db.rollback()
+                return None
+
+            now = datetime.utcnow()
+            q = (
+                db.query(Job)
+                .filter(Job.status == "PENDING", Job.run_at <= now, Job.type.in_(free))
+                .order_by(Job.run_at)
+                .limit(1)
+            )
+            if db.bind.dialect.name == "postgresql":
+                q = q.with_for_update(skip_locked=True)
+            job = q.first()
+            if not job:
+                db.rollback()
+                return None
+
+            job.status = "RUNNING"
+            job.locked_at = now
+            job.locked_by = WORKER_ID
+            job.attempts += 1
+            db.commit()
+            self._running[job.type] += 1
+            return job
+
+    def _requeue_stuck(self, db: Session) -> None:
+        limit = datetime.utcnow() - timedelta(seconds=JOBS_STUCK_SECONDS)
+        db.execute(
+            update(Job)
+            .where(Job.status == "RUNNING", Job.locked_at < limit)
+            .values(status="PENDING", locked_at=None, locked_by=None)
+        )
+        db.commit()
+
+    # ---------- execução ----------
+    def _execute(self, db: Session, job: Job) -> None:
+        handler = _handlers[job.type]
+        try:
+            with _Heartbeat(job.id):
+                handler.fn(db, json.loads(job.payload_json or "{}"))
+                db.commit()
+            job.status = "DONE"
+            job.finished_at = datetime.utcnow()
+            job.last_error = None
+            db.commit()
+            self.processed += 1
+        except Exception:
+            db.rollback()
+            job = db.get(Job, job.id)
+            job.last_error = traceback.format_exc()[-4000:]
+            job.locked_at = None
+            job.locked_by = None
+            if job.attempts >= job.max_attempts:
+                job.status = "FAILED"
+                job.finished_at = datetime.utcnow()
+                self.failed += 1
+            else:
+                job.status = "PENDING"
+                job.run_at = datetime.utcnow() + timedelta(
+                    seconds=JOBS_BACKOFF_SECONDS * (2 ** (job.attempts - 1))
+                )
+            db.commit()
+            logger.warning("job %s (%s) falhou na tentativa %s", job.id, job.type, job.attempts)
+        finally:
+            with self._claim_lock:
+                self._running[job.type] -= 1
+
+    def run_pending(self, max_jobs: Optional[int] = None) -> int:
+        """Executa jobs prontos na thread atual (usado pelo pool e por scripts)."""
+        done = 0
+        while max_jobs is None or done < max_jobs:
+            db = SessionLocal()
+            try:
+                job = self._claim(db)
+                if job is None:
+                    return done
+                self._execute(db, job)
+                done += 1
+            finally:
+                db.close()
+        return done
+
+    def _loop(self, n: int) -> None:
+        while not self._stop.is_set():
+            try:
+                if n == 0:
+                    db = SessionLocal()
+                    try:
+                        self._requeue_stuck(db)
+                    finally:
+                        db.close()
+                self.run_pending()
+            except Exception:
+                logger.exception("jobs: falha no worker")
+            self._wake.wait(JOBS_POLL_SECONDS)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(JOBS_WORKERS):
+            t = threading.Thread(target=self._loop, args=(i,), name=f"jobs-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=JOBS_POLL_SECONDS + 1)
+        self._threads = []
+
+    def status(self) -> dict:
+        return {
+            "enabled": JOBS_ENABLED,
+            "workers": len(self._threads),
+            "running": {t: n for t, n in self._running.items() if n},
+            "limits": {t: h.concurrency for t, h in _handlers.items()},
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+runner = JobRunner()
+
+
+# acorda o pool assim que uma transação com jobs novos é commitada
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop("jobs_enqueued", False):
+        runner.wake()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop("jobs_enqueued", None)
+
+
+# ---------- handlers embutidos ----------
+@job_handler("archive.run", concurrency=1, max_attempts=3)
+def _archive_run(db: Session, payload: dict) -> None:
+    from app.archive import archive_closed_tickets
+    archive_closed_tickets(db, payload.get("older_than_days"), payload.get("batch_size"), payload.get("max_batches"))
+
+
+@job_handler("sla.backfill", concurrency=1, max_attempts=3)
+def _sla_backfill(db: Session, payload: dict) -> None:
+    from app.sla import backfill_sla
+    backfill_sla(db, payload.get("batch_size") or 500)
+
+
+@job_handler("rollup.backfill", concurrency=1, max_attempts=3)
+def _rollup_backfill(db: Session, payload: dict) -> None:
+    from app.rollup import backfill
+    backfill(db, payload.get("batch_size") or 200)
+
+
+@job_handler("replay.snapshots", concurrency=1, max_attempts=3)
+def _replay_snapshots(db: Session, payload: dict) -> None:
+    from app.replay import snapshot_due, REPLAY_SNAPSHOT_EVERY
+    snapshot_due(db, payload.get("every") or REPLAY_SNAPSHOT_EVERY)
+
+
+@job_handler("tickets.store_denorm", concurrency=1, max_attempts=5)
+def _tickets_store_denorm(db: Session, payload: dict) -> None:
+    from app.denorm import rewrite_store_tickets
+    rewrite_store_tickets(db, payload["store_id"])
+
+
+@job_handler("tickets.denorm_backfill", concurrency=1, max_attempts=3)
+def _tickets_denorm_backfill(db: Session, payload: dict) -> None:
+    from app.denorm import backfill
+    backfill(db, payload.get("batch_size") or 1000)
+
+
+@job_handler("attachments.variants", concurrency=2, max_attempts=3)
+def _attachment_variants(db: Session, payload: dict) -> None:
+    from app.attachments import build_variants
+    build_variants(db, payload["attachment_id"])
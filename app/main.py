@@ -1,11 +1,57 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import Base, engine
+from app.database import engine, replica_engine, SessionLocal, mark_primary_sticky, PRIMARY_STICKY_HEADER
 from app.seed import seed_data
-from app.routers import auth, stores, tickets, admin, networks
+from app.migrate import sync_schema
+from app.search import ensure_search_indexes, detect_search_capabilities
+from app.audit import ensure_audit_indexes
+from app.denorm import schedule_backfill
+from app.routers import auth, stores, tickets, admin, networks, attachments
+from app.dispatch import dispatcher, DISPATCH_ENABLED
+from app.catalog import catalog
+from app.jobs import runner as job_runner, JOBS_ENABLED
+from app.pagination import NEXT_CURSOR_HEADER
+from app.compression import BrotliMiddleware, GZipMiddleware, COMPRESS_MIN_SIZE
+from app.idempotency import IdempotencyMiddleware
+from app.serve import worker_singleton, DB_PREPARED_ENV
+from app.profiling import ProfilingMiddleware, instrument_engine, PROFILE_ID_HEADER
+from app.attachments import shutdown_pool as shutdown_thumb_pool, UPLOAD_OFFSET_HEADER, UPLOAD_LENGTH_HEADER
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    db = SessionLocal()
+    try:
+        catalog.load(db)
+    finally:
+        db.close()
+    # por worker: o prepare_database do processo pai não passa o estado adiante
+    detect_search_capabilities(engine)
+    if JOBS_ENABLED:
+        job_runner.start()
+    if DISPATCH_ENABLED and worker_singleton("dispatch"):
+        dispatcher.start()
+    yield
+    dispatcher.stop()
+    job_runner.stop()
+    shutdown_thumb_pool()
+
 
-app = FastAPI(title="RioAutocom Tech API", version="1.0.0-final")
+app = FastAPI(title="RioAutocom Tech API", version="1.0.0-final", lifespan=lifespan)
+
+# ✅ profiler por amostragem (X-Profile: 1 de admin, ou PROFILE_SAMPLE_RATE); o mais interno de todos
+app.add_middleware(ProfilingMiddleware)
+instrument_engine(engine)
+if replica_engine is not engine:
+    instrument_engine(replica_engine)
+
+# ✅ Idempotency-Key: retries de escrita devolvem a resposta da primeira execução.
+# Por dentro da compressão: guarda o corpo sem compressão e o replay é comprimido conforme o Accept-Encoding do retry
+app.add_middleware(IdempotencyMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,13 +59,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PRIMARY_STICKY_HEADER, NEXT_CURSOR_HEADER, UPLOAD_OFFSET_HEADER, UPLOAD_LENGTH_HEADER, PROFILE_ID_HEADER],
 )
 
-Base.metadata.create_all(bind=engine)
-seed_data()
+# ✅ compressão: brotli (se instalado) por dentro, gzip por fora
+app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
+
+# ✅ read-your-writes: após escrita bem-sucedida, leituras vão ao primário por alguns segundos
+@app.middleware("http")
+async def primary_sticky_after_write(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        mark_primary_sticky(response)
+    return response
+
+
+
+def prepare_database() -> None:
+    """Schema, índices e seed. Com `python -m app.serve` roda uma vez no processo pai, não em cada worker."""
+    sync_schema(engine)
+    ensure_search_indexes(engine)
+    ensure_audit_indexes(engine)
+    seed_data()
+    schedule_backfill()
+
+
+if os.getenv(DB_PREPARED_ENV) != "1":
+    prepare_database()
 
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 app.include_router(networks.router, prefix="/networks", tags=["Networks"])  # ✅ NOVO
 app.include_router(stores.router, prefix="/stores", tags=["Stores"])
 app.include_router(tickets.router, prefix="/tickets", tags=["Tickets"])
+app.include_router(attachments.router, prefix="/tickets", tags=["Attachments"])
@@ -0,0 +1,120 @@
+"""
+Sincronização leve do schema (o projeto não usa Alembic).
+
+create_all só cria tabelas que não existem; aqui também entram as colunas e os
+índices novos em tabelas que já existem no banco. Colunas são sempre adicionadas
+como NULL-áveis (com DEFAULT quando o model define server_default).
+
+Ids texto -> UUID nativo (só Postgres, uma vez, com a API parada):
+    python -m app.migrate uuid
+"""
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.database import Base
+from app.ids import UUIDStr, DB_NATIVE_UUID
+import app.models  # noqa: F401  (registra todas as tabelas no metadata)
+
+
+def sync_schema(engine: Engine) -> None:
+    if DB_NATIVE_UUID and engine.dialect.name == "postgresql" and _text_id_columns(engine):
+        raise RuntimeError("DB_NATIVE_UUID=1, mas o banco ainda tem ids em texto: rode `python -m app.migrate uuid`")
+
+    Base.metadata.create_all(bind=engine)
+
+    insp = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                ddl = "ALTER TABLE {} ADD COLUMN {} {}".format(
+                    preparer.format_table(table),
+                    preparer.format_column(col),
+                    col.type.compile(dialect=engine.dialect),
+                )
+                if col.server_default is not None:
+                    ddl += " DEFAULT " + str(col.server_default.arg)
+                conn.execute(text(ddl))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+# ---------- ids texto -> uuid (Postgres) ----------
+def _text_id_columns(engine: Engine) -> list[tuple[str, str]]:
+    """(tabela, coluna) UUIDStr do model que no banco ainda não são uuid."""
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    out = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        db_types = {c["name"]: str(c["type"]).upper() for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if isinstance(col.type, UUIDStr) and col.name in db_types and db_types[col.name] != "UUID":
+                out.append((table.name, col.name))
+    return out
+
+
+def migrate_ids_to_uuid(engine: Engine) -> int:
+    """
+    Converte todas as colunas de id (PKs e FKs) para uuid numa transação só.
+    As FKs são removidas e recriadas em volta do ALTER (tipos precisam bater).
+    Retorna quantas colunas foram convertidas.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("UUID nativo só existe no Postgres")
+
+    columns = _text_id_columns(engine)
+    if not columns:
+        return 0
+
+    insp = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    touched = {t for t, _ in columns}
+    fks = [
+        (table.name, fk)
+        for table in Base.metadata.sorted_tables
+        if table.name in set(insp.get_table_names())
+        for fk in insp.get_foreign_keys(table.name)
+        if table.name in touched or fk["referred_table"] in touched
+    ]
+
+    with engine.begin() as conn:
+        for table, fk in fks:
+            conn.execute(text(f"ALTER TABLE {preparer.quote(table)} DROP CONSTRAINT {preparer.quote(fk['name'])}"))
+        for table, column in columns:
+            col = preparer.quote(column)
+            conn.execute(text(
+                f"ALTER TABLE {preparer.quote(table)} ALTER COLUMN {col} TYPE uuid USING NULLIF({col}, '')::uuid"
+            ))
+        for table, fk in fks:
+            conn.execute(text(
+                "ALTER TABLE {} ADD CONSTRAINT {} FOREIGN KEY ({}) REFERENCES {} ({})".format(
+                    preparer.quote(table),
+                    preparer.quote(fk["name"]),
+                    ", ".join(preparer.quote(c) for c in fk["constrained_columns"]),
+                    preparer.quote(fk["referred_table"]),
+                    ", ".join(preparer.quote(c) for c in fk["referred_columns"]),
+                )
+            ))
+        # páginas reescritas pelo ALTER: atualiza estatísticas do planner
+        for table in sorted(touched):
+            conn.execute(text(f"ANALYZE {preparer.quote(table)}"))
+    return len(columns)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["uuid"]:
+        from app.database import engine
+
+        n = migrate_ids_to_uuid(engine)
+        print(f"{n} colunas convertidas para uuid; defina DB_NATIVE_UUID=1 e reinicie a API")
+    else:
+        print(__doc__)
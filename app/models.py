@@ -7,18 +7,26 @@ from sqlalchemy import (
     ForeignKey,
     UniqueConstraint,
     Index,
+    Table,
+    Integer,
+    LargeBinary,
+    Date,
+    BigInteger,
+    Float,
 )
 from sqlalchemy.sql import func
 from app.database import Base
+from app.ids import UUIDStr
 
 ROLE_ADMIN = "ADMIN"
 ROLE_TECH = "TECH"
 ROLE_CLIENT = "CLIENT"
+ROLE_SYSTEM = "SYSTEM"  # usuário "sistema" (app/seed.py): autor de eventos automáticos
 
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(String, primary_key=True)
+    id = Column(UUIDStr, primary_key=True)
     username = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
     role = Column(String, nullable=False)
@@ -27,12 +35,17 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# busca por prefixo (LIKE 'q%') + ordenação da listagem do admin
+Index("ix_users_username_pattern", User.username, postgresql_ops={"username": "text_pattern_ops"})
+Index("ix_users_role_username", User.role, User.username)
+
+
 # =========================
 # Redes
 # =========================
 class Network(Base):
     __tablename__ = "networks"
-    id = Column(String, primary_key=True)
+    id = Column(UUIDStr, primary_key=True)
     name = Column(String, unique=True, nullable=False)
     active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -43,17 +56,23 @@ class Network(Base):
 # =========================
 class Store(Base):
     __tablename__ = "stores"
-    id = Column(String, primary_key=True)
+    id = Column(UUIDStr, primary_key=True)
     name = Column(String, nullable=False)
     cnpj = Column(String, unique=True, nullable=False)
     active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # vínculo opcional com rede
-    network_id = Column(Text, ForeignKey("networks.id"), nullable=True)
+    network_id = Column(UUIDStr, ForeignKey("networks.id"), nullable=True)
+
+    # localização (graus decimais, WGS84); busca por raio usa o índice em memória (app/geo.py)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
 
 
 Index("ix_stores_network_id", Store.network_id)
+Index("ix_stores_cnpj_pattern", Store.cnpj, postgresql_ops={"cnpj": "text_pattern_ops"})
+Index("ix_stores_active_name_id", Store.active, Store.name, Store.id)
 
 
 # =========================
@@ -61,8 +80,8 @@ Index("ix_stores_network_id", Store.network_id)
 # =========================
 class ClientAccess(Base):
     __tablename__ = "client_access"
-    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
-    store_id = Column(String, ForeignKey("stores.id"), primary_key=True)
+    user_id = Column(UUIDStr, ForeignKey("users.id"), primary_key=True)
+    store_id = Column(UUIDStr, ForeignKey("stores.id"), primary_key=True)
 
     __table_args__ = (
         UniqueConstraint("user_id", "store_id", name="uq_client_store"),
@@ -75,8 +94,8 @@ class ClientAccess(Base):
 class ClientNetworkAccess(Base):
     __tablename__ = "client_network_access"
 
-    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
-    network_id = Column(String, ForeignKey("networks.id"), primary_key=True)
+    user_id = Column(UUIDStr, ForeignKey("users.id"), primary_key=True)
+    network_id = Column(UUIDStr, ForeignKey("networks.id"), primary_key=True)
 
     __table_args__ = (
         UniqueConstraint(
@@ -96,11 +115,14 @@ Index("ix_client_network_network_id", ClientNetworkAccess.network_id)
 # =========================
 class Ticket(Base):
     __tablename__ = "tickets"
-    id = Column(String, primary_key=True)
-    store_id = Column(String, ForeignKey("stores.id"), nullable=False)
+    id = Column(UUIDStr, primary_key=True)
+    store_id = Column(UUIDStr, ForeignKey("stores.id"), nullable=False)
+    # cópia da loja (ver app/denorm.py): listagem sem JOIN em stores
+    network_id = Column(UUIDStr, ForeignKey("networks.id"), nullable=True)
+    store_name = Column(String, nullable=True)
 
     opened_at = Column(DateTime(timezone=True), server_default=func.now())
-    opened_by_admin_id = Column(String, ForeignKey("users.id"), nullable=False)
+    opened_by_admin_id = Column(UUIDStr, ForeignKey("users.id"), nullable=False)
 
     requester_name = Column(String, nullable=True)
     local = Column(String, nullable=True)
@@ -110,7 +132,7 @@ class Ticket(Base):
     priority = Column(String, nullable=False)
 
     status = Column(String, nullable=False, default="ABERTO")
-    assigned_tech_id = Column(String, ForeignKey("users.id"), nullable=True)
+    assigned_tech_id = Column(UUIDStr, ForeignKey("users.id"), nullable=True)
 
     assigned_at = Column(DateTime(timezone=True), nullable=True)
     started_at = Column(DateTime(timezone=True), nullable=True)
@@ -122,10 +144,26 @@ class Ticket(Base):
         onupdate=func.now(),
     )
 
+    # SLA (ver app/sla.py)
+    sla_due_at = Column(DateTime(timezone=True), nullable=True)
+    sla_kind = Column(String, nullable=True)  # ASSIGN | CLOSE
+    sla_close_due_at = Column(DateTime(timezone=True), nullable=True)
+    sla_paused_at = Column(DateTime(timezone=True), nullable=True)
+    sla_paused_seconds = Column(Integer, nullable=True, default=0)
+
+    # concorrência otimista: todo UPDATE do ORM vai com "WHERE version = ?" e incrementa
+    # (conflito -> StaleDataError; a API responde 412, ver If-Match em routers/tickets.py)
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
 
 Index("ix_tickets_store_id", Ticket.store_id)
 Index("ix_tickets_status", Ticket.status)
 Index("ix_tickets_assigned_tech_id", Ticket.assigned_tech_id)
+Index("ix_tickets_sla_due_at", Ticket.sla_due_at)
+# listagem por rede / escopo do CLIENT por rede, mais recentes primeiro
+Index("ix_tickets_network_opened", Ticket.network_id, Ticket.opened_at)
 
 
 # =========================
@@ -133,9 +171,9 @@ Index("ix_tickets_assigned_tech_id", Ticket.assigned_tech_id)
 # =========================
 class TicketUpdate(Base):
     __tablename__ = "ticket_updates"
-    id = Column(String, primary_key=True)
-    ticket_id = Column(String, ForeignKey("tickets.id"), nullable=False)
-    created_by_user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    id = Column(UUIDStr, primary_key=True)
+    ticket_id = Column(UUIDStr, ForeignKey("tickets.id"), nullable=False)
+    created_by_user_id = Column(UUIDStr, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     event_type = Column(String, nullable=False)
     note = Column(Text, nullable=True)
@@ -143,6 +181,30 @@ class TicketUpdate(Base):
 
 
 Index("ix_ticket_updates_ticket_id", TicketUpdate.ticket_id)
+# auditoria (GET /admin/audit): filtros por autor/evento e período, sempre por data
+Index("ix_ticket_updates_user_created", TicketUpdate.created_by_user_id, TicketUpdate.created_at)
+Index("ix_ticket_updates_event_created", TicketUpdate.event_type, TicketUpdate.created_at)
+Index("ix_ticket_updates_created_id", TicketUpdate.created_at, TicketUpdate.id)
+# replay (GET /tickets/{id}/as-of): eventos de um chamado em ordem
+Index("ix_ticket_updates_ticket_created", TicketUpdate.ticket_id, TicketUpdate.created_at, TicketUpdate.id)
+
+
+# =========================
+# Snapshots do replay (app/replay.py) — estado do chamado após N eventos
+# =========================
+class TicketSnapshot(Base):
+    __tablename__ = "ticket_snapshots"
+    id = Column(UUIDStr, primary_key=True)
+    ticket_id = Column(UUIDStr, ForeignKey("tickets.id"), nullable=False)
+    # posição no log: (created_at, id) do último evento aplicado
+    event_at = Column(DateTime(timezone=True), nullable=False)
+    event_id = Column(UUIDStr, nullable=False)
+    events = Column(Integer, nullable=False)  # eventos aplicados até aqui
+    state_json = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+Index("ix_ticket_snapshots_ticket_event", TicketSnapshot.ticket_id, TicketSnapshot.event_at, TicketSnapshot.event_id)
 
 
 # =========================
@@ -150,7 +212,156 @@ Index("ix_ticket_updates_ticket_id", TicketUpdate.ticket_id)
 # =========================
 class TicketClosure(Base):
     __tablename__ = "ticket_closures"
-    ticket_id = Column(String, ForeignKey("tickets.id"), primary_key=True)
+    ticket_id = Column(UUIDStr, ForeignKey("tickets.id"), primary_key=True)
     resolution_text = Column(Text, nullable=False)
-    closed_by_user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    closed_by_user_id = Column(UUIDStr, ForeignKey("users.id"), nullable=False)
     closed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# =========================
+# Versão do catálogo (lojas/redes) — invalida caches em memória dos workers
+# =========================
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# =========================
+# Idempotency-Key (replay de respostas em retries do app)
+# =========================
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    key = Column(String, primary_key=True)  # "<user_id>:<Idempotency-Key>"
+    method = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+    state = Column(String, nullable=False, default="IN_PROGRESS")  # IN_PROGRESS | DONE
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    content_type = Column(String, nullable=True)
+    response_headers = Column(Text, nullable=True)  # JSON [[nome, valor], ...] (sem content-length)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+Index("ix_idempotency_keys_expires_at", IdempotencyKey.expires_at)
+
+
+# =========================
+# Jobs (trabalho adiado, executado depois do commit)
+# =========================
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(UUIDStr, primary_key=True)
+    type = Column(String, nullable=False)
+    payload_json = Column(Text, nullable=True)
+    status = Column(String, nullable=False, default="PENDING")  # PENDING | RUNNING | DONE | FAILED
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+Index("ix_jobs_status_run_at", Job.status, Job.run_at)
+
+
+# =========================
+# Sync offline do app do técnico (dedupe pelo id da ação gerado no app)
+# =========================
+class TicketSyncAction(Base):
+    __tablename__ = "ticket_sync_actions"
+    key = Column(String, primary_key=True)  # "<user_id>:<client_action_id>"
+    ticket_id = Column(UUIDStr, nullable=False)  # sem FK: sobrevive ao arquivamento do ticket
+    action = Column(String, nullable=False)
+    client_ts = Column(DateTime(timezone=True), nullable=True)
+    applied_at = Column(DateTime(timezone=True), nullable=False)  # horário efetivo usado na timeline
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+
+# =========================
+# Anexos (fotos antes/depois, documentos)
+# =========================
+class TicketAttachment(Base):
+    __tablename__ = "ticket_attachments"
+    id = Column(UUIDStr, primary_key=True)
+    ticket_id = Column(UUIDStr, nullable=False)  # sem FK: sobrevive ao arquivamento do ticket
+    update_id = Column(UUIDStr, nullable=True)  # TicketUpdate ATTACHMENT criado ao completar o upload
+    uploaded_by_user_id = Column(UUIDStr, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False, default="OUTRO")  # ANTES | DEPOIS | OUTRO
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    received = Column(BigInteger, nullable=False, default=0)
+    status = Column(String, nullable=False, default="UPLOADING")  # UPLOADING | READY
+    storage_key = Column(String, nullable=False)
+    variants_status = Column(String, nullable=True)  # PENDING | READY | SKIPPED | FAILED
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+Index("ix_ticket_attachments_ticket_created", TicketAttachment.ticket_id, TicketAttachment.created_at)
+
+
+# =========================
+# Relatórios: tempo em cada status (por chamado) e rollup diário
+# =========================
+class TicketStatusSpan(Base):
+    __tablename__ = "ticket_status_spans"
+    id = Column(UUIDStr, primary_key=True)
+    ticket_id = Column(UUIDStr, nullable=False)  # sem FK: sobrevive ao arquivamento do ticket
+    status = Column(String, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=True)
+    seconds = Column(Integer, nullable=True)
+
+    # dimensões no momento em que o status começou
+    store_id = Column(UUIDStr, nullable=True)
+    network_id = Column(UUIDStr, nullable=True)
+    tech_id = Column(UUIDStr, nullable=True)
+    type = Column(String, nullable=True)
+    priority = Column(String, nullable=True)
+
+
+Index("ix_ticket_status_spans_ticket_open", TicketStatusSpan.ticket_id, TicketStatusSpan.ended_at)
+
+
+class StatusRollupDaily(Base):
+    __tablename__ = "status_rollup_daily"
+    # dimensões vazias = "" (NULL não participa de chave única)
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)
+    network_id = Column(String, primary_key=True, default="")
+    store_id = Column(String, primary_key=True, default="")
+    tech_id = Column(String, primary_key=True, default="")
+    type = Column(String, primary_key=True, default="")
+    priority = Column(String, primary_key=True, default="")
+
+    entered = Column(Integer, nullable=False, default=0)    # chamados que entraram no status no dia
+    completed = Column(Integer, nullable=False, default=0)  # períodos no status encerrados no dia
+    seconds = Column(BigInteger, nullable=False, default=0)  # soma da duração dos períodos encerrados
+
+
+# =========================
+# Arquivo (tickets CONCLUIDO/CANCELADO antigos)
+# =========================
+def _archive_table(name: str, source: Table) -> Table:
+    # mesmas colunas da tabela quente, sem FKs (o ticket original some da tabela quente)
+    cols = [
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+        for c in source.columns
+    ]
+    return Table(name, Base.metadata, *cols)
+
+
+tickets_archive = _archive_table("tickets_archive", Ticket.__table__)
+ticket_updates_archive = _archive_table("ticket_updates_archive", TicketUpdate.__table__)
+ticket_closures_archive = _archive_table("ticket_closures_archive", TicketClosure.__table__)
+
+Index("ix_ticket_updates_archive_ticket_id", ticket_updates_archive.c.ticket_id)
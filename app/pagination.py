@@ -0,0 +1,62 @@
+"""
+Paginação por cursor (keyset): `?limit=50&cursor=...`.
+
+A resposta continua sendo a lista; o cursor da próxima página vai no header
+X-Next-Cursor (ausente na última página).
+"""
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_, literal
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(raw: str, keys) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        out = []
+        for (col, _), v in zip(keys, values):
+            if v is not None and col.type.python_type is datetime:
+                v = datetime.fromisoformat(v)
+            out.append(v)
+        return out
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="cursor inválido")
+
+
+def _after(keys, values):
+    # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...  (com < nas chaves desc)
+    # literal(): o SQLAlchemy não aceita < / > direto com True/False
+    values = [literal(v, col.type) for (col, _), v in zip(keys, values)]
+    clauses = []
+    for i, (col, desc) in enumerate(keys):
+        cmp = col < values[i] if desc else col > values[i]
+        clauses.append(and_(*[keys[j][0] == values[j] for j in range(i)], cmp))
+    return or_(*clauses)
+
+
+def paginate(q, keys, cursor: str | None, limit: int, response: Response):
+    """
+    keys: [(coluna, desc?)] — a última precisa ser única (ex.: id).
+    Aplica ORDER BY + keyset + LIMIT e preenche X-Next-Cursor.
+    """
+    if cursor:
+        q = q.filter(_after(keys, decode_cursor(cursor, keys)))
+    q = q.order_by(*[col.desc() if desc else col.asc() for col, desc in keys])
+    rows = q.limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, col.key) for col, _ in keys])
+    return rows
@@ -0,0 +1,314 @@
+"""
+Profiler por amostragem para requisições em produção (opt-in).
+
+Quando liga:
+- header `X-Profile: 1` numa requisição de ADMIN (token válido com role ADMIN)
+- ou sorteio: PROFILE_SAMPLE_RATE (0.0–1.0, padrão 0 = desligado) das requisições
+
+Como funciona: uma thread amostra as pilhas a cada PROFILE_INTERVAL_MS e conta só
+as da requisição perfilada — no event loop, quando a task dela é a que está rodando;
+no threadpool (endpoints síncronos, dependências, validação de resposta), quando o
+worker está executando no contexto dela. O tempo de SQL vem dos eventos do engine.
+
+O resultado (pilhas colapsadas, abríveis no speedscope.app ou flamegraph.pl, e o
+resumo de SQL) fica num buffer circular de PROFILE_RING_SIZE perfis por worker:
+GET /admin/profiles. A resposta perfilada traz o header X-Profile-Id.
+
+Desligado, o custo é uma busca de header por requisição e um ContextVar.get por query.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.models import ROLE_ADMIN
+from app.security import decode_token
+
+try:  # worker do threadpool do anyio: o frame de run() tem o contexto do item em execução
+    from anyio._backends._asyncio import WorkerThread as _AnyioWorkerThread
+    _WORKER_RUN_CODE = _AnyioWorkerThread.run.__code__
+except (ImportError, AttributeError):
+    _WORKER_RUN_CODE = None
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+PROFILE_MAX_ACTIVE = int(os.getenv("PROFILE_MAX_ACTIVE", "4"))
+PROFILE_MAX_SAMPLES = int(os.getenv("PROFILE_MAX_SAMPLES", "20000"))
+PROFILE_MAX_DEPTH = 128
+PROFILE_SQL_TOP = 20
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+
+
+class Profile:
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = f"{int(time.time() * 1000):x}-{random.getrandbits(24):06x}"
+        self.method = method
+        self.path = path
+        self.reason = reason  # header | sampled
+        self.started_at = datetime.utcnow()
+        self.status_code: Optional[int] = None
+        self.wall_ms = 0.0
+        self.samples: Counter[str] = Counter()
+        self.sample_count = 0
+        self.sql: dict[str, list] = {}  # statement -> [count, total_ms, max_ms]
+        self.sql_lock = threading.Lock()
+        self.loop_thread = threading.get_ident()
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self._t0 = time.perf_counter()
+
+    def add_sql(self, statement: str, elapsed_ms: float) -> None:
+        with self.sql_lock:
+            row = self.sql.get(statement)
+            if row is None:
+                self.sql[statement] = [1, elapsed_ms, elapsed_ms]
+            else:
+                row[0] += 1
+                row[1] += elapsed_ms
+                row[2] = max(row[2], elapsed_ms)
+
+    def finish(self) -> None:
+        self.wall_ms = (time.perf_counter() - self._t0) * 1000
+
+    # ---------- saída ----------
+    def sql_summary(self) -> dict:
+        with self.sql_lock:
+            rows = sorted(self.sql.items(), key=lambda kv: kv[1][1], reverse=True)
+        return {
+            "queries": sum(r[0] for _, r in rows),
+            "total_ms": round(sum(r[1] for _, r in rows), 2),
+            "top": [
+                {"statement": s[:500], "count": r[0], "total_ms": round(r[1], 2), "max_ms": round(r[2], 2)}
+                for s, r in rows[:PROFILE_SQL_TOP]
+            ],
+        }
+
+    def summary(self) -> dict:
+        sql = self.sql_summary()
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "started_at": self.started_at.isoformat(),
+            "status_code": self.status_code,
+            "wall_ms": round(self.wall_ms, 2),
+            "samples": self.sample_count,
+            "sampled_ms": round(self.sample_count * PROFILE_INTERVAL_MS, 1),
+            "sql_queries": sql["queries"],
+            "sql_ms": sql["total_ms"],
+        }
+
+    def detail(self) -> dict:
+        return {**self.summary(), "interval_ms": PROFILE_INTERVAL_MS, "sql": self.sql_summary()}
+
+    def collapsed(self) -> str:
+        """Formato "raiz;...;folha contagem" (flamegraph.pl / speedscope)."""
+        return "\n".join(f"{stack} {n}" for stack, n in self.samples.most_common()) + "\n"
+
+
+# ---------- amostragem ----------
+def _label(code) -> str:
+    filename = code.co_filename
+    i = filename.rfind("site-packages/")
+    if i >= 0:
+        filename = filename[i + len("site-packages/"):]
+    elif "/app/" in filename:
+        filename = filename[filename.rfind("/app/") + 1:]
+    elif "/lib/python" in filename:  # stdlib
+        filename = filename[filename.rfind("/lib/python") + 5:].split("/", 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _collapse(leaf, stop_code=None) -> str:
+    codes = []
+    f = leaf
+    while f is not None and len(codes) < PROFILE_MAX_DEPTH:
+        if f.f_code is stop_code:
+            break
+        codes.append(f.f_code)
+        f = f.f_back
+    return ";".join(_label(c) for c in reversed(codes))
+
+
+def _worker_context(leaf):
+    """(frame WorkerThread.run, contexto do item em execução) ou (None, None)."""
+    f, child = leaf, None
+    while f is not None:
+        if f.f_code is _WORKER_RUN_CODE:
+            # fora do context.run (ex.: devolvendo o resultado ao loop) não é tempo da requisição
+            if child is None or "/asyncio/" in child.f_code.co_filename:
+                return None, None
+            return f, f.f_locals.get("context")
+        f, child = f.f_back, f
+    return None, None
+
+
+class Sampler:
+    def __init__(self):
+        self.active: list[Profile] = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, p: Profile) -> bool:
+        with self.lock:
+            if len(self.active) >= PROFILE_MAX_ACTIVE:
+                return False
+            self.active.append(p)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        self.wake.set()
+        return True
+
+    def remove(self, p: Profile) -> None:
+        with self.lock:
+            if p in self.active:
+                self.active.remove(p)
+
+    def _run(self) -> None:
+        interval = PROFILE_INTERVAL_MS / 1000
+        me = threading.get_ident()
+        while True:
+            with self.lock:
+                active = list(self.active)
+                if not active:
+                    self.wake.clear()
+            if not active:
+                self.wake.wait()
+                continue
+            time.sleep(interval)
+            self._sample(active, me)
+
+    def _sample(self, active: list[Profile], me: int) -> None:
+        frames = sys._current_frames()
+        for ident, leaf in frames.items():
+            if ident == me:
+                continue
+            for p in active:
+                if p.sample_count >= PROFILE_MAX_SAMPLES:
+                    continue
+                if ident == p.loop_thread:
+                    # event loop: só conta se a task da requisição é a que está rodando agora
+                    if asyncio.current_task(p.loop) is not p.task:
+                        continue
+                    stack = _collapse(leaf, _LOOP_ROOT_CODE)
+                elif _WORKER_RUN_CODE is not None:
+                    run_frame, ctx = _worker_context(leaf)
+                    if ctx is None or ctx.get(_current) is not p:
+                        continue
+                    stack = _collapse(leaf, run_frame.f_code)
+                else:
+                    continue
+                p.samples[stack] += 1
+                p.sample_count += 1
+                break  # cada thread executa uma requisição por vez
+
+
+sampler = Sampler()
+
+_ring: deque[Profile] = deque(maxlen=PROFILE_RING_SIZE)
+_ring_lock = threading.Lock()
+
+
+def recent_profiles() -> list[Profile]:
+    with _ring_lock:
+        return list(reversed(_ring))
+
+
+def get_profile(profile_id: str) -> Optional[Profile]:
+    with _ring_lock:
+        return next((p for p in _ring if p.id == profile_id), None)
+
+
+# ---------- tempo de SQL ----------
+def instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profile_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        p = _current.get()
+        if p is None:
+            return
+        starts = conn.info.get("profile_t0")
+        if starts:
+            p.add_sql(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+
+# ---------- middleware ----------
+def _is_admin(headers: Headers) -> bool:
+    auth = headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return False
+    try:
+        return decode_token(auth[7:]).get("role") == ROLE_ADMIN
+    except ValueError:
+        return False
+
+
+class ProfilingMiddleware:
+    """Fica por dentro dos outros middlewares: perfila roteamento, dependências, handler e serialização."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        reason = None
+        wanted = any(k == b"x-profile" for k, _ in scope["headers"])
+        if wanted:
+            headers = Headers(scope=scope)
+            if headers.get(PROFILE_HEADER) == "1" and _is_admin(headers):
+                reason = "header"
+        elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            reason = "sampled"
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        p = Profile(scope["method"], scope["path"], reason)
+        if not sampler.add(p):
+            # já tem PROFILE_MAX_ACTIVE perfis rodando neste worker
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                p.status_code = message["status"]
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = p.id
+            await send(message)
+
+        token = _current.set(p)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            sampler.remove(p)
+            p.finish()
+            with _ring_lock:
+                _ring.append(p)
+
+
+# no event loop a pilha começa no middleware (acima dele é só uvicorn/asyncio)
+_LOOP_ROOT_CODE = ProfilingMiddleware.__call__.__code__
@@ -0,0 +1,253 @@
+"""
+Micro-cache da fila do técnico (GET /tickets/?open_only=true e ?mine_only=true).
+
+Na troca de turno dezenas de técnicos fazem o mesmo GET no mesmo segundo. Aqui:
+- o JSON pronto da resposta fica QUEUE_CACHE_TTL_SECONDS (padrão 2s) em memória;
+- requisições iguais e simultâneas esperam a primeira (single-flight): uma query só;
+- toda escrita que mexe num chamado ABERTO invalida a fila, e a que mexe num chamado
+  de um técnico invalida o "mine" dele — no commit (hook after_commit, como em jobs.py).
+
+O cache é por worker: em outro worker a resposta pode ficar até o TTL desatualizada.
+Com réplica de leitura, a chave inclui de onde veio a leitura (primário/réplica): quem está
+grudado no primário depois de uma escrita não recebe resposta calculada na réplica.
+QUEUE_CACHE_TTL_SECONDS=0 desliga.
+
+Benchmark (tempestade de polling, com e sem cache):
+    python -m app.queue_cache bench [clientes] [segundos]
+"""
+import os
+import sys
+import threading
+import time
+from typing import Callable, Hashable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+
+QUEUE_CACHE_TTL_SECONDS = float(os.getenv("QUEUE_CACHE_TTL_SECONDS", "2"))
+QUEUE_CACHE_WAIT_SECONDS = float(os.getenv("QUEUE_CACHE_WAIT_SECONDS", "5"))
+QUEUE_CACHE_MAX_ENTRIES = int(os.getenv("QUEUE_CACHE_MAX_ENTRIES", "5000"))
+
+QUEUE_SCOPE = "queue"
+
+
+def mine_scope(tech_id: str) -> str:
+    return f"mine:{tech_id}"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.ok = False
+        self.gen = 0
+
+
+class MicroCache:
+    """
+    Chaves são (escopo, ...). Invalidar um escopo incrementa a geração dele: resultado
+    calculado antes da invalidação não é guardado (nem servido) depois dela.
+    """
+
+    def __init__(self, ttl: float = QUEUE_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._entries: dict[tuple, tuple[float, int, object]] = {}  # key -> (expira, geração, valor)
+        self._flights: dict[tuple, _Flight] = {}
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], object]):
+        if self.ttl <= 0:
+            return compute()
+        scope = key[0]
+        with self.lock:
+            gen = self._generations.get(scope, 0)
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic() and entry[1] == gen:
+                self.hits += 1
+                return entry[2]
+            flight = self._flights.get(key)
+            if flight is not None and flight.gen != gen:
+                # a busca em andamento começou antes de uma invalidação: não serve
+                self.misses += 1
+                stale_flight = True
+            else:
+                stale_flight = False
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                flight.gen = gen
+                self.misses += 1
+            elif not stale_flight:
+                self.coalesced += 1
+
+        if stale_flight:
+            return compute()
+        if not leader:
+            # alguém já está buscando no banco: espera o resultado dele
+            if flight.done.wait(QUEUE_CACHE_WAIT_SECONDS) and flight.ok:
+                return flight.value
+            return compute()
+
+        try:
+            value = compute()
+            flight.value, flight.ok = value, True
+            with self.lock:
+                if self._generations.get(scope, 0) == gen:
+                    if len(self._entries) >= QUEUE_CACHE_MAX_ENTRIES:
+                        self._evict_expired()
+                    self._entries[key] = (time.monotonic() + self.ttl, gen, value)
+            return value
+        finally:
+            with self.lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        for k in [k for k, e in self._entries.items() if e[0] <= now]:
+            del self._entries[k]
+        if len(self._entries) >= QUEUE_CACHE_MAX_ENTRIES:
+            self._entries.clear()
+
+    def invalidate(self, *scopes: Hashable) -> None:
+        with self.lock:
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            served = self.hits + self.misses + self.coalesced
+            return {
+                "ttl_seconds": self.ttl,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "invalidations": self.invalidations,
+                # coalescida também poupou o banco
+                "hit_ratio": round((self.hits + self.coalesced) / served, 4) if served else None,
+            }
+
+
+queue_cache = MicroCache()
+
+
+# ---------- invalidação no commit ----------
+def touch(db: Session, t, old_status: Optional[str] = None, old_tech_id: Optional[str] = None) -> None:
+    """Marca a fila/"mine" afetados pela escrita em `t`; invalida quando a transação for commitada."""
+    scopes = db.info.setdefault("queue_cache_scopes", set())
+    if t.status == "ABERTO" or old_status == "ABERTO":
+        scopes.add(QUEUE_SCOPE)
+    for tech_id in (t.assigned_tech_id, old_tech_id):
+        if tech_id:
+            scopes.add(mine_scope(tech_id))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    scopes = session.info.pop("queue_cache_scopes", None)
+    if scopes:
+        queue_cache.invalidate(*scopes)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop("queue_cache_scopes", None)
+
+
+# ---------- benchmark ----------
+def bench(clients: int = 50, seconds: float = 5.0) -> list[dict]:
+    """Técnicos fazendo polling da fila em loop (TestClient, em processo), com e sem cache."""
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime
+
+    from fastapi.testclient import TestClient
+
+    from app.database import engine
+    from app.ids import new_id
+    from app.main import app
+    from app.models import Network, Store, Ticket, User, ROLE_ADMIN, ROLE_TECH
+    from app.security import create_access_token, hash_password
+    from app.sla import apply_sla
+
+    db = SessionLocal()
+    try:
+        admin = db.query(User).filter(User.role == ROLE_ADMIN).first()
+        net = Network(id=new_id(), name=f"Bench fila {new_id()[-8:]}", active=True)
+        store = Store(id=new_id(), name="Loja bench fila", cnpj=new_id().replace("-", "")[-14:], network_id=net.id, active=True)
+        tech = User(id=new_id(), username=f"bench-{new_id()[-8:]}", password_hash=hash_password("bench"), role=ROLE_TECH, active=True)
+        db.add_all([net, store, tech])
+        db.flush()
+        for _ in range(100):
+            t = Ticket(
+                id=new_id(), store_id=store.id, network_id=net.id, store_name=store.name,
+                opened_by_admin_id=admin.id, problem="Sem sinal",
+                type="REPARO", priority="NORMAL", status="ABERTO",
+                opened_at=datetime.utcnow(), updated_at=datetime.utcnow(),
+            )
+            apply_sla(t)
+            db.add(t)
+        db.commit()
+        token = create_access_token({"uid": tech.id, "role": ROLE_TECH, "sub": tech.username})
+    finally:
+        db.close()
+
+    queries = 0
+    counter_lock = threading.Lock()
+
+    def _count(*_):
+        nonlocal queries
+        with counter_lock:
+            queries += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def poll(deadline: float) -> int:
+        n = 0
+        while time.monotonic() < deadline:
+            assert client.get("/tickets/?open_only=true&limit=50", headers=headers).status_code == 200
+            n += 1
+        return n
+
+    results = []
+    try:
+        for ttl in (0.0, QUEUE_CACHE_TTL_SECONDS or 2.0):
+            queue_cache.ttl = ttl
+            queue_cache.invalidate(QUEUE_SCOPE)
+            queries = 0
+            deadline = time.monotonic() + seconds
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                requests = sum(pool.map(poll, [deadline] * clients))
+            results.append({
+                "ttl_seconds": ttl,
+                "clients": clients,
+                "req_per_second": round(requests / seconds, 1),
+                # inclui a query de autenticação (usuário) de cada requisição
+                "db_queries_per_second": round(queries / seconds, 1),
+                "queries_per_request": round(queries / requests, 2) if requests else None,
+            })
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return results
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["bench"]:
+        # via o módulo importado: como __main__ o queue_cache seria outra instância, não a da API
+        from app.queue_cache import bench as _bench
+
+        args = sys.argv[2:]
+        for r in _bench(int(args[0]) if args else 50, float(args[1]) if len(args) > 1 else 5.0):
+            print(r)
+    else:
+        print(__doc__)
@@ -0,0 +1,346 @@
+"""
+Replay do log de eventos (ticket_updates): estado de um chamado em qualquer instante.
+
+ticket_updates é append-only (CREATE, EDIT, ASSIGN, STATUS_CHANGE, ...). apply_event
+aplica um evento ao estado; o estado em `ts` é o replay dos eventos com created_at <= ts,
+na ordem (created_at, id).
+
+Snapshots (ticket_snapshots): a cada REPLAY_SNAPSHOT_EVERY eventos de um chamado grava-se
+o estado naquela posição do log. GET /tickets/{id}/as-of?ts= parte do último snapshot
+<= ts e aplica só os eventos depois dele. Os snapshots são gerados em lote pelo job
+"replay.snapshots" (POST /admin/replay/snapshots) ou pela linha de comando; são só
+cache — apagar a tabela não perde nada.
+
+Chamados antigos têm CREATE sem os campos iniciais: o ponto de partida vem do `before`
+do primeiro EDIT e, para o que nunca foi editado, da linha atual em `tickets`.
+
+Checagem de consistência (replay completo x linha em `tickets`, tabela inteira, em
+processos paralelos):
+    python -m app.replay check [processos]
+    python -m app.replay snapshot [a_cada]
+"""
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.ids import new_id
+from app.models import Ticket, TicketUpdate, TicketSnapshot, tickets_archive, ticket_updates_archive
+from app.sla import utc_naive
+
+REPLAY_SNAPSHOT_EVERY = int(os.getenv("REPLAY_SNAPSHOT_EVERY", "50"))
+REPLAY_BATCH_SIZE = int(os.getenv("REPLAY_BATCH_SIZE", "200"))
+REPLAY_CHECK_CHUNK = int(os.getenv("REPLAY_CHECK_CHUNK", "500"))
+REPLAY_CHECK_MAX_REPORTED = 200
+
+# campos fixados na criação (CREATE) / alteráveis pelo EDIT
+CREATE_FIELDS = ("store_id", "requester_name", "local", "problem", "type", "priority")
+EDIT_FIELDS = ("requester_name", "local", "problem", "priority", "type")
+# o que a checagem compara com `tickets` (horários dos eventos e da linha diferem por microssegundos:
+# dos horários só se compara se estão preenchidos ou não)
+CHECKED_FIELDS = ("store_id", "status", "assigned_tech_id", *EDIT_FIELDS)
+CHECKED_PRESENCE = ("started_at", "closed_at")
+
+
+def _iso(dt: Optional[datetime]) -> Optional[str]:
+    return utc_naive(dt).isoformat() if dt is not None else None
+
+
+# ---------- aplicação de eventos ----------
+def apply_event(state: Optional[dict], event_type: str, payload: dict, at: datetime, seed: Optional[dict] = None) -> Optional[dict]:
+    """Novo estado após o evento. `state` None = chamado ainda não criado (só CREATE vale)."""
+    when = _iso(at)
+    if event_type == "CREATE":
+        seed = seed or {}
+        state = {f: payload.get(f, seed.get(f)) for f in CREATE_FIELDS}
+        state.update(
+            status=payload.get("status") or "ABERTO", assigned_tech_id=None,
+            opened_at=when, assigned_at=None, started_at=None, closed_at=None, updated_at=when,
+        )
+        return state
+    if state is None:
+        return None
+
+    if event_type == "EDIT":
+        after = payload.get("after") or payload.get("changed") or {}
+        state.update({f: after[f] for f in EDIT_FIELDS if f in after})
+    elif event_type == "ASSIGN":
+        state["assigned_tech_id"] = payload.get("tech_id")
+        state["assigned_at"] = when if payload.get("tech_id") else None
+    elif event_type == "STATUS_CHANGE":
+        to = payload.get("to")
+        if not to:
+            return state
+        state["status"] = to
+        if to == "EM_ATENDIMENTO":
+            # como apply_start: cada início (também saindo de PENDENTE) regrava started_at
+            state["started_at"] = when
+        elif to in ("CONCLUIDO", "CANCELADO"):
+            state["closed_at"] = when
+        elif to == "ABERTO":
+            # reabertura (como transitions._transition): o chamado volta sem início nem conclusão
+            state["started_at"] = None
+            state["closed_at"] = None
+    else:
+        # COMMENT, CLOSE (o status vem no STATUS_CHANGE seguinte), ATTACHMENT...: não mudam o chamado
+        return state
+    state["updated_at"] = when
+    return state
+
+
+def _payload(raw: Optional[str]) -> dict:
+    try:
+        value = json.loads(raw) if raw else {}
+    except ValueError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def replay(events, state: Optional[dict] = None, seed: Optional[dict] = None) -> Optional[dict]:
+    """`events`: linhas com event_type, payload_json, created_at (em ordem)."""
+    for e in events:
+        state = apply_event(state, e.event_type, _payload(e.payload_json), e.created_at, seed)
+    return state
+
+
+def legacy_seed(row, first_edit) -> Optional[dict]:
+    """Ponto de partida para CREATE sem campos: `before` do 1º EDIT, senão a linha atual."""
+    if row is None:
+        return None
+    seed = {f: getattr(row, f, None) for f in CREATE_FIELDS}
+    if first_edit is not None:
+        before = _payload(first_edit.payload_json).get("before") or {}
+        seed.update({f: before[f] for f in EDIT_FIELDS if f in before})
+    return seed
+
+
+def _needs_seed(events) -> bool:
+    first = events[0] if events else None
+    return first is not None and first.event_type == "CREATE" and "problem" not in _payload(first.payload_json)
+
+
+# ---------- leitura do log ----------
+def _tables(archived: bool):
+    return (tickets_archive, ticket_updates_archive) if archived else (Ticket.__table__, TicketUpdate.__table__)
+
+
+def _after(updates, at, event_id):
+    """Eventos depois da posição (at, event_id) na ordem (created_at, id)."""
+    return or_(updates.c.created_at > at, and_(updates.c.created_at == at, updates.c.id > event_id))
+
+
+def _load_events(db: Session, updates, ticket_id: str, after=None, until: Optional[datetime] = None):
+    q = select(updates.c.id, updates.c.event_type, updates.c.payload_json, updates.c.created_at).where(
+        updates.c.ticket_id == ticket_id
+    )
+    if after is not None:
+        q = q.where(_after(updates, *after))
+    if until is not None:
+        q = q.where(updates.c.created_at <= until)
+    return db.execute(q.order_by(updates.c.created_at, updates.c.id)).all()
+
+
+def _seed_for(db: Session, ticket_id: str, archived: bool) -> Optional[dict]:
+    tickets, updates = _tables(archived)
+    row = db.execute(select(*[tickets.c[f] for f in CREATE_FIELDS]).where(tickets.c.id == ticket_id)).first()
+    first_edit = db.execute(
+        select(updates.c.payload_json)
+        .where(updates.c.ticket_id == ticket_id, updates.c.event_type == "EDIT")
+        .order_by(updates.c.created_at, updates.c.id)
+        .limit(1)
+    ).first()
+    return legacy_seed(row, first_edit)
+
+
+def _last_snapshot(db: Session, ticket_id: str, until: Optional[datetime] = None) -> Optional[TicketSnapshot]:
+    q = db.query(TicketSnapshot).filter(TicketSnapshot.ticket_id == ticket_id)
+    if until is not None:
+        q = q.filter(TicketSnapshot.event_at <= until)
+    return q.order_by(TicketSnapshot.event_at.desc(), TicketSnapshot.event_id.desc()).first()
+
+
+# ---------- estado em um instante ----------
+def state_as_of(db: Session, ticket_id: str, ts: datetime, archived: bool = False) -> Optional[dict]:
+    """
+    Estado do chamado em `ts` (UTC). None se ainda não existia.
+    Custo: 1 snapshot (por índice) + os eventos entre ele e `ts`.
+    """
+    _, updates = _tables(archived)
+    snap = None if archived else _last_snapshot(db, ticket_id, ts)
+    if snap is not None:
+        state, base = json.loads(snap.state_json), snap.events
+        events = _load_events(db, updates, ticket_id, after=(snap.event_at, snap.event_id), until=ts)
+        seed = None
+    else:
+        state, base = None, 0
+        events = _load_events(db, updates, ticket_id, until=ts)
+        seed = _seed_for(db, ticket_id, archived) if _needs_seed(events) else None
+
+    state = replay(events, state, seed)
+    if state is None:
+        return None
+    last = events[-1] if events else None
+    return {
+        **state,
+        "id": ticket_id,
+        "as_of": _iso(ts),
+        "events": base + len(events),
+        "events_replayed": len(events),
+        "last_event_id": last.id if last else snap.event_id,
+        "snapshot_at": _iso(snap.event_at) if snap is not None else None,
+    }
+
+
+# ---------- snapshots ----------
+def snapshot_ticket(db: Session, ticket_id: str, every: int = REPLAY_SNAPSHOT_EVERY) -> int:
+    """Grava os snapshots que faltam (a cada `every` eventos). Sem commit. Retorna quantos gravou."""
+    snap = _last_snapshot(db, ticket_id)
+    if snap is not None:
+        state, done = json.loads(snap.state_json), snap.events
+        events = _load_events(db, TicketUpdate.__table__, ticket_id, after=(snap.event_at, snap.event_id))
+        seed = None
+    else:
+        state, done = None, 0
+        events = _load_events(db, TicketUpdate.__table__, ticket_id)
+        seed = _seed_for(db, ticket_id, False) if _needs_seed(events) else None
+
+    written = 0
+    for i in range(every - 1, len(events), every):
+        state = replay(events[i - every + 1:i + 1], state, seed)
+        if state is None:
+            break  # log sem CREATE: não há estado para guardar
+        e = events[i]
+        db.add(TicketSnapshot(
+            id=new_id(), ticket_id=ticket_id, event_at=e.created_at, event_id=e.id,
+            events=done + i + 1, state_json=json.dumps(state, ensure_ascii=False),
+        ))
+        written += 1
+    return written
+
+
+def snapshot_due(db: Session, every: int = REPLAY_SNAPSHOT_EVERY, batch_size: int = REPLAY_BATCH_SIZE) -> dict:
+    """Snapshot de todos os chamados com >= `every` eventos desde o último. Commit por lote."""
+    counts = (
+        select(TicketUpdate.ticket_id.label("ticket_id"), func.count().label("n"))
+        .group_by(TicketUpdate.ticket_id)
+        .subquery()
+    )
+    snaps = (
+        select(TicketSnapshot.ticket_id.label("ticket_id"), func.max(TicketSnapshot.events).label("done"))
+        .group_by(TicketSnapshot.ticket_id)
+        .subquery()
+    )
+    due = (
+        select(counts.c.ticket_id)
+        .outerjoin(snaps, snaps.c.ticket_id == counts.c.ticket_id)
+        .where(counts.c.n - func.coalesce(snaps.c.done, 0) >= every)
+        .order_by(counts.c.ticket_id)
+    )
+
+    tickets = written = 0
+    last = None
+    while True:
+        # keyset por ticket_id: chamado sem CREATE (nada a gravar) não volta no próximo lote
+        q = due if last is None else due.where(counts.c.ticket_id > last)
+        ids = db.execute(q.limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        for ticket_id in ids:
+            written += snapshot_ticket(db, ticket_id, every)
+        db.commit()
+        tickets += len(ids)
+        last = ids[-1]
+    return {"tickets": tickets, "snapshots": written}
+
+
+# ---------- checagem de consistência ----------
+def _worker_init() -> None:
+    # processo filho (fork): não reusar as conexões do pool herdado do pai
+    from app.database import engine
+    engine.dispose(close=False)
+
+
+def check_chunk(ticket_ids: list[str]) -> dict:
+    """Replay completo de cada chamado x linha em `tickets`. Roda num processo do pool."""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = {
+            r.id: r for r in db.execute(
+                select(Ticket.id, *[Ticket.__table__.c[f] for f in (*CHECKED_FIELDS, *CHECKED_PRESENCE)])
+                .where(Ticket.id.in_(ticket_ids))
+            ).all()
+        }
+        by_ticket: dict[str, list] = {}
+        for e in db.execute(
+            select(TicketUpdate.ticket_id, TicketUpdate.id, TicketUpdate.event_type, TicketUpdate.payload_json, TicketUpdate.created_at)
+            .where(TicketUpdate.ticket_id.in_(ticket_ids))
+            .order_by(TicketUpdate.ticket_id, TicketUpdate.created_at, TicketUpdate.id)
+        ):
+            by_ticket.setdefault(e.ticket_id, []).append(e)
+    finally:
+        db.close()
+
+    mismatches = []
+    for ticket_id, row in rows.items():
+        events = by_ticket.get(ticket_id, [])
+        seed = None
+        if _needs_seed(events):
+            seed = legacy_seed(row, next((e for e in events if e.event_type == "EDIT"), None))
+        state = replay(events, None, seed)
+        if state is None:
+            mismatches.append({"ticket_id": ticket_id, "field": "CREATE", "replayed": None, "current": "sem evento CREATE"})
+            continue
+        for f in CHECKED_FIELDS:
+            current = getattr(row, f)
+            if state.get(f) != current:
+                mismatches.append({"ticket_id": ticket_id, "field": f, "replayed": state.get(f), "current": current})
+        for f in CHECKED_PRESENCE:
+            current = getattr(row, f)
+            if (state.get(f) is None) != (current is None):
+                mismatches.append({"ticket_id": ticket_id, "field": f, "replayed": state.get(f), "current": _iso(current)})
+    return {"tickets": len(rows), "mismatches": mismatches}
+
+
+def check_all(db: Session, workers: Optional[int] = None, chunk: int = REPLAY_CHECK_CHUNK) -> dict:
+    """Checa a tabela `tickets` inteira, em blocos de `chunk` chamados distribuídos num pool de processos."""
+    ids = db.execute(select(Ticket.id).order_by(Ticket.id)).scalars().all()
+    chunks = [ids[i:i + chunk] for i in range(0, len(ids), chunk)]
+
+    tickets, mismatches = 0, []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+        for part in pool.map(check_chunk, chunks):
+            tickets += part["tickets"]
+            mismatches.extend(part["mismatches"])
+
+    return {
+        "tickets": tickets,
+        "inconsistent_tickets": len({m["ticket_id"] for m in mismatches}),
+        "mismatches": mismatches[:REPLAY_CHECK_MAX_REPORTED],
+    }
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    cmd, args = sys.argv[1:2], sys.argv[2:]
+    if cmd not in (["check"], ["snapshot"]):
+        print(__doc__)
+        sys.exit(0)
+    session = SessionLocal()
+    try:
+        if cmd == ["check"]:
+            out = check_all(session, int(args[0]) if args else None)
+            for m in out["mismatches"]:
+                print(f'{m["ticket_id"]} {m["field"]}: replay={m["replayed"]!r} tickets={m["current"]!r}')
+            print(f'{out["tickets"]} chamados, {out["inconsistent_tickets"]} inconsistentes')
+            sys.exit(1 if out["inconsistent_tickets"] else 0)
+        print(snapshot_due(session, int(args[0]) if args else REPLAY_SNAPSHOT_EVERY))
+    finally:
+        session.close()
@@ -0,0 +1,308 @@
+"""
+Relatórios de tempo em status e vazão.
+
+1) A cada transição, record_status_change fecha o período (span) do status
+   anterior e abre o do novo status em ticket_status_spans. Troca de técnico sem
+   mudar o status também fecha/reabre o período: o tempo fica com cada técnico.
+2) Na mesma transação o rollup diário (status_rollup_daily) é incrementado:
+   `entered` no dia em que o status começou, `completed`/`seconds` no dia em que terminou.
+3) Os relatórios (GET /admin/reports/...) só leem o rollup.
+
+Histórico anterior a este módulo (replay de ticket_updates):
+    python -m app.rollup backfill
+"""
+import json
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.catalog import catalog
+from app.models import Ticket, TicketUpdate, TicketStatusSpan, StatusRollupDaily
+from app.sla import utc_naive
+from app.ids import new_id
+
+TERMINAL_STATUSES = ("CONCLUIDO", "CANCELADO")
+DIMENSIONS = ("network_id", "store_id", "tech_id", "type", "priority")
+_KEY = ("day", "status", *DIMENSIONS)
+
+
+def _upsert_rollup(db: Session, rows: list[dict]) -> None:
+    """Soma entered/completed/seconds nas linhas do rollup (cria se não existir)."""
+    if not rows:
+        return
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        for values in rows:
+            stmt = insert(StatusRollupDaily).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(_KEY),
+                set_={
+                    "entered": StatusRollupDaily.entered + stmt.excluded.entered,
+                    "completed": StatusRollupDaily.completed + stmt.excluded.completed,
+                    "seconds": StatusRollupDaily.seconds + stmt.excluded.seconds,
+                },
+            )
+            db.execute(stmt)
+        return
+
+    for values in rows:
+        row = db.get(StatusRollupDaily, tuple(values[k] for k in _KEY))
+        if row is None:
+            db.add(StatusRollupDaily(**values))
+            db.flush()
+        else:
+            row.entered += values["entered"]
+            row.completed += values["completed"]
+            row.seconds += values["seconds"]
+
+
+def _rollup_row(span, day: date, entered: int = 0, completed: int = 0, seconds: int = 0) -> dict:
+    return {
+        "day": day,
+        "status": span.status,
+        **{d: getattr(span, d) or "" for d in DIMENSIONS},
+        "entered": entered,
+        "completed": completed,
+        "seconds": seconds,
+    }
+
+
+def _close_span(span: TicketStatusSpan, now: datetime) -> None:
+    span.ended_at = now
+    span.seconds = max(0, int((now - utc_naive(span.started_at)).total_seconds()))
+
+
+def _new_span(db: Session, t, now: datetime) -> TicketStatusSpan:
+    store = catalog.store(db, t.store_id)
+    return TicketStatusSpan(
+        id=new_id(),
+        ticket_id=t.id,
+        status=t.status,
+        started_at=now,
+        # estados finais não acumulam tempo: o período já nasce fechado
+        ended_at=now if t.status in TERMINAL_STATUSES else None,
+        seconds=0 if t.status in TERMINAL_STATUSES else None,
+        store_id=t.store_id,
+        network_id=store.network_id if store else None,
+        tech_id=t.assigned_tech_id,
+        type=t.type,
+        priority=t.priority,
+    )
+
+
+def record_status_change(
+    db: Session, t, old_status: Optional[str], now: Optional[datetime] = None, tech_changed: bool = False
+) -> None:
+    """
+    Chamar na transação da transição, depois de mudar t.status (old_status=None na criação).
+    `tech_changed`: reatribuição; fecha o período do técnico anterior mesmo sem mudar o status.
+    """
+    if old_status == t.status and not tech_changed:
+        return
+    now = now or datetime.utcnow()
+    rollups = []
+
+    if old_status is not None:
+        span = (
+            db.query(TicketStatusSpan)
+            .filter(TicketStatusSpan.ticket_id == t.id, TicketStatusSpan.ended_at.is_(None))
+            .first()
+        )
+        if span:
+            _close_span(span, now)
+            rollups.append(_rollup_row(span, now.date(), completed=1, seconds=span.seconds))
+
+    span = _new_span(db, t, now)
+    db.add(span)
+    rollups.append(_rollup_row(
+        span, now.date(), entered=1,
+        completed=1 if span.ended_at else 0,
+    ))
+    _upsert_rollup(db, rollups)
+
+
+def record_status_changes(db: Session, changes: list, now: Optional[datetime] = None) -> None:
+    """
+    record_status_change em lote (transições em massa): `changes` = [(t, old_status, old_tech_id)].
+    Um SELECT dos spans abertos de todos os chamados e o rollup somado por chave antes do upsert.
+    """
+    changes = [(t, old) for t, old, old_tech in changes if old != t.status or old_tech != t.assigned_tech_id]
+    if not changes:
+        return
+    now = now or datetime.utcnow()
+    day = now.date()
+
+    open_spans = {
+        s.ticket_id: s
+        for s in db.query(TicketStatusSpan).filter(
+            TicketStatusSpan.ticket_id.in_([t.id for t, _ in changes]),
+            TicketStatusSpan.ended_at.is_(None),
+        )
+    }
+    totals: dict[tuple, dict] = {}
+
+    def add(row: dict) -> None:
+        key = tuple(row[k] for k in _KEY)
+        acc = totals.setdefault(key, {**row, "entered": 0, "completed": 0, "seconds": 0})
+        for m in ("entered", "completed", "seconds"):
+            acc[m] += row[m]
+
+    for t, old in changes:
+        span = open_spans.get(t.id) if old is not None else None
+        if span:
+            _close_span(span, now)
+            add(_rollup_row(span, day, completed=1, seconds=span.seconds))
+        span = _new_span(db, t, now)
+        db.add(span)
+        add(_rollup_row(span, day, entered=1, completed=1 if span.ended_at else 0))
+    _upsert_rollup(db, list(totals.values()))
+
+
+# ---------- Backfill a partir de ticket_updates ----------
+def _replay_spans(db: Session, t: Ticket, updates: list[TicketUpdate]) -> list[TicketStatusSpan]:
+    spans = []
+    tech = None
+
+    def open_span(status, at):
+        state = SimpleNamespace(
+            id=t.id, status=status, store_id=t.store_id,
+            assigned_tech_id=tech, type=t.type, priority=t.priority,
+        )
+        spans.append(_new_span(db, state, at))
+
+    open_span("ABERTO", utc_naive(t.opened_at) or datetime.utcnow())
+    for u in updates:
+        payload = json.loads(u.payload_json or "{}")
+        at = utc_naive(u.created_at)
+        if u.event_type == "ASSIGN":
+            new_tech = payload["tech_id"] if "tech_id" in payload else tech
+            changed, tech = new_tech != tech, new_tech
+            current = spans[-1]
+            # reatribuição sem mudar o status; de ABERTO o STATUS_CHANGE seguinte já abre o período novo
+            if changed and at and current.ended_at is None and current.status != "ABERTO":
+                _close_span(current, at)
+                open_span(current.status, at)
+        elif u.event_type == "STATUS_CHANGE" and payload.get("to") and at:
+            current = spans[-1]
+            if current.status == payload["to"]:
+                continue
+            if current.ended_at is None:
+                _close_span(current, at)
+            open_span(payload["to"], at)
+    return spans
+
+
+def rebuild_rollups(db: Session) -> None:
+    """Recalcula o rollup inteiro a partir dos spans."""
+    db.execute(delete(StatusRollupDaily))
+    dims = [getattr(TicketStatusSpan, d) for d in DIMENSIONS]
+    agg: dict[tuple, dict] = defaultdict(lambda: {"entered": 0, "completed": 0, "seconds": 0})
+
+    for day, status, *vals, n in db.execute(
+        select(func.date(TicketStatusSpan.started_at), TicketStatusSpan.status, *dims, func.count())
+        .group_by(func.date(TicketStatusSpan.started_at), TicketStatusSpan.status, *dims)
+    ):
+        agg[(day, status, *vals)]["entered"] += n
+
+    for day, status, *vals, n, secs in db.execute(
+        select(
+            func.date(TicketStatusSpan.ended_at), TicketStatusSpan.status, *dims,
+            func.count(), func.coalesce(func.sum(TicketStatusSpan.seconds), 0),
+        )
+        .where(TicketStatusSpan.ended_at.isnot(None))
+        .group_by(func.date(TicketStatusSpan.ended_at), TicketStatusSpan.status, *dims)
+    ):
+        agg[(day, status, *vals)]["completed"] += n
+        agg[(day, status, *vals)]["seconds"] += int(secs)
+
+    for (day, status, *vals), metrics in agg.items():
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        db.add(StatusRollupDaily(
+            day=day, status=status,
+            **{d: v or "" for d, v in zip(DIMENSIONS, vals)},
+            **metrics,
+        ))
+    db.commit()
+
+
+def backfill(db: Session, batch_size: int = 200) -> int:
+    """Gera spans para chamados que ainda não têm nenhum e recalcula o rollup."""
+    has_spans = select(TicketStatusSpan.ticket_id).where(TicketStatusSpan.ticket_id == Ticket.id).exists()
+    total = 0
+    while True:
+        tickets = db.query(Ticket).filter(~has_spans).order_by(Ticket.id).limit(batch_size).all()
+        if not tickets:
+            break
+        by_ticket = defaultdict(list)
+        for u in (
+            db.query(TicketUpdate)
+            .filter(TicketUpdate.ticket_id.in_([t.id for t in tickets]))
+            .filter(TicketUpdate.event_type.in_(("ASSIGN", "STATUS_CHANGE")))
+            .order_by(TicketUpdate.created_at.asc())
+        ):
+            by_ticket[u.ticket_id].append(u)
+        for t in tickets:
+            db.add_all(_replay_spans(db, t, by_ticket[t.id]))
+        db.commit()
+        total += len(tickets)
+
+    rebuild_rollups(db)
+    return total
+
+
+# ---------- Consulta ----------
+def report(db: Session, day_from: date, day_to: date, group_by: Optional[str], status: Optional[str] = None) -> list[dict]:
+    cols = [StatusRollupDaily.status]
+    if group_by:
+        cols.append(getattr(StatusRollupDaily, group_by))
+    q = (
+        db.query(
+            *cols,
+            func.sum(StatusRollupDaily.entered),
+            func.sum(StatusRollupDaily.completed),
+            func.sum(StatusRollupDaily.seconds),
+        )
+        .filter(StatusRollupDaily.day >= day_from, StatusRollupDaily.day <= day_to)
+        .group_by(*cols)
+        .order_by(*cols)
+    )
+    if status:
+        q = q.filter(StatusRollupDaily.status == status)
+
+    out = []
+    for row in q.all():
+        st, key = row[0], (row[1] if group_by else None)
+        entered, completed, seconds = (int(x or 0) for x in row[-3:])
+        item = {
+            "status": st,
+            "entered": entered,
+            "completed": completed,
+            "avg_seconds": round(seconds / completed, 1) if completed else None,
+        }
+        if group_by:
+            item[group_by] = key or None
+        out.append(item)
+    return out
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["backfill"]:
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            print(f"{backfill(db)} chamados reprocessados")
+        finally:
+            db.close()
+    else:
+        print(__doc__)
@@ -1,25 +1,50 @@
-import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import (
     User,
+    Job,
     Store,
     ClientAccess,
     ClientNetworkAccess,
     Network,
+    Ticket,
+    TicketUpdate,
     ROLE_ADMIN,
     ROLE_TECH,
     ROLE_CLIENT,
+    ROLE_SYSTEM,
 )
 from app.schemas import (
     UserCreate, UserUpdate, UserOut,
     StoreCreate, StoreUpdate, StoreOut,
-    NetworkCreate, NetworkOut
+    NetworkCreate, NetworkOut,
+    AuditEntryOut,
+    ClientAccessBulk, ClientAccessBulkOut,
+    update_out,
 )
 from app.security import hash_password
 from app.deps import require_roles
+from app.archive import archive_closed_tickets
+from app.dispatch import dispatcher
+from app.jobs import enqueue, requeue, runner as job_runner
+from app.denorm import STORE_REWRITE_JOB, move_store_tickets, network_filter
+from app.catalog import catalog, bump_catalog_version, ACCESS_KEY
+from app.etag import catalog_etag, cache_headers, not_modified
+from app.pagination import paginate
+from app.search import prefix_match, fuzzy_contains
+from app.rollup import report as rollup_report, DIMENSIONS as ROLLUP_DIMENSIONS
+from app.ids import new_id
+from app.audit import payload_filters, payload_match
+from app.sla import utc_naive
+from app.profiling import recent_profiles, get_profile
+from app.queue_cache import queue_cache
+from app.access import apply_access, ACCESS_MODES
 
 router = APIRouter()
 
@@ -42,19 +67,29 @@ def create_network(
     if db.query(Network).filter(Network.name == name).first():
         raise HTTPException(status_code=409, detail="Rede já existe")
 
-    n = Network(id=str(uuid.uuid4()), name=name, active=True)
+    n = Network(id=new_id(), name=name, active=True)
     db.add(n)
+    version = bump_catalog_version(db)
     db.commit()
     db.refresh(n)
+    catalog.written(version, networks=[n])
     return NetworkOut(id=n.id, name=n.name, active=n.active)
 
 
 # ✅ NOVO: listar redes
 @router.get("/networks", response_model=list[NetworkOut])
 def list_networks(
-    db: Session = Depends(get_db),
-    _: User = Depends(require_roles(ROLE_ADMIN)),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(require_roles(ROLE_ADMIN)),
 ):
+    etag = catalog_etag(db, user, "admin-networks")
+    cached = not_modified(request, etag, user)
+    if cached:
+        return cached
+    response.headers.update(cache_headers(etag, user))
+
     rows = db.query(Network).order_by(Network.active.desc(), Network.name).all()
     return [NetworkOut(id=n.id, name=n.name, active=n.active) for n in rows]
 
@@ -75,7 +110,7 @@ def create_user(body: UserCreate, db: Session = Depends(get_db), _: User = Depen
         password = "040126"
 
     user = User(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         username=body.username,
         password_hash=hash_password(password),
         role=body.role,
@@ -88,13 +123,34 @@ def create_user(body: UserCreate, db: Session = Depends(get_db), _: User = Depen
     return UserOut(id=user.id, username=user.username, role=user.role, must_change_password=user.must_change_password, active=user.active)
 
 @router.get("/users", response_model=list[UserOut])
-def list_users(db: Session = Depends(get_db), _: User = Depends(require_roles(ROLE_ADMIN))):
-    rows = db.query(User).order_by(User.role, User.username).all()
+def list_users(
+    response: Response,
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+    q: Optional[str] = Query(None, description="Prefixo do username"),
+    role: Optional[str] = Query(None),
+    active: Optional[bool] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Sem limit: lista tudo"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor da página anterior"),
+):
+    query = db.query(User).filter(User.role != ROLE_SYSTEM)
+    if q and q.strip():
+        query = query.filter(prefix_match(User.username, q.strip()))
+    if role:
+        _assert_role(role)
+        query = query.filter(User.role == role)
+    if active is not None:
+        query = query.filter(User.active == active)
+
+    if limit is None:
+        rows = query.order_by(User.role, User.username).all()
+    else:
+        rows = paginate(query, [(User.role, False), (User.username, False)], cursor, limit, response)
     return [UserOut(id=u.id, username=u.username, role=u.role, must_change_password=u.must_change_password, active=u.active) for u in rows]
 
 @router.patch("/users/{user_id}", response_model=UserOut)
 def update_user(user_id: str, body: UserUpdate, db: Session = Depends(get_db), _: User = Depends(require_roles(ROLE_ADMIN))):
-    u = db.query(User).filter(User.id == user_id).first()
+    u = db.query(User).filter(User.id == user_id, User.role != ROLE_SYSTEM).first()
     if not u:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
@@ -111,6 +167,18 @@ def update_user(user_id: str, body: UserUpdate, db: Session = Depends(get_db), _
     return UserOut(id=u.id, username=u.username, role=u.role, must_change_password=u.must_change_password, active=u.active)
 
 # -------- Stores --------
+def _store_out(s: Store) -> StoreOut:
+    return StoreOut(
+        id=s.id, name=s.name, cnpj=s.cnpj, active=s.active, network_id=s.network_id,
+        latitude=s.latitude, longitude=s.longitude,
+    )
+
+
+def _check_location(lat, lon) -> None:
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="Informe latitude e longitude juntas")
+
+
 @router.post("/stores", response_model=StoreOut)
 def create_store(body: StoreCreate, db: Session = Depends(get_db), _: User = Depends(require_roles(ROLE_ADMIN))):
     if db.query(Store).filter(Store.cnpj == body.cnpj).first():
@@ -121,23 +189,60 @@ def create_store(body: StoreCreate, db: Session = Depends(get_db), _: User = Dep
         net = db.query(Network).filter(Network.id == body.network_id).first()
         if not net:
             raise HTTPException(status_code=404, detail="Rede não encontrada")
+    _check_location(body.latitude, body.longitude)
 
     s = Store(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         name=body.name,
         cnpj=body.cnpj,
         active=True,
-        network_id=body.network_id
+        network_id=body.network_id,
+        latitude=body.latitude,
+        longitude=body.longitude,
     )
     db.add(s)
+    version = bump_catalog_version(db)
     db.commit()
     db.refresh(s)
-    return StoreOut(id=s.id, name=s.name, cnpj=s.cnpj, active=s.active, network_id=s.network_id)
+    catalog.written(version, stores=[s])
+    return _store_out(s)
 
 @router.get("/stores", response_model=list[StoreOut])
-def list_stores(db: Session = Depends(get_db), _: User = Depends(require_roles(ROLE_ADMIN))):
-    rows = db.query(Store).order_by(Store.active.desc(), Store.name).all()
-    return [StoreOut(id=s.id, name=s.name, cnpj=s.cnpj, active=s.active, network_id=s.network_id) for s in rows]
+def list_stores(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(require_roles(ROLE_ADMIN)),
+    q: Optional[str] = Query(None, description="Prefixo do CNPJ ou parte do nome"),
+    active: Optional[bool] = Query(None),
+    network_id: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Sem limit: lista tudo"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor da página anterior"),
+):
+    etag = catalog_etag(db, user, "admin-stores", q, active, network_id, limit, cursor)
+    cached = not_modified(request, etag, user)
+    if cached:
+        return cached
+    response.headers.update(cache_headers(etag, user))
+
+    query = db.query(Store)
+    term = (q or "").strip()
+    if term:
+        digits = "".join(ch for ch in term if ch.isdigit())
+        if digits and len(digits) == len(term.replace(".", "").replace("/", "").replace("-", "")):
+            query = query.filter(prefix_match(Store.cnpj, term))
+        else:
+            query = query.filter(fuzzy_contains(Store.name, term))
+    if active is not None:
+        query = query.filter(Store.active == active)
+    if network_id:
+        query = query.filter(Store.network_id == network_id)
+
+    if limit is None:
+        rows = query.order_by(Store.active.desc(), Store.name).all()
+    else:
+        rows = paginate(query, [(Store.active, True), (Store.name, False), (Store.id, False)], cursor, limit, response)
+    return [_store_out(s) for s in rows]
 
 @router.patch("/stores/{store_id}", response_model=StoreOut)
 def update_store(store_id: str, body: StoreUpdate, db: Session = Depends(get_db), _: User = Depends(require_roles(ROLE_ADMIN))):
@@ -147,6 +252,7 @@ def update_store(store_id: str, body: StoreUpdate, db: Session = Depends(get_db)
     if body.cnpj is not None and body.cnpj != s.cnpj:
         if db.query(Store).filter(Store.cnpj == body.cnpj).first():
             raise HTTPException(status_code=409, detail="CNPJ já cadastrado")
+    before = (s.name, s.network_id)
 
     if body.network_id is not None:
         if body.network_id == "":
@@ -163,11 +269,22 @@ def update_store(store_id: str, body: StoreUpdate, db: Session = Depends(get_db)
         s.cnpj = body.cnpj
     if body.active is not None:
         s.active = body.active
+    if {"latitude", "longitude"} & body.model_fields_set:
+        _check_location(body.latitude, body.longitude)
+        s.latitude, s.longitude = body.latitude, body.longitude
 
     db.add(s)
+    version = bump_catalog_version(db)
+    if s.network_id != before[1]:
+        # a rede decide o acesso do CLIENT: os chamados mudam junto, no mesmo commit
+        move_store_tickets(db, s.id, s.network_id)
+    if (s.name, s.network_id) != before:
+        # nome (e a rede no arquivo) copiados nos chamados (app/denorm.py): em lotes, fora da requisição
+        enqueue(db, STORE_REWRITE_JOB, {"store_id": s.id})
     db.commit()
     db.refresh(s)
-    return StoreOut(id=s.id, name=s.name, cnpj=s.cnpj, active=s.active, network_id=s.network_id)
+    catalog.written(version, stores=[s])
+    return _store_out(s)
 
 # -------- Client ↔ Store links --------
 @router.post("/clients/{client_id}/stores/{store_id}")
@@ -182,6 +299,7 @@ def grant_store_access(client_id: str, store_id: str, db: Session = Depends(get_
     exists = db.query(ClientAccess).filter(ClientAccess.user_id==client_id, ClientAccess.store_id==store_id).first()
     if not exists:
         db.add(ClientAccess(user_id=client_id, store_id=store_id))
+        bump_catalog_version(db, ACCESS_KEY)
         db.commit()
     return {"ok": True}
 
@@ -190,6 +308,7 @@ def revoke_store_access(client_id: str, store_id: str, db: Session = Depends(get
     row = db.query(ClientAccess).filter(ClientAccess.user_id==client_id, ClientAccess.store_id==store_id).first()
     if row:
         db.delete(row)
+        bump_catalog_version(db, ACCESS_KEY)
         db.commit()
     return {"ok": True}
 
@@ -211,6 +330,7 @@ def grant_network_access(client_id: str, network_id: str, db: Session = Depends(
 
     if not exists:
         db.add(ClientNetworkAccess(user_id=client_id, network_id=network_id))
+        bump_catalog_version(db, ACCESS_KEY)
         db.commit()
 
     return {"ok": True}
@@ -224,6 +344,313 @@ def revoke_network_access(client_id: str, network_id: str, db: Session = Depends
 
     if row:
         db.delete(row)
+        bump_catalog_version(db, ACCESS_KEY)
         db.commit()
 
     return {"ok": True}
+
+# -------- Vínculos em lote (vários clientes × várias lojas/redes) --------
+def _missing_detail(message: str, ids) -> str:
+    ids = sorted(ids)
+    more = f" (+{len(ids) - 10})" if len(ids) > 10 else ""
+    return f"{message}: {', '.join(ids[:10])}{more}"
+
+
+def _bulk_access(db: Session, body: ClientAccessBulk, model, target_col, target_model, not_found: str):
+    if body.mode not in ACCESS_MODES:
+        raise HTTPException(status_code=400, detail="mode inválido (grant, revoke ou sync)")
+    if body.mode != "sync" and not body.ids:
+        raise HTTPException(status_code=400, detail="Informe ao menos um id")
+
+    client_ids, target_ids = set(body.client_ids), set(body.ids)
+    found = {
+        uid for (uid,) in db.query(User.id).filter(User.id.in_(client_ids), User.role == ROLE_CLIENT).all()
+    }
+    if found != client_ids:
+        raise HTTPException(status_code=404, detail=_missing_detail("Cliente(s) não encontrado(s)", client_ids - found))
+    if target_ids:
+        found = {tid for (tid,) in db.query(target_model.id).filter(target_model.id.in_(target_ids)).all()}
+        if found != target_ids:
+            raise HTTPException(status_code=404, detail=_missing_detail(not_found, target_ids - found))
+
+    return apply_access(db, model, target_col, list(client_ids), list(target_ids), body.mode)
+
+
+@router.post("/clients/stores/bulk", response_model=ClientAccessBulkOut)
+def bulk_store_access(body: ClientAccessBulk, db: Session = Depends(get_db), _: User = Depends(require_roles(ROLE_ADMIN))):
+    return _bulk_access(db, body, ClientAccess, ClientAccess.store_id, Store, "Loja(s) não encontrada(s)")
+
+
+@router.post("/clients/networks/bulk", response_model=ClientAccessBulkOut)
+def bulk_network_access(body: ClientAccessBulk, db: Session = Depends(get_db), _: User = Depends(require_roles(ROLE_ADMIN))):
+    return _bulk_access(db, body, ClientNetworkAccess, ClientNetworkAccess.network_id, Network, "Rede(s) não encontrada(s)")
+
+
+# -------- Arquivo (tickets encerrados antigos) --------
+@router.post("/archive/run")
+def run_archive(
+    older_than_days: Optional[int] = Query(None, ge=0, description="Padrão: ARCHIVE_AFTER_DAYS"),
+    batch_size: Optional[int] = Query(None, ge=1, le=5000),
+    max_batches: Optional[int] = Query(None, ge=1),
+    background: bool = Query(False, description="Enfileira como job em vez de rodar na requisição"),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    if background:
+        job = enqueue(db, "archive.run", {
+            "older_than_days": older_than_days,
+            "batch_size": batch_size,
+            "max_batches": max_batches,
+        })
+        db.commit()
+        return {"ok": True, "job_id": job.id}
+
+    archived = archive_closed_tickets(db, older_than_days, batch_size, max_batches)
+    return {"ok": True, "archived": archived}
+
+
+# -------- Despacho automático --------
+@router.get("/dispatch")
+def dispatch_status(_: User = Depends(require_roles(ROLE_ADMIN))):
+    return dispatcher.status()
+
+
+@router.get("/queue-cache")
+def queue_cache_status(_: User = Depends(require_roles(ROLE_ADMIN))):
+    # contadores deste worker
+    return queue_cache.stats()
+
+
+@router.post("/dispatch/run")
+def dispatch_run(
+    rebuild: bool = Query(False, description="Reconstrói a fila a partir do banco antes"),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    if not dispatcher.running:
+        # desligado, ou outro worker tem o lock: um segundo dispatcher teria fila e cargas próprias
+        raise HTTPException(status_code=409, detail="Despacho automático não roda neste worker")
+    if rebuild:
+        dispatcher.rebuild(db)
+    assigned = dispatcher.run_once(db)
+    return {"ok": True, "assigned": assigned, **dispatcher.status()}
+
+
+# -------- Jobs em background --------
+@router.get("/jobs")
+def jobs_status(
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    counts = (
+        db.query(Job.type, Job.status, func.count(Job.id))
+        .group_by(Job.type, Job.status)
+        .order_by(Job.type, Job.status)
+        .all()
+    )
+    failed = (
+        db.query(Job)
+        .filter(Job.status == "FAILED")
+        .order_by(Job.finished_at.desc())
+        .limit(20)
+        .all()
+    )
+    return {
+        "runner": job_runner.status(),
+        "counts": [{"type": t, "status": st, "count": n} for t, st, n in counts],
+        "failed": [
+            {
+                "id": j.id, "type": j.type, "attempts": j.attempts,
+                "finished_at": j.finished_at.isoformat() if j.finished_at else None,
+                "last_error": j.last_error,
+            }
+            for j in failed
+        ],
+    }
+
+
+@router.post("/jobs/{job_id}/retry")
+def retry_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    if job.status != "FAILED":
+        raise HTTPException(status_code=409, detail="Só jobs FAILED podem ser reenfileirados")
+
+    requeue(db, job)
+    db.commit()
+    return {"ok": True}
+
+
+# -------- Relatórios (leem só o rollup diário) --------
+def _report_range(date_from: Optional[date], date_to: Optional[date]) -> tuple[date, date]:
+    day_to = date_to or datetime.utcnow().date()
+    day_from = date_from or day_to - timedelta(days=30)
+    if day_from > day_to:
+        raise HTTPException(status_code=400, detail="date_from maior que date_to")
+    return day_from, day_to
+
+
+def _check_group_by(group_by: Optional[str]) -> None:
+    if group_by and group_by not in ROLLUP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by inválido (use {', '.join(ROLLUP_DIMENSIONS)})")
+
+
+@router.get("/reports/time-in-status")
+def report_time_in_status(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    group_by: Optional[str] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    _check_group_by(group_by)
+    day_from, day_to = _report_range(date_from, date_to)
+    return {
+        "date_from": day_from.isoformat(),
+        "date_to": day_to.isoformat(),
+        "group_by": group_by,
+        "items": rollup_report(db, day_from, day_to, group_by, status),
+    }
+
+
+@router.get("/reports/throughput")
+def report_throughput(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    group_by: Optional[str] = Query("tech_id"),
+    db: Session = Depends(get_read_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    # vazão = chamados que entraram em CONCLUIDO no período
+    _check_group_by(group_by)
+    day_from, day_to = _report_range(date_from, date_to)
+    items = rollup_report(db, day_from, day_to, group_by, "CONCLUIDO")
+    return {
+        "date_from": day_from.isoformat(),
+        "date_to": day_to.isoformat(),
+        "group_by": group_by,
+        "items": [
+            {**({group_by: i[group_by]} if group_by else {}), "closed": i["entered"]}
+            for i in items
+        ],
+    }
+
+
+@router.post("/reports/backfill")
+def report_backfill(
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    job = enqueue(db, "rollup.backfill")
+    db.commit()
+    return {"ok": True, "job_id": job.id}
+
+
+# -------- Replay (snapshots do log de eventos) --------
+@router.post("/replay/snapshots")
+def replay_snapshots(
+    every: Optional[int] = Query(None, ge=1, le=10000, description="Padrão: REPLAY_SNAPSHOT_EVERY"),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    job = enqueue(db, "replay.snapshots", {"every": every})
+    db.commit()
+    return {"ok": True, "job_id": job.id}
+
+
+# -------- Auditoria --------
+@router.get("/audit", response_model=list[AuditEntryOut])
+def audit_log(
+    request: Request,
+    response: Response,
+    user_id: Optional[str] = Query(None, description="Autor do evento"),
+    event_type: Optional[str] = Query(None, description="Ex.: ASSIGN, STATUS_CHANGE"),
+    network_id: Optional[str] = None,
+    store_id: Optional[str] = None,
+    date_from: Optional[datetime] = Query(None, description="created_at >= (UTC)"),
+    date_to: Optional[datetime] = Query(None, description="created_at < (UTC)"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor da página anterior"),
+    db: Session = Depends(get_read_db),
+    _: User = Depends(require_roles(ROLE_ADMIN)),
+):
+    """
+    Eventos de todos os chamados (tabela quente), do mais novo para o mais antigo.
+    Filtro de payload: `?payload.<campo>=<valor>`, ex.: `?payload.to=CONCLUIDO`.
+    """
+    try:
+        payload = payload_filters(request.query_params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = db.query(TicketUpdate)
+    if user_id:
+        query = query.filter(TicketUpdate.created_by_user_id == user_id)
+    if event_type:
+        query = query.filter(TicketUpdate.event_type == event_type.strip().upper())
+    if date_from:
+        query = query.filter(TicketUpdate.created_at >= utc_naive(date_from))
+    if date_to:
+        query = query.filter(TicketUpdate.created_at < utc_naive(date_to))
+    if store_id or network_id:
+        query = query.join(Ticket, Ticket.id == TicketUpdate.ticket_id)
+        if store_id:
+            query = query.filter(Ticket.store_id == store_id)
+        if network_id:
+            query = query.filter(network_filter(network_id))
+    for cond in payload_match(db.get_bind().dialect.name, payload):
+        query = query.filter(cond)
+
+    rows = paginate(query, [(TicketUpdate.created_at, True), (TicketUpdate.id, True)], cursor, limit, response)
+
+    # autor e loja em lote (uma consulta cada), não por linha
+    ticket_ids = {u.ticket_id for u in rows}
+    user_ids = {u.created_by_user_id for u in rows}
+    stores_by_ticket = {
+        tid: (sid, nid)
+        for tid, sid, nid in db.query(Ticket.id, Ticket.store_id, Ticket.network_id).filter(Ticket.id.in_(ticket_ids))
+    } if ticket_ids else {}
+    usernames = dict(db.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+
+    out = []
+    for u in rows:
+        sid, nid = stores_by_ticket.get(u.ticket_id, (None, None))
+        out.append(AuditEntryOut(
+            **update_out(u).model_dump(),
+            username=usernames.get(u.created_by_user_id),
+            store_id=sid,
+            network_id=nid,
+        ))
+    return out
+
+
+# -------- Profiler --------
+@router.get("/profiles")
+def list_profiles(_: User = Depends(require_roles(ROLE_ADMIN))):
+    # buffer em memória do worker que atendeu esta requisição
+    return [p.summary() for p in recent_profiles()]
+
+
+def _profile_or_404(profile_id: str):
+    p = get_profile(profile_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado (fora do buffer ou em outro worker)")
+    return p
+
+
+@router.get("/profiles/{profile_id}")
+def profile_detail(profile_id: str, _: User = Depends(require_roles(ROLE_ADMIN))):
+    return _profile_or_404(profile_id).detail()
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+def profile_collapsed(profile_id: str, _: User = Depends(require_roles(ROLE_ADMIN))):
+    """Pilhas colapsadas: arrastar para speedscope.app ou `flamegraph.pl perfil.txt > perfil.svg`."""
+    p = _profile_or_404(profile_id)
+    return PlainTextResponse(p.collapsed(), headers={"Content-Disposition": f'inline; filename="profile-{p.id}.txt"'})
@@ -0,0 +1,271 @@
+from datetime import datetime
+from pathlib import PurePath
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from app.database import get_db, get_read_db
+from app.models import Ticket, TicketAttachment, User, ROLE_ADMIN, ROLE_TECH
+from app.schemas import AttachmentCreate, AttachmentOut
+from app.deps import get_current_user
+from app.storage import storage, StorageLimitExceeded
+from app.jobs import enqueue
+from app.attachments import (
+    ATTACHMENTS_MAX_BYTES, ATTACHMENTS_CHUNK_BYTES, ATTACHMENTS_ACCEL_PREFIX,
+    ATTACHMENT_KINDS, ATTACHMENT_CONTENT_TYPES, IMAGE_CONTENT_TYPES, VARIANTS,
+    UPLOAD_OFFSET_HEADER, UPLOAD_LENGTH_HEADER,
+    storage_key, variant_key,
+)
+from app.routers.tickets import add_update, ensure_can_view_ticket, ensure_assigned_to_user, _ticket_row
+from app.ids import new_id
+
+router = APIRouter()
+
+
+def _attachment_out(a: TicketAttachment) -> AttachmentOut:
+    return AttachmentOut(
+        id=a.id, ticket_id=a.ticket_id, update_id=a.update_id,
+        uploaded_by_user_id=a.uploaded_by_user_id, kind=a.kind,
+        filename=a.filename, content_type=a.content_type,
+        size=a.size, received=a.received, status=a.status,
+        variants_status=a.variants_status, width=a.width, height=a.height,
+        created_at=a.created_at.isoformat() if a.created_at else None,
+        completed_at=a.completed_at.isoformat() if a.completed_at else None,
+        chunk_size=ATTACHMENTS_CHUNK_BYTES if a.status == "UPLOADING" else None,
+    )
+
+
+def _upload_headers(a: TicketAttachment) -> dict:
+    return {UPLOAD_OFFSET_HEADER: str(a.received), UPLOAD_LENGTH_HEADER: str(a.size)}
+
+
+def _ensure_can_upload(db: Session, user: User, ticket_id: str) -> Ticket:
+    t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+    if not t:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    if user.role == ROLE_ADMIN:
+        return t
+    if user.role != ROLE_TECH:
+        raise HTTPException(status_code=403, detail="Sem permissão")
+    ensure_assigned_to_user(t, user)
+    return t
+
+
+def _get_attachment(db: Session, ticket_id: str, attachment_id: str) -> TicketAttachment:
+    a = (
+        db.query(TicketAttachment)
+        .filter(TicketAttachment.id == attachment_id, TicketAttachment.ticket_id == ticket_id)
+        .first()
+    )
+    if not a:
+        raise HTTPException(status_code=404, detail="Anexo não encontrado")
+    return a
+
+
+def _ensure_can_view(db: Session, user: User, ticket_id: str) -> None:
+    row, _ = _ticket_row(db, ticket_id, ["id", "store_id"])
+    if not row:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    ensure_can_view_ticket(db, user, row)
+
+
+def _load_for_upload(db: Session, user: User, ticket_id: str, attachment_id: str) -> TicketAttachment:
+    a = _get_attachment(db, ticket_id, attachment_id)
+    if user.role != ROLE_ADMIN and a.uploaded_by_user_id != user.id:
+        raise HTTPException(status_code=403, detail="Anexo enviado por outro usuário")
+    if a.status != "UPLOADING":
+        raise HTTPException(status_code=409, detail="Upload já concluído", headers=_upload_headers(a))
+    return a
+
+
+def _advance(db: Session, user: User, a: TicketAttachment, offset: int, new_offset: int) -> TicketAttachment:
+    """Confirma os bytes gravados; só avança se ninguém confirmou outro chunk nesse meio tempo."""
+    moved = (
+        db.query(TicketAttachment)
+        .filter(
+            TicketAttachment.id == a.id,
+            TicketAttachment.received == offset,
+            TicketAttachment.status == "UPLOADING",
+        )
+        .update({TicketAttachment.received: new_offset}, synchronize_session=False)
+    )
+    if not moved:
+        db.rollback()
+        db.refresh(a)
+        raise HTTPException(status_code=409, detail="Upload-Offset desatualizado", headers=_upload_headers(a))
+
+    if new_offset == a.size:
+        a.status = "READY"
+        a.completed_at = datetime.utcnow()
+        u = add_update(
+            db, a.ticket_id, user.id, "ATTACHMENT", note=a.filename,
+            payload={"attachment_id": a.id, "kind": a.kind, "content_type": a.content_type, "size": a.size},
+        )
+        a.update_id = u.id
+        if a.content_type in IMAGE_CONTENT_TYPES:
+            a.variants_status = "PENDING"
+            enqueue(db, "attachments.variants", {"attachment_id": a.id})
+    db.commit()
+    db.refresh(a)
+    return a
+
+
+# ---------- Criação do upload ----------
+@router.post("/{ticket_id}/attachments", response_model=AttachmentOut, status_code=201)
+def create_attachment(
+    ticket_id: str,
+    body: AttachmentCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    t = _ensure_can_upload(db, user, ticket_id)
+
+    kind = body.kind.strip().upper()
+    if kind not in ATTACHMENT_KINDS:
+        raise HTTPException(status_code=400, detail="kind inválido (ANTES, DEPOIS ou OUTRO)")
+    content_type = body.content_type.strip().lower()
+    if content_type not in ATTACHMENT_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail="Tipo de arquivo não suportado")
+    if body.size > ATTACHMENTS_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Arquivo maior que {ATTACHMENTS_MAX_BYTES} bytes")
+
+    attachment_id = new_id()
+    a = TicketAttachment(
+        id=attachment_id,
+        ticket_id=t.id,
+        uploaded_by_user_id=user.id,
+        kind=kind,
+        filename=PurePath(body.filename.replace("\\", "/")).name or "arquivo",
+        content_type=content_type,
+        size=body.size,
+        received=0,
+        status="UPLOADING",
+        storage_key=storage_key(t.id, attachment_id),
+        created_at=datetime.utcnow(),
+    )
+    db.add(a)
+    db.commit()
+    db.refresh(a)
+
+    response.headers.update(_upload_headers(a))
+    return _attachment_out(a)
+
+
+# ---------- Envio dos pedaços (retomável) ----------
+@router.head("/{ticket_id}/attachments/{attachment_id}")
+def upload_offset(
+    ticket_id: str,
+    attachment_id: str,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    a = _get_attachment(db, ticket_id, attachment_id)
+    if user.role != ROLE_ADMIN and a.uploaded_by_user_id != user.id:
+        raise HTTPException(status_code=403, detail="Anexo enviado por outro usuário")
+    return Response(headers={**_upload_headers(a), "Cache-Control": "no-store"})
+
+
+@router.patch("/{ticket_id}/attachments/{attachment_id}", response_model=AttachmentOut)
+async def upload_chunk(
+    ticket_id: str,
+    attachment_id: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Corpo = bytes crus do pedaço, a partir de Upload-Offset (gravado em disco conforme chega)."""
+    try:
+        offset = int(request.headers.get(UPLOAD_OFFSET_HEADER, ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Header {UPLOAD_OFFSET_HEADER} obrigatório")
+
+    a = await run_in_threadpool(_load_for_upload, db, user, ticket_id, attachment_id)
+    if offset != a.received:
+        raise HTTPException(status_code=409, detail="Upload-Offset desatualizado", headers=_upload_headers(a))
+
+    try:
+        written = await storage.write_at(a.storage_key, offset, request.stream(), a.size - offset)
+    except StorageLimitExceeded:
+        raise HTTPException(status_code=413, detail="Pedaço passa do tamanho declarado do arquivo")
+    except ClientDisconnect:
+        # nada é confirmado: o app consulta o HEAD e reenvia a partir do último offset
+        raise HTTPException(status_code=400, detail="Upload interrompido")
+
+    a = await run_in_threadpool(_advance, db, user, a, offset, offset + written)
+    response.headers.update(_upload_headers(a))
+    return _attachment_out(a)
+
+
+# ---------- Consulta ----------
+@router.get("/{ticket_id}/attachments", response_model=list[AttachmentOut])
+def list_attachments(
+    ticket_id: str,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    _ensure_can_view(db, user, ticket_id)
+    rows = (
+        db.query(TicketAttachment)
+        .filter(TicketAttachment.ticket_id == ticket_id)
+        .order_by(TicketAttachment.created_at.asc())
+        .all()
+    )
+    return [_attachment_out(a) for a in rows]
+
+
+@router.get("/{ticket_id}/attachments/{attachment_id}", response_model=AttachmentOut)
+def get_attachment(
+    ticket_id: str,
+    attachment_id: str,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    _ensure_can_view(db, user, ticket_id)
+    return _attachment_out(_get_attachment(db, ticket_id, attachment_id))
+
+
+@router.get("/{ticket_id}/attachments/{attachment_id}/content")
+def download_attachment(
+    ticket_id: str,
+    attachment_id: str,
+    variant: str = Query("original", description="original | thumb | medium"),
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    _ensure_can_view(db, user, ticket_id)
+    a = _get_attachment(db, ticket_id, attachment_id)
+    if a.status != "READY":
+        raise HTTPException(status_code=409, detail="Upload ainda não concluído")
+    if variant != "original" and variant not in VARIANTS:
+        raise HTTPException(status_code=400, detail="variant inválida")
+    if variant != "original" and a.variants_status != "READY":
+        raise HTTPException(status_code=404, detail="Versão reduzida indisponível")
+
+    key = variant_key(a, variant)
+    if variant == "original":
+        media_type, filename = a.content_type, a.filename
+    else:
+        media_type, filename = "image/jpeg", f"{PurePath(a.filename).stem}-{variant}.jpg"
+
+    # conteúdo imutável; a rota fica fora do gzip/brotli (compression.UNCOMPRESSED_PATHS)
+    headers = {"Cache-Control": "private, max-age=86400, immutable"}
+
+    if ATTACHMENTS_ACCEL_PREFIX:
+        # nginx entrega com sendfile (e trata Range) a partir do location interno
+        return Response(
+            media_type=media_type,
+            headers={**headers, "X-Accel-Redirect": f"{ATTACHMENTS_ACCEL_PREFIX.rstrip('/')}/{key}"},
+        )
+
+    path = storage.local_path(key)
+    if not path or not storage.exists(key):
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    return FileResponse(
+        path, media_type=media_type, filename=filename,
+        content_disposition_type="inline", headers=headers,
+    )
@@ -1,16 +1,30 @@
-import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.deps import get_current_user, require_roles
 from app.models import Network, Store, ClientAccess, User, ROLE_ADMIN, ROLE_TECH, ROLE_CLIENT
 from app.schemas import NetworkCreate, NetworkOut
+from app.catalog import catalog, bump_catalog_version
+from app.etag import catalog_etag, cache_headers, not_modified
+from app.ids import new_id
 
 router = APIRouter()
 
 @router.get("/", response_model=list[NetworkOut])
-def list_networks(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def list_networks(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    # ✅ GET condicional: 304 sem rodar a listagem
+    etag = catalog_etag(db, user, "networks")
+    cached = not_modified(request, etag, user)
+    if cached:
+        return cached
+    response.headers.update(cache_headers(etag, user))
+
     # ADMIN/TECH: vê todas
     if user.role in (ROLE_ADMIN, ROLE_TECH):
         rows = db.query(Network).order_by(Network.active.desc(), Network.name.asc()).all()
@@ -43,8 +57,10 @@ def create_network(
     if exists:
         raise HTTPException(status_code=409, detail="Já existe uma rede com esse nome")
 
-    n = Network(id=str(uuid.uuid4()), name=name, active=True)
+    n = Network(id=new_id(), name=name, active=True)
     db.add(n)
+    version = bump_catalog_version(db)
     db.commit()
     db.refresh(n)
+    catalog.written(version, networks=[n])
     return NetworkOut(id=n.id, name=n.name, active=n.active)
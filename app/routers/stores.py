@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
-from app.database import get_db
+from app.database import get_read_db
 from app.models import (
     Store,
     ClientAccess,
@@ -14,17 +15,31 @@ from app.models import (
 )
 from app.schemas import StoreOut
 from app.deps import get_current_user
+from app.fields import parse_fields, project
+from app.etag import catalog_etag, cache_headers, not_modified
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[StoreOut])
 def list_stores(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
     network_id: str | None = Query(None, description="Filtrar por rede (network_id)"),
+    fields: str | None = Query(None, description="Campos do StoreOut, separados por vírgula"),
 ):
-    q = db.query(Store)
+    cols = parse_fields(fields, StoreOut.model_fields)
+
+    # ✅ GET condicional: 304 sem rodar a listagem
+    etag = catalog_etag(db, user, "stores", network_id, fields)
+    cached = not_modified(request, etag, user)
+    if cached:
+        return cached
+    response.headers.update(cache_headers(etag, user))
+
+    q = db.query(*[getattr(Store, f) for f in cols]) if cols else db.query(Store)
 
     # Filtro por rede (quando seleciona uma rede no filtro)
     if network_id:
@@ -33,6 +48,8 @@ def list_stores(
     # ADMIN/TECH: veem todas (ou filtradas)
     if user.role in (ROLE_ADMIN, ROLE_TECH):
         rows = q.order_by(Store.active.desc(), Store.name).all()
+        if cols:
+            return JSONResponse([project(s, cols) for s in rows], headers=cache_headers(etag, user))
         return [StoreOut(id=s.id, name=s.name, cnpj=s.cnpj, active=s.active) for s in rows]
 
     # CLIENT: lojas por acesso direto OU por rede
@@ -57,4 +74,6 @@ def list_stores(
         .all()
     )
 
+    if cols:
+        return JSONResponse([project(s, cols) for s in rows], headers=cache_headers(etag, user))
     return [StoreOut(id=s.id, name=s.name, cnpj=s.cnpj, active=s.active) for s in rows]
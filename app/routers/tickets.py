@@ -1,23 +1,47 @@
-import uuid, json
-from datetime import datetime
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_  # ✅ adiciona or_
+from sqlalchemy import and_, or_, func, select  # ✅ adiciona or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.database import get_db
+from app.database import get_db, get_read_db, read_source
 from app.models import (
-    Ticket, TicketUpdate, TicketClosure,
+    Ticket, TicketUpdate, TicketClosure, TicketSyncAction,
     Store, ClientAccess, ClientNetworkAccess, User,  # ✅ inclui ClientNetworkAccess
-    ROLE_ADMIN, ROLE_TECH, ROLE_CLIENT
+    ROLE_ADMIN, ROLE_TECH, ROLE_CLIENT,
+    tickets_archive, ticket_updates_archive, ticket_closures_archive,
 )
 from app.schemas import (
-    TicketCreate, TicketOut, TicketDetail,
-    AssignRequest, CommentRequest, CloseRequest, StatusRequest, TicketUpdateOut
+    TicketCreate, TicketOut, TicketDetail, TicketAsOfOut,
+    AssignRequest, CommentRequest, CloseRequest, StatusRequest, TicketUpdateOut,
+    TicketWithUpdates, TicketBatchOut,
+    SyncActionIn, SyncRequest, SyncActionResult, SyncResponse,
+    TicketBulkTransition, TicketBulkTransitionOut,
+    TicketNearbyOut, RouteStopOut,
+    update_out,
 )
 from app.deps import get_current_user
+from app.fields import parse_fields, project
+from app.catalog import catalog
+from app.etag import etag_matches
+from app.sla import apply_sla, sla_transition, utc_naive, SLA_AT_RISK_MINUTES
+from app.rollup import record_status_change
+from app.dispatch import dispatcher, DISPATCH_ENABLED
+from app.archive import find_archived_ticket, find_archived_closure, list_archived_updates
+from app.ids import new_id
+from app.geo import route_order, haversine_km
+from app.queue_cache import queue_cache, touch as touch_queue, QUEUE_SCOPE, mine_scope
+from app.replay import state_as_of
+from app.transitions import BULK_ACTIONS, apply_bulk_transition, bulk_filter
+from app.denorm import network_filter, ticket_network_id
 
 router = APIRouter()
 
@@ -25,6 +49,8 @@ VALID_STATUSES = {"ABERTO","ATRIBUIDO","EM_ATENDIMENTO","PENDENTE","CONCLUIDO","
 VALID_PRIORITIES = {"NORMAL", "URGENTE"}
 VALID_TYPES = {"REPARO", "SUPORTE", "VISITA", "OUTRO"}  # ajuste se você tiver outros tipos
 
+_ticket_list_adapter = TypeAdapter(list[TicketOut])
+
 
 def add_update(
     db: Session,
@@ -32,27 +58,39 @@ def add_update(
     user_id: str,
     event_type: str,
     note: Optional[str] = None,
-    payload: Optional[dict] = None
+    payload: Optional[dict] = None,
+    created_at: Optional[datetime] = None,
 ):
-    db.add(TicketUpdate(
-        id=str(uuid.uuid4()),
+    u = TicketUpdate(
+        id=new_id(),
         ticket_id=ticket_id,
         created_by_user_id=user_id,
         event_type=event_type,
         note=note,
         payload_json=json.dumps(payload or {}, ensure_ascii=False),
-    ))
+    )
+    # relógio da API, com microssegundos (o cursor da auditoria ordena por created_at, id);
+    # só o CREATE passa o opened_at do próprio chamado
+    u.created_at = created_at if created_at is not None else datetime.utcnow()
+    db.add(u)
+    return u
 
 
-def ensure_store_access_for_client(db: Session, user: User, store_id: str):
+def client_store_ids_with_access(db: Session, user: User, store_ids) -> set[str]:
     """
     ✅ Agora o CLIENT tem acesso se:
     - vínculo direto em client_access
     OU
     - vínculo por rede em client_network_access (rede da loja)
+
+    Resolve o conjunto inteiro em uma query (usado também no batch).
     """
-    ok = (
-        db.query(Store)
+    store_ids = set(store_ids)
+    if not store_ids:
+        return set()
+
+    rows = (
+        db.query(Store.id)
         .outerjoin(
             ClientAccess,
             (ClientAccess.store_id == Store.id) & (ClientAccess.user_id == user.id),
@@ -61,17 +99,20 @@ def ensure_store_access_for_client(db: Session, user: User, store_id: str):
             ClientNetworkAccess,
             (ClientNetworkAccess.network_id == Store.network_id) & (ClientNetworkAccess.user_id == user.id),
         )
-        .filter(Store.id == store_id)
+        .filter(Store.id.in_(store_ids))
         .filter(
             or_(
                 ClientAccess.user_id.isnot(None),
                 ClientNetworkAccess.user_id.isnot(None),
             )
         )
-        .first()
+        .all()
     )
+    return {r[0] for r in rows}
+
 
-    if not ok:
+def ensure_store_access_for_client(db: Session, user: User, store_id: str):
+    if store_id not in client_store_ids_with_access(db, user, [store_id]):
         raise HTTPException(status_code=403, detail="Sem permissão para esta loja")
 
 
@@ -81,6 +122,23 @@ def ensure_can_view_ticket(db: Session, user: User, ticket: Ticket) -> None:
     ensure_store_access_for_client(db, user, ticket.store_id)
 
 
+def get_ticket_or_archived(db: Session, ticket_id: str):
+    """Busca na tabela quente e, se não achar, no arquivo. Retorna (ticket, archived)."""
+    t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+    if t:
+        return t, False
+    return find_archived_ticket(db, ticket_id), True
+
+
+def _ticket_row(db: Session, ticket_id: str, names):
+    """Lê só as colunas `names` do ticket (tabela quente, depois arquivo). Retorna (row, archived)."""
+    for table, archived in ((Ticket.__table__, False), (tickets_archive, True)):
+        row = db.execute(select(*[table.c[n] for n in names]).where(table.c.id == ticket_id)).first()
+        if row:
+            return row, archived
+    return None, False
+
+
 def ensure_assigned_to_user(ticket: Ticket, user: User):
     if ticket.assigned_tech_id != user.id:
         raise HTTPException(status_code=403, detail="Chamado não atribuído a você")
@@ -97,6 +155,76 @@ class TicketEditRequest(BaseModel):
         extra = "forbid"
 
 
+def ticket_out(t, store_name: Optional[str]) -> TicketOut:
+    return TicketOut(
+        id=t.id, store_id=t.store_id, store_name=store_name, network_id=getattr(t, "network_id", None),
+        status=t.status,
+        problem=t.problem, type=t.type, priority=t.priority,
+        requester_name=t.requester_name, local=t.local,
+        assigned_tech_id=t.assigned_tech_id,
+        opened_at=t.opened_at.isoformat() if t.opened_at else None,
+        updated_at=t.updated_at.isoformat() if t.updated_at else None,
+        sla_due_at=t.sla_due_at.isoformat() if t.sla_due_at else None,
+        sla_kind=t.sla_kind,
+        version=getattr(t, "version", None),
+    )
+
+
+# ---------- Concorrência otimista (Ticket.version ↔ ETag / If-Match) ----------
+# Sem If-Match a escrita passa (apps antigos); o UPDATE ainda vai com "WHERE version = ?",
+# então duas escritas simultâneas nunca se sobrescrevem: a segunda leva 412.
+TICKET_REQUIRE_IF_MATCH = os.getenv("TICKET_REQUIRE_IF_MATCH", "false").lower() == "true"
+
+
+def ticket_etag(t) -> str:
+    return f'"{t.version}"'
+
+
+def _version_conflict(db: Session, t: Ticket) -> HTTPException:
+    current = ticket_out(t, catalog.store_name(db, t.store_id))
+    return HTTPException(
+        status_code=412,
+        detail={
+            "message": "Chamado alterado por outra pessoa; confira o estado atual e reenvie com o ETag novo",
+            "ticket": current.model_dump(),
+        },
+        headers={"ETag": ticket_etag(t)},
+    )
+
+
+def check_if_match(request: Request, db: Session, t: Ticket) -> None:
+    """Antes de alterar: If-Match tem que ser o ETag da versão lida (ou *)."""
+    raw = request.headers.get("if-match")
+    if raw is None:
+        if TICKET_REQUIRE_IF_MATCH:
+            raise HTTPException(status_code=428, detail="Envie If-Match com o ETag do chamado")
+        return
+    if not etag_matches(raw, ticket_etag(t)):
+        raise _version_conflict(db, t)
+
+
+@contextmanager
+def versioned_write(db: Session, t: Ticket):
+    """Alteração + commit: se outro commit trocou a versão no meio (StaleDataError), 412."""
+    try:
+        yield
+    except StaleDataError:
+        db.rollback()  # expira `t`: o 412 sai com o estado já commitado pelo outro
+        raise _version_conflict(db, t)
+
+
+def _latest_updates(db: Session, table, ticket_ids, per_ticket: int):
+    """Últimos N eventos de cada ticket, numa única query (ROW_NUMBER por ticket)."""
+    rn = func.row_number().over(
+        partition_by=table.c.ticket_id,
+        order_by=table.c.created_at.desc(),
+    ).label("rn")
+    sub = select(table, rn).where(table.c.ticket_id.in_(ticket_ids)).subquery()
+    return db.execute(
+        select(sub).where(sub.c.rn <= per_ticket).order_by(sub.c.ticket_id, sub.c.created_at.asc())
+    ).all()
+
+
 def _norm_str(v: Optional[str]) -> Optional[str]:
     if v is None:
         return None
@@ -114,8 +242,8 @@ def create_ticket(
     if user.role != ROLE_ADMIN:
         raise HTTPException(status_code=403, detail="Apenas admin cria chamado")
 
-    store = db.query(Store).filter(Store.id == body.store_id, Store.active == True).first()
-    if not store:
+    store = catalog.store(db, body.store_id)
+    if not store or not store.active:
         raise HTTPException(status_code=404, detail="Loja não encontrada/ativa")
 
     # enums ou string
@@ -123,8 +251,10 @@ def create_ticket(
     ticket_priority = body.priority.value if hasattr(body.priority, "value") else body.priority
 
     t = Ticket(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         store_id=body.store_id,
+        network_id=store.network_id,
+        store_name=store.name,
         opened_by_admin_id=user.id,
         requester_name=body.requester_name,
         local=body.local,
@@ -135,26 +265,29 @@ def create_ticket(
         opened_at=datetime.utcnow(),
         updated_at=datetime.utcnow(),
     )
+    apply_sla(t)
     db.add(t)
+    record_status_change(db, t, None)
+    touch_queue(db, t)
     db.commit()
 
-    add_update(db, t.id, user.id, "CREATE", note="Chamado criado", payload={"status": "ABERTO"})
+    # campos iniciais no evento: o replay (app/replay.py) reconstrói o chamado só pelo log
+    add_update(db, t.id, user.id, "CREATE", note="Chamado criado", payload={
+        "status": "ABERTO", "store_id": t.store_id, "requester_name": t.requester_name,
+        "local": t.local, "problem": t.problem, "type": t.type, "priority": t.priority,
+    }, created_at=t.opened_at)
     db.commit()
 
-    return TicketOut(
-        id=t.id, store_id=t.store_id, store_name=store.name, status=t.status,
-        problem=t.problem, type=t.type, priority=t.priority,
-        requester_name=t.requester_name, local=t.local,
-        assigned_tech_id=t.assigned_tech_id,
-        opened_at=t.opened_at.isoformat() if t.opened_at else None,
-        updated_at=t.updated_at.isoformat() if t.updated_at else None,
-    )
+    if DISPATCH_ENABLED:
+        dispatcher.enqueue(t)
+
+    return ticket_out(t, store.name)
 
 
 # ---------- List (by role + filters) ----------
 @router.get("/", response_model=list[TicketOut])
 def list_tickets(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
     open_only: bool = Query(False, description="Somente ABERTO e sem técnico (fila)"),
     mine_only: bool = Query(False, description="Somente tickets do técnico logado"),
@@ -162,18 +295,35 @@ def list_tickets(
     network_id: Optional[str] = Query(None, description="Filtrar por rede (network_id)"),
     store_id: Optional[str] = Query(None, description="Filtrar por loja (store_id)"),
     limit: int = Query(200, ge=1, le=500),
+    fields: Optional[str] = Query(None, description="Campos do TicketOut, separados por vírgula"),
 ):
     if status and status not in VALID_STATUSES:
         raise HTTPException(status_code=400, detail="status inválido")
+    cols = parse_fields(fields, TicketOut.model_fields)
+
+    # ✅ fila do técnico: mesma resposta para todos por alguns segundos (ver app/queue_cache.py)
+    if user.role == ROLE_TECH and (open_only or mine_only):
+        scope = QUEUE_SCOPE if open_only else mine_scope(user.id)
+        # primário x réplica: quem está grudado no primário (read-your-writes) não recebe o que veio da réplica
+        key = (scope, read_source(db), status, network_id, store_id, limit, tuple(cols or ()))
+        body = queue_cache.get_or_compute(key, lambda: _render_ticket_list(
+            _list_query(db, user, open_only, mine_only, status, network_id, store_id), cols, limit,
+        ))
+        return Response(content=body, media_type="application/json")
+
+    q = _list_query(db, user, open_only, mine_only, status, network_id, store_id)
+    return Response(content=_render_ticket_list(q, cols, limit), media_type="application/json")
 
-    # traz Store.name
-    q = db.query(Ticket, Store.name).join(Store, Store.id == Ticket.store_id)
+
+def _list_query(db: Session, user: User, open_only: bool, mine_only: bool, status, network_id, store_id):
+    # nome da loja e rede vêm do próprio chamado (app/denorm.py): sem JOIN em stores
+    q = db.query(Ticket)
 
     # ✅ filtro por loja OU por rede:
     if store_id:
         q = q.filter(Ticket.store_id == store_id)
     elif network_id:
-        q = q.filter(Store.network_id == network_id)
+        q = q.filter(network_filter(network_id))
 
     # ✅ CLIENT: acesso direto OU por rede
     if user.role == ROLE_CLIENT:
@@ -184,7 +334,7 @@ def list_tickets(
             )
             .outerjoin(
                 ClientNetworkAccess,
-                (ClientNetworkAccess.network_id == Store.network_id) & (ClientNetworkAccess.user_id == user.id),
+                (ClientNetworkAccess.network_id == ticket_network_id()) & (ClientNetworkAccess.user_id == user.id),
             )
             .filter(
                 or_(
@@ -208,72 +358,327 @@ def list_tickets(
     if status:
         q = q.filter(Ticket.status == status)
 
+    return q
+
+
+def _render_ticket_list(q, cols, limit: int) -> bytes:
+    """JSON pronto da listagem (o mesmo corpo que vai para o cache da fila)."""
+    if cols:
+        rows = q.with_entities(*[getattr(Ticket, f) for f in cols]).order_by(Ticket.opened_at.desc()).limit(limit).all()
+        return json.dumps([project(r, cols) for r in rows], ensure_ascii=False, separators=(",", ":")).encode()
     rows = q.order_by(Ticket.opened_at.desc()).limit(limit).all()
+    return _ticket_list_adapter.dump_json([ticket_out(t, t.store_name) for t in rows])
+
+
+# ---------- SLA: atrasados / em risco (servidos pelo índice em sla_due_at) ----------
+def _sla_query(db: Session, user: User):
+    q = db.query(Ticket)
+
+    if user.role == ROLE_CLIENT:
+        q = (
+            q.outerjoin(
+                ClientAccess,
+                (ClientAccess.store_id == Ticket.store_id) & (ClientAccess.user_id == user.id),
+            )
+            .outerjoin(
+                ClientNetworkAccess,
+                (ClientNetworkAccess.network_id == ticket_network_id()) & (ClientNetworkAccess.user_id == user.id),
+            )
+            .filter(
+                or_(
+                    ClientAccess.user_id.isnot(None),
+                    ClientNetworkAccess.user_id.isnot(None),
+                )
+            )
+        )
+    elif user.role == ROLE_TECH:
+        q = q.filter(
+            (and_(Ticket.status == "ABERTO", Ticket.assigned_tech_id.is_(None))) |
+            (Ticket.assigned_tech_id == user.id)
+        )
+    return q
+
+
+@router.get("/overdue", response_model=list[TicketOut])
+def list_overdue(
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+    kind: Optional[str] = Query(None, description="ASSIGN ou CLOSE"),
+    limit: int = Query(200, ge=1, le=500),
+):
+    q = _sla_query(db, user).filter(Ticket.sla_due_at < datetime.utcnow())
+    if kind:
+        q = q.filter(Ticket.sla_kind == kind)
+    rows = q.order_by(Ticket.sla_due_at.asc()).limit(limit).all()
+    return [ticket_out(t, t.store_name) for t in rows]
+
+
+@router.get("/at-risk", response_model=list[TicketOut])
+def list_at_risk(
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+    within_minutes: int = Query(SLA_AT_RISK_MINUTES, ge=1, le=7 * 24 * 60),
+    kind: Optional[str] = Query(None, description="ASSIGN ou CLOSE"),
+    limit: int = Query(200, ge=1, le=500),
+):
+    now = datetime.utcnow()
+    q = _sla_query(db, user).filter(
+        Ticket.sla_due_at >= now,
+        Ticket.sla_due_at < now + timedelta(minutes=within_minutes),
+    )
+    if kind:
+        q = q.filter(Ticket.sla_kind == kind)
+    rows = q.order_by(Ticket.sla_due_at.asc()).limit(limit).all()
+    return [ticket_out(t, t.store_name) for t in rows]
+
+
+# ---------- Perto de mim / rota do dia (localização das lojas, ver app/geo.py) ----------
+NEARBY_MAX_RADIUS_KM = 200
+NEARBY_STORE_CHUNK = 500
+ROUTE_STATUSES = ("ATRIBUIDO", "EM_ATENDIMENTO", "PENDENTE")
 
-    return [
-        TicketOut(
-            id=t.id, store_id=t.store_id, store_name=store_name, status=t.status,
-            problem=t.problem, type=t.type, priority=t.priority,
-            requester_name=t.requester_name, local=t.local,
-            assigned_tech_id=t.assigned_tech_id,
-            opened_at=t.opened_at.isoformat() if t.opened_at else None,
-            updated_at=t.updated_at.isoformat() if t.updated_at else None,
+
+@router.get("/nearby", response_model=list[TicketNearbyOut])
+def list_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(10, gt=0, le=NEARBY_MAX_RADIUS_KM, description="Raio em km"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    """Fila (ABERTO sem técnico) das lojas dentro do raio, da mais perto para a mais longe."""
+    _ensure_tech_or_admin(user)
+    stores = catalog.nearby_stores(db, lat, lon, radius)
+
+    out = []
+    # lojas já vêm por distância: busca os chamados em blocos até completar o limit
+    for i in range(0, len(stores), NEARBY_STORE_CHUNK):
+        chunk = {e.id: (km, e.name) for e, km in stores[i:i + NEARBY_STORE_CHUNK]}
+        rows = db.query(Ticket).filter(
+            Ticket.store_id.in_(list(chunk)),
+            Ticket.status == "ABERTO",
+            Ticket.assigned_tech_id.is_(None),
+        ).all()
+        rows.sort(key=lambda t: (chunk[t.store_id][0], t.priority != "URGENTE", t.opened_at))
+        for t in rows:
+            km, store_name = chunk[t.store_id]
+            out.append(TicketNearbyOut(**ticket_out(t, store_name).model_dump(), distance_km=round(km, 3)))
+        if len(out) >= limit:
+            break
+    return out[:limit]
+
+
+@router.get("/route", response_model=list[RouteStopOut])
+def route_for_tech(
+    lat: float = Query(..., ge=-90, le=90, description="Posição inicial do técnico"),
+    lon: float = Query(..., ge=-180, le=180),
+    tech_id: Optional[str] = Query(None, description="Só admin: rota de outro técnico"),
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    """Chamados ativos do técnico em ordem de visita; lojas sem localização vão no fim."""
+    _ensure_tech_or_admin(user)
+    if user.role == ROLE_ADMIN:
+        if not tech_id:
+            raise HTTPException(status_code=400, detail="Informe tech_id")
+    else:
+        tech_id = user.id
+
+    rows = (
+        db.query(Ticket)
+        .filter(Ticket.assigned_tech_id == tech_id, Ticket.status.in_(ROUTE_STATUSES))
+        .order_by(Ticket.opened_at.asc())
+        .all()
+    )
+    stores = {sid: catalog.store(db, sid) for sid in {t.store_id for t in rows}}
+    located = [t for t in rows if stores[t.store_id] and stores[t.store_id].latitude is not None]
+    unlocated = [t for t in rows if t not in located]
+
+    points = [(stores[t.store_id].latitude, stores[t.store_id].longitude) for t in located]
+    order = route_order((lat, lon), points)
+
+    out, prev = [], (lat, lon)
+    for seq, i in enumerate(order, start=1):
+        t, p = located[i], points[i]
+        out.append(RouteStopOut(
+            **ticket_out(t, stores[t.store_id].name).model_dump(),
+            seq=seq, latitude=p[0], longitude=p[1],
+            leg_km=round(haversine_km(prev[0], prev[1], p[0], p[1]), 3),
+        ))
+        prev = p
+    for seq, t in enumerate(unlocated, start=len(out) + 1):
+        entry = stores[t.store_id]
+        out.append(RouteStopOut(**ticket_out(t, entry.name if entry else None).model_dump(), seq=seq))
+    return out
+
+
+# ---------- Batch detail (vários chamados de uma vez) ----------
+MAX_BATCH_IDS = 100
+
+
+@router.get("/batch", response_model=TicketBatchOut)
+def get_tickets_batch(
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+    ids: list[str] = Query(..., description="ids (repetido ou separado por vírgula), máx. 100"),
+    updates_limit: int = Query(0, ge=0, le=50, description="Últimos N eventos da timeline por chamado"),
+):
+    wanted = list(dict.fromkeys(i.strip() for raw in ids for i in raw.split(",") if i.strip()))
+    if not wanted:
+        raise HTTPException(status_code=400, detail="Informe ao menos um id")
+    if len(wanted) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BATCH_IDS} chamados por lote")
+
+    # tabela quente primeiro; o que faltar, no arquivo
+    found = {t.id: t for t in db.query(Ticket).filter(Ticket.id.in_(wanted)).all()}
+    missing = [i for i in wanted if i not in found]
+    archived = {}
+    if missing:
+        archived = {
+            r.id: r for r in db.execute(select(tickets_archive).where(tickets_archive.c.id.in_(missing))).all()
+        }
+
+    tickets = {**found, **archived}
+    not_found = [i for i in wanted if i not in tickets]
+
+    forbidden = []
+    if user.role not in (ROLE_ADMIN, ROLE_TECH):
+        allowed = client_store_ids_with_access(db, user, {t.store_id for t in tickets.values()})
+        forbidden = [i for i in wanted if i in tickets and tickets[i].store_id not in allowed]
+        for i in forbidden:
+            tickets.pop(i)
+            found.pop(i, None)
+            archived.pop(i, None)
+
+    if not tickets:
+        return TicketBatchOut(items=[], not_found=not_found, forbidden=forbidden)
+
+    store_names = catalog.store_names(db, {t.store_id for t in tickets.values()})
+
+    resolutions = {}
+    if found:
+        resolutions.update(
+            db.query(TicketClosure.ticket_id, TicketClosure.resolution_text)
+            .filter(TicketClosure.ticket_id.in_(list(found)))
+            .all()
         )
-        for (t, store_name) in rows
-    ]
+    if archived:
+        resolutions.update(
+            (r.ticket_id, r.resolution_text)
+            for r in db.execute(
+                select(ticket_closures_archive).where(ticket_closures_archive.c.ticket_id.in_(list(archived)))
+            ).all()
+        )
+
+    updates = {i: [] for i in tickets}
+    if updates_limit:
+        rows = []
+        if found:
+            rows += _latest_updates(db, TicketUpdate.__table__, list(found), updates_limit)
+        if archived:
+            rows += _latest_updates(db, ticket_updates_archive, list(archived), updates_limit)
+        for u in rows:
+            updates[u.ticket_id].append(update_out(u))
+
+    items = []
+    for i in wanted:
+        t = tickets.get(i)
+        if t is None:
+            continue
+        items.append(TicketWithUpdates(
+            ticket=TicketDetail(
+                **ticket_out(t, store_names.get(t.store_id)).model_dump(),
+                resolution_text=resolutions.get(t.id),
+            ),
+            updates=updates[i],
+        ))
+
+    return TicketBatchOut(items=items, not_found=not_found, forbidden=forbidden)
 
 
 # ---------- Get detail (devolve {ticket, updates} p/ bater com frontend) ----------
 @router.get("/{ticket_id}")
 def get_ticket(
     ticket_id: str,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    response: Response,
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+    fields: Optional[str] = Query(None, description="Campos do ticket, separados por vírgula"),
 ):
-    t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+    cols = parse_fields(fields, TicketDetail.model_fields)
+
+    if cols:
+        own = [f for f in cols if f in Ticket.__table__.c]
+        t, archived = _ticket_row(db, ticket_id, list(dict.fromkeys([*own, "store_id", "version"])))
+    else:
+        t, archived = get_ticket_or_archived(db, ticket_id)
     if not t:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
     ensure_can_view_ticket(db, user, t)
 
-    store = db.query(Store).filter(Store.id == t.store_id).first()
-    closure = db.query(TicketClosure).filter(TicketClosure.ticket_id == t.id).first()
-
-    ticket = TicketDetail(
-        id=t.id, store_id=t.store_id, store_name=(store.name if store else None), status=t.status,
-        problem=t.problem, type=t.type, priority=t.priority,
-        requester_name=t.requester_name, local=t.local,
-        assigned_tech_id=t.assigned_tech_id,
-        opened_at=t.opened_at.isoformat() if t.opened_at else None,
-        updated_at=t.updated_at.isoformat() if t.updated_at else None,
-        resolution_text=closure.resolution_text if closure else None,
-    )
+    if cols:
+        ticket = project(t, own)
+        if "store_name" in cols:
+            ticket["store_name"] = catalog.store_name(db, t.store_id)
+        if "resolution_text" in cols:
+            closure = find_archived_closure(db, t.id) if archived else (
+                db.query(TicketClosure).filter(TicketClosure.ticket_id == t.id).first()
+            )
+            ticket["resolution_text"] = closure.resolution_text if closure else None
+    else:
+        if archived:
+            closure = find_archived_closure(db, t.id)
+        else:
+            closure = db.query(TicketClosure).filter(TicketClosure.ticket_id == t.id).first()
 
-    rows = db.query(TicketUpdate).filter(
-        TicketUpdate.ticket_id == ticket_id
-    ).order_by(TicketUpdate.created_at.asc()).all()
-
-    updates = [
-        TicketUpdateOut(
-            id=u.id,
-            ticket_id=u.ticket_id,
-            created_by_user_id=u.created_by_user_id,
-            created_at=u.created_at.isoformat() if u.created_at else "",
-            event_type=u.event_type,
-            note=u.note,
-            payload_json=u.payload_json,
+        ticket = TicketDetail(
+            **ticket_out(t, catalog.store_name(db, t.store_id)).model_dump(),
+            resolution_text=closure.resolution_text if closure else None,
         )
-        for u in rows
-    ]
 
+    if archived:
+        rows = list_archived_updates(db, ticket_id)
+    else:
+        rows = db.query(TicketUpdate).filter(
+            TicketUpdate.ticket_id == ticket_id
+        ).order_by(TicketUpdate.created_at.asc()).all()
+
+    updates = [update_out(u) for u in rows]
+
+    if not archived:
+        response.headers["ETag"] = ticket_etag(t)
     return {"ticket": ticket, "updates": updates}
 
 
+# ---------- Estado em um instante (replay do log de eventos) ----------
+@router.get("/{ticket_id}/as-of", response_model=TicketAsOfOut)
+def get_ticket_as_of(
+    ticket_id: str,
+    ts: datetime = Query(..., description="Instante (ISO 8601; sem fuso = UTC)"),
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+):
+    t, archived = _ticket_row(db, ticket_id, ("id", "store_id"))
+    if not t:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+
+    ensure_can_view_ticket(db, user, t)
+
+    state = state_as_of(db, ticket_id, utc_naive(ts), archived)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Chamado ainda não existia nesse instante")
+    return TicketAsOfOut(**{k: v for k, v in state.items() if k in TicketAsOfOut.model_fields})
+
+
 # ---------- Edit ticket (ADMIN only) ----------
 @router.patch("/{ticket_id}", response_model=TicketOut)
 def edit_ticket(
     ticket_id: str,
     body: TicketEditRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
@@ -283,9 +688,9 @@ def edit_ticket(
     t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
     if not t:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    check_if_match(request, db, t)
 
-    store = db.query(Store).filter(Store.id == t.store_id).first()
-    store_name = store.name if store else None
+    store_name = catalog.store_name(db, t.store_id)
 
     before = {
         "requester_name": t.requester_name,
@@ -350,8 +755,12 @@ def edit_ticket(
         raise HTTPException(status_code=400, detail="Nenhuma alteração enviada")
 
     t.updated_at = datetime.utcnow()
+    if "priority" in changed or "type" in changed:
+        apply_sla(t)
     db.add(t)
-    db.commit()
+    touch_queue(db, t)
+    with versioned_write(db, t):
+        db.commit()
 
     after = {
         "requester_name": t.requester_name,
@@ -371,51 +780,52 @@ def edit_ticket(
     )
     db.commit()
 
-    return TicketOut(
-        id=t.id, store_id=t.store_id, store_name=store_name, status=t.status,
-        problem=t.problem, type=t.type, priority=t.priority,
-        requester_name=t.requester_name, local=t.local,
-        assigned_tech_id=t.assigned_tech_id,
-        opened_at=t.opened_at.isoformat() if t.opened_at else None,
-        updated_at=t.updated_at.isoformat() if t.updated_at else None,
-    )
+    response.headers["ETag"] = ticket_etag(t)
+    return ticket_out(t, store_name)
 
 
 # ---------- Updates (timeline) ----------
 @router.get("/{ticket_id}/updates", response_model=list[TicketUpdateOut])
 def list_updates(
     ticket_id: str,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user),
+    fields: Optional[str] = Query(None, description="Campos do TicketUpdateOut, separados por vírgula"),
 ):
-    t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+    cols = parse_fields(fields, TicketUpdateOut.model_fields)
+
+    # para o controle de acesso basta id + store_id
+    t, archived = _ticket_row(db, ticket_id, ("id", "store_id"))
     if not t:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
     ensure_can_view_ticket(db, user, t)
 
-    rows = db.query(TicketUpdate).filter(
-        TicketUpdate.ticket_id == ticket_id
-    ).order_by(TicketUpdate.created_at.asc()).all()
-
-    return [
-        TicketUpdateOut(
-            id=u.id,
-            ticket_id=u.ticket_id,
-            created_by_user_id=u.created_by_user_id,
-            created_at=u.created_at.isoformat() if u.created_at else "",
-            event_type=u.event_type,
-            note=u.note,
-            payload_json=u.payload_json,
-        )
-        for u in rows
-    ]
+    if cols:
+        table = ticket_updates_archive if archived else TicketUpdate.__table__
+        rows = db.execute(
+            select(*[table.c[f] for f in cols])
+            .where(table.c.ticket_id == ticket_id)
+            .order_by(table.c.created_at.asc())
+        ).all()
+        return JSONResponse([project(r, cols) for r in rows])
+
+    if archived:
+        rows = list_archived_updates(db, ticket_id)
+    else:
+        rows = db.query(TicketUpdate).filter(
+            TicketUpdate.ticket_id == ticket_id
+        ).order_by(TicketUpdate.created_at.asc()).all()
+
+    return [update_out(u) for u in rows]
 
 
 # ---------- Assign ----------
 @router.post("/{ticket_id}/assign", response_model=TicketOut)
 def assign_ticket(
     ticket_id: str,
+    request: Request,
+    response: Response,
     body: Optional[AssignRequest] = Body(default=None),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
@@ -426,11 +836,14 @@ def assign_ticket(
 
     if user.role == ROLE_CLIENT:
         raise HTTPException(status_code=403, detail="Cliente não pode atribuir chamado")
+    check_if_match(request, db, t)
 
-    store = db.query(Store).filter(Store.id == t.store_id).first()
-    store_name = store.name if store else None
+    store_name = catalog.store_name(db, t.store_id)
 
     old_status = t.status
+    old_tech_id = t.assigned_tech_id
+    if DISPATCH_ENABLED:
+        dispatcher.discard(t.id)
 
     if user.role == ROLE_ADMIN:
         username = (body.username if body else None)
@@ -449,9 +862,12 @@ def assign_ticket(
                 t.status = "ATRIBUIDO"
             t.assigned_at = datetime.utcnow()
             t.updated_at = datetime.utcnow()
-
-            db.add(t)
-            db.commit()
+            sla_transition(t, old_status)
+            with versioned_write(db, t):
+                record_status_change(db, t, old_status, tech_changed=t.assigned_tech_id != old_tech_id)
+                touch_queue(db, t, old_status, old_tech_id)
+                db.add(t)
+                db.commit()
 
             add_update(
                 db, t.id, user.id, "ASSIGN",
@@ -472,9 +888,12 @@ def assign_ticket(
                 t.assigned_at = datetime.utcnow()
 
             t.updated_at = datetime.utcnow()
-
-            db.add(t)
-            db.commit()
+            sla_transition(t, old_status)
+            with versioned_write(db, t):
+                record_status_change(db, t, old_status, tech_changed=t.assigned_tech_id != old_tech_id)
+                touch_queue(db, t, old_status, old_tech_id)
+                db.add(t)
+                db.commit()
 
             add_update(
                 db, t.id, user.id, "ASSIGN",
@@ -495,9 +914,12 @@ def assign_ticket(
             t.assigned_at = datetime.utcnow()
 
         t.updated_at = datetime.utcnow()
-
-        db.add(t)
-        db.commit()
+        sla_transition(t, old_status)
+        with versioned_write(db, t):
+            record_status_change(db, t, old_status, tech_changed=t.assigned_tech_id != old_tech_id)
+            touch_queue(db, t, old_status, old_tech_id)
+            db.add(t)
+            db.commit()
 
         add_update(
             db, t.id, user.id, "ASSIGN",
@@ -508,100 +930,139 @@ def assign_ticket(
             add_update(db, t.id, user.id, "STATUS_CHANGE", payload={"from": old_status, "to": t.status})
         db.commit()
 
-    return TicketOut(
-        id=t.id, store_id=t.store_id, store_name=store_name, status=t.status,
-        problem=t.problem, type=t.type, priority=t.priority,
-        requester_name=t.requester_name, local=t.local,
-        assigned_tech_id=t.assigned_tech_id,
-        opened_at=t.opened_at.isoformat() if t.opened_at else None,
-        updated_at=t.updated_at.isoformat() if t.updated_at else None,
-    )
+    response.headers["ETag"] = ticket_etag(t)
+    return ticket_out(t, store_name)
 
 
-# ---------- Tech/Admin workflow ----------
-@router.post("/{ticket_id}/start", response_model=TicketOut)
-def start_ticket(
-    ticket_id: str,
-    body: Optional[StatusRequest] = Body(default=None),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
-):
+# ---------- Transições do técnico (usadas pelos endpoints e pelo /sync) ----------
+def _ensure_tech_or_admin(user: User) -> None:
     if user.role not in (ROLE_TECH, ROLE_ADMIN):
         raise HTTPException(status_code=403, detail="Apenas técnico/admin")
 
+
+def _get_hot_ticket(db: Session, ticket_id: str) -> Ticket:
     t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
     if not t:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    return t
 
-    ensure_assigned_to_user(t, user)
 
+def _offline(payload: dict, at: Optional[datetime]) -> dict:
+    """
+    Ação do /sync: o horário do app vai no payload (`offline_at`). A linha do evento fica com o
+    relógio da API — o log é append-only e o replay/snapshots e o cursor da auditoria dependem disso.
+    """
+    if at is not None:
+        payload["offline_at"] = at.isoformat()
+    return payload
+
+
+def apply_start(db: Session, t: Ticket, user: User, note: Optional[str] = None, at: Optional[datetime] = None) -> None:
+    """`at` = horário efetivo da ação (sync offline): vale para os campos do chamado e o SLA; None = agora."""
+    _ensure_tech_or_admin(user)
+    ensure_assigned_to_user(t, user)
     if t.status not in ("ATRIBUIDO", "PENDENTE"):
         raise HTTPException(status_code=409, detail="Status inválido para iniciar")
 
+    now = at or datetime.utcnow()
     old = t.status
     t.status = "EM_ATENDIMENTO"
-    t.started_at = datetime.utcnow()
-    t.updated_at = datetime.utcnow()
+    t.started_at = now
+    t.updated_at = now
+    sla_transition(t, old, now)
+    record_status_change(db, t, old, now)
+    touch_queue(db, t, old)
+    add_update(db, t.id, user.id, "STATUS_CHANGE", note=note, payload=_offline({"from": old, "to": "EM_ATENDIMENTO"}, at))
 
-    db.add(t)
-    db.commit()
-
-    note = (body.message if body else None)
-    add_update(db, t.id, user.id, "STATUS_CHANGE", note=note, payload={"from": old, "to": "EM_ATENDIMENTO"})
-    db.commit()
 
-    store = db.query(Store).filter(Store.id == t.store_id).first()
+def apply_pend(db: Session, t: Ticket, user: User, note: Optional[str] = None, at: Optional[datetime] = None) -> None:
+    _ensure_tech_or_admin(user)
+    ensure_assigned_to_user(t, user)
+    if t.status != "EM_ATENDIMENTO":
+        raise HTTPException(status_code=409, detail="Só pode pendenciar em atendimento")
 
-    return TicketOut(
-        id=t.id, store_id=t.store_id, store_name=(store.name if store else None), status=t.status,
-        problem=t.problem, type=t.type, priority=t.priority,
-        requester_name=t.requester_name, local=t.local,
-        assigned_tech_id=t.assigned_tech_id,
-        opened_at=t.opened_at.isoformat() if t.opened_at else None,
-        updated_at=t.updated_at.isoformat() if t.updated_at else None,
-    )
+    now = at or datetime.utcnow()
+    old = t.status
+    t.status = "PENDENTE"
+    t.updated_at = now
+    sla_transition(t, old, now)
+    record_status_change(db, t, old, now)
+    touch_queue(db, t, old)
+    add_update(db, t.id, user.id, "STATUS_CHANGE", note=note, payload=_offline({"from": old, "to": "PENDENTE"}, at))
 
 
-@router.post("/{ticket_id}/pend", response_model=TicketOut)
-def pend_ticket(
-    ticket_id: str,
-    body: Optional[StatusRequest] = Body(default=None),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
-):
-    if user.role not in (ROLE_TECH, ROLE_ADMIN):
-        raise HTTPException(status_code=403, detail="Apenas técnico/admin")
+def apply_comment(db: Session, t: Ticket, user: User, message: str, at: Optional[datetime] = None) -> None:
+    ensure_can_view_ticket(db, user, t)
+    add_update(db, t.id, user.id, "COMMENT", note=message, payload=_offline({}, at))
 
-    t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not t:
-        raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
+def apply_close(db: Session, t: Ticket, user: User, parecer: str, at: Optional[datetime] = None) -> None:
+    _ensure_tech_or_admin(user)
     ensure_assigned_to_user(t, user)
+    if t.status not in ("EM_ATENDIMENTO", "PENDENTE", "ATRIBUIDO"):
+        raise HTTPException(status_code=409, detail="Status inválido para concluir")
+    if db.query(TicketClosure).filter(TicketClosure.ticket_id == t.id).first():
+        raise HTTPException(status_code=409, detail="Chamado já concluído")
 
-    if t.status != "EM_ATENDIMENTO":
-        raise HTTPException(status_code=409, detail="Só pode pendenciar em atendimento")
+    parecer = parecer.strip()
+    db.add(TicketClosure(
+        ticket_id=t.id,
+        resolution_text=parecer,
+        closed_by_user_id=user.id
+    ))
 
+    now = at or datetime.utcnow()
     old = t.status
-    t.status = "PENDENTE"
-    t.updated_at = datetime.utcnow()
+    t.status = "CONCLUIDO"
+    t.closed_at = now
+    t.updated_at = now
+    sla_transition(t, old, now)
+    record_status_change(db, t, old, now)
+    touch_queue(db, t, old)
 
-    db.add(t)
-    db.commit()
+    add_update(db, t.id, user.id, "CLOSE", note="Concluído com parecer", payload=_offline({"len": len(parecer)}, at))
+    add_update(db, t.id, user.id, "STATUS_CHANGE", payload=_offline({"from": old, "to": "CONCLUIDO"}, at))
 
-    note = (body.message if body else None)
-    add_update(db, t.id, user.id, "STATUS_CHANGE", note=note, payload={"from": old, "to": "PENDENTE"})
-    db.commit()
 
-    store = db.query(Store).filter(Store.id == t.store_id).first()
+# ---------- Tech/Admin workflow ----------
+@router.post("/{ticket_id}/start", response_model=TicketOut)
+def start_ticket(
+    ticket_id: str,
+    request: Request,
+    response: Response,
+    body: Optional[StatusRequest] = Body(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    _ensure_tech_or_admin(user)
+    t = _get_hot_ticket(db, ticket_id)
+    check_if_match(request, db, t)
+    with versioned_write(db, t):
+        apply_start(db, t, user, note=(body.message if body else None))
+        db.commit()
 
-    return TicketOut(
-        id=t.id, store_id=t.store_id, store_name=(store.name if store else None), status=t.status,
-        problem=t.problem, type=t.type, priority=t.priority,
-        requester_name=t.requester_name, local=t.local,
-        assigned_tech_id=t.assigned_tech_id,
-        opened_at=t.opened_at.isoformat() if t.opened_at else None,
-        updated_at=t.updated_at.isoformat() if t.updated_at else None,
-    )
+    response.headers["ETag"] = ticket_etag(t)
+    return ticket_out(t, catalog.store_name(db, t.store_id))
+
+
+@router.post("/{ticket_id}/pend", response_model=TicketOut)
+def pend_ticket(
+    ticket_id: str,
+    request: Request,
+    response: Response,
+    body: Optional[StatusRequest] = Body(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    _ensure_tech_or_admin(user)
+    t = _get_hot_ticket(db, ticket_id)
+    check_if_match(request, db, t)
+    with versioned_write(db, t):
+        apply_pend(db, t, user, note=(body.message if body else None))
+        db.commit()
+
+    response.headers["ETag"] = ticket_etag(t)
+    return ticket_out(t, catalog.store_name(db, t.store_id))
 
 
 # ---------- Comment (authorized viewers) ----------
@@ -612,13 +1073,8 @@ def comment_ticket(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not t:
-        raise HTTPException(status_code=404, detail="Chamado não encontrado")
-
-    ensure_can_view_ticket(db, user, t)
-
-    add_update(db, t.id, user.id, "COMMENT", note=body.message)
+    t = _get_hot_ticket(db, ticket_id)
+    apply_comment(db, t, user, body.message)
     db.commit()
 
     return {"ok": True}
@@ -629,52 +1085,180 @@ def comment_ticket(
 def close_ticket(
     ticket_id: str,
     body: CloseRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    if user.role not in (ROLE_TECH, ROLE_ADMIN):
-        raise HTTPException(status_code=403, detail="Apenas técnico/admin")
+    _ensure_tech_or_admin(user)
+    t = _get_hot_ticket(db, ticket_id)
+    check_if_match(request, db, t)
+    with versioned_write(db, t):
+        apply_close(db, t, user, body.parecer)
+        db.commit()
 
-    t = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not t:
-        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    response.headers["ETag"] = ticket_etag(t)
+    return ticket_out(t, catalog.store_name(db, t.store_id))
 
-    ensure_assigned_to_user(t, user)
 
-    if t.status not in ("EM_ATENDIMENTO", "PENDENTE", "ATRIBUIDO"):
-        raise HTTPException(status_code=409, detail="Status inválido para concluir")
+# ---------- Transições em massa (ADMIN): reatribuir, cancelar, reabrir ----------
+@router.post("/bulk-transition", response_model=TicketBulkTransitionOut)
+def bulk_transition(
+    body: TicketBulkTransition,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    if user.role != ROLE_ADMIN:
+        raise HTTPException(status_code=403, detail="Apenas admin")
+    if body.action not in BULK_ACTIONS:
+        raise HTTPException(status_code=400, detail="action inválida (reassign, cancel ou reopen)")
+    if body.statuses and not set(body.statuses) <= VALID_STATUSES:
+        raise HTTPException(status_code=400, detail="status inválido")
+    if not any((body.tech_id, body.store_id, body.network_id, body.statuses, body.ticket_ids)):
+        raise HTTPException(
+            status_code=400, detail="Informe ao menos um filtro (tech_id, store_id, network_id, statuses ou ticket_ids)"
+        )
 
-    if db.query(TicketClosure).filter(TicketClosure.ticket_id == t.id).first():
-        raise HTTPException(status_code=409, detail="Chamado já concluído")
+    to_tech = None
+    if body.action == "reassign":
+        if not body.to_username:
+            raise HTTPException(status_code=400, detail="to_username é obrigatório para reassign")
+        to_tech = db.query(User).filter(
+            User.username == body.to_username,
+            User.role == ROLE_TECH,
+            User.active == True
+        ).first()
+        if not to_tech:
+            raise HTTPException(status_code=404, detail="Técnico não encontrado/ativo")
+
+    conds = bulk_filter(body.tech_id, body.store_id, body.network_id, body.statuses, body.ticket_ids)
+    return apply_bulk_transition(
+        db, user, body.action, conds, to_tech=to_tech, note=_norm_str(body.reason), dry_run=body.dry_run,
+    )
 
-    parecer = body.parecer.strip()
 
-    db.add(TicketClosure(
-        ticket_id=t.id,
-        resolution_text=parecer,
-        closed_by_user_id=user.id
-    ))
+# ---------- Sync offline (lote de ações do app do técnico) ----------
+def _sync_ts(client_ts: Optional[datetime], t: Ticket, now: datetime) -> datetime:
+    """Horário do app, limitado a [última alteração do chamado, agora] (relógio do celular não é confiável)."""
+    if client_ts is None:
+        return now
+    ts = utc_naive(client_ts)
+    floor = utc_naive(t.updated_at)
+    if floor and ts < floor:
+        ts = floor
+    return min(ts, now)
+
+
+def _apply_sync_action(db: Session, t: Ticket, user: User, a: SyncActionIn, at: datetime) -> None:
+    try:
+        if a.action == "start":
+            apply_start(db, t, user, note=a.message, at=at)
+        elif a.action == "pend":
+            apply_pend(db, t, user, note=a.message, at=at)
+        elif a.action == "comment":
+            apply_comment(db, t, user, CommentRequest(message=a.message or "").message, at=at)
+        elif a.action == "close":
+            apply_close(db, t, user, CloseRequest(parecer=a.parecer or "").parecer, at=at)
+        else:
+            raise HTTPException(status_code=400, detail="action inválida (start, pend, comment ou close)")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors()[0]["msg"])
 
-    old = t.status
-    t.status = "CONCLUIDO"
-    t.closed_at = datetime.utcnow()
-    t.updated_at = datetime.utcnow()
 
-    db.add(t)
+@router.post("/sync", response_model=SyncResponse)
+def sync_actions(
+    body: SyncRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """
+    Reaplica, em ordem, ações feitas offline. Uma transação por chamado; se uma ação
+    é rejeitada, as seguintes do mesmo chamado ficam SKIPPED. Reenvio de uma ação já
+    aplicada (mesmo client_action_id) volta como DUPLICATE, sem efeito.
+    """
+    ids = [a.client_action_id for a in body.actions]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="client_action_id repetido no lote")
+
+    keys = {a.client_action_id: f"{user.id}:{a.client_action_id}" for a in body.actions}
+    done = {
+        r.key: r
+        for r in db.query(TicketSyncAction).filter(TicketSyncAction.key.in_(list(keys.values())))
+    }
+    ticket_ids = list(dict.fromkeys(a.ticket_id for a in body.actions))
+    tickets = {t.id: t for t in db.query(Ticket).filter(Ticket.id.in_(ticket_ids)).all()}
 
-    add_update(db, t.id, user.id, "CLOSE", note="Concluído com parecer", payload={"len": len(parecer)})
-    if old != "CONCLUIDO":
-        add_update(db, t.id, user.id, "STATUS_CHANGE", payload={"from": old, "to": "CONCLUIDO"})
+    by_ticket: dict[str, list[SyncActionIn]] = {}
+    for a in body.actions:
+        by_ticket.setdefault(a.ticket_id, []).append(a)
 
-    db.commit()
+    results: dict[str, SyncActionResult] = {}
 
-    store = db.query(Store).filter(Store.id == t.store_id).first()
+    def result(a: SyncActionIn, outcome: str, **kw) -> None:
+        results[a.client_action_id] = SyncActionResult(
+            client_action_id=a.client_action_id, ticket_id=a.ticket_id, action=a.action, result=outcome, **kw,
+        )
 
-    return TicketOut(
-        id=t.id, store_id=t.store_id, store_name=(store.name if store else None), status=t.status,
-        problem=t.problem, type=t.type, priority=t.priority,
-        requester_name=t.requester_name, local=t.local,
-        assigned_tech_id=t.assigned_tech_id,
-        opened_at=t.opened_at.isoformat() if t.opened_at else None,
-        updated_at=t.updated_at.isoformat() if t.updated_at else None,
+    def conflict(batch: list[SyncActionIn]) -> None:
+        # outro commit mudou o chamado no meio: nada deste chamado é aplicado
+        db.rollback()
+        for a in batch:
+            result(a, "REJECTED", status_code=412, detail="Chamado alterado por outra pessoa durante o sync")
+
+    now = datetime.utcnow()
+    for ticket_id, actions in by_ticket.items():
+        t = tickets.get(ticket_id)
+        applied: list[tuple[SyncActionIn, datetime]] = []
+        rejected = False
+        for a in actions:
+            prev = done.get(keys[a.client_action_id])
+            if prev:
+                result(a, "DUPLICATE", applied_at=prev.applied_at.isoformat())
+                continue
+            if rejected:
+                result(a, "SKIPPED", detail="Ação anterior deste chamado foi rejeitada")
+                continue
+            try:
+                if t is None:
+                    raise HTTPException(status_code=404, detail="Chamado não encontrado")
+                at = _sync_ts(a.client_ts, t, now)
+                _apply_sync_action(db, t, user, a, at)
+            except HTTPException as e:
+                result(a, "REJECTED", status_code=e.status_code, detail=str(e.detail))
+                rejected = True
+                continue
+            except StaleDataError:
+                conflict([p for p, _ in applied] + [a])
+                applied, rejected = [], True
+                continue
+            applied.append((a, at))
+
+        if not applied:
+            continue
+        # só agora: um flush no meio das ações não pode esbarrar na chave de dedupe
+        db.add_all(
+            TicketSyncAction(
+                key=keys[a.client_action_id], ticket_id=ticket_id, action=a.action,
+                client_ts=utc_naive(a.client_ts), applied_at=at, created_at=now,
+            )
+            for a, at in applied
+        )
+        try:
+            db.commit()
+        except IntegrityError:
+            # outro envio do mesmo lote chegou antes: nada deste chamado é aplicado de novo
+            db.rollback()
+            for a, _ in applied:
+                result(a, "DUPLICATE")
+            continue
+        except StaleDataError:
+            conflict([a for a, _ in applied])
+            continue
+        for a, at in applied:
+            result(a, "APPLIED", applied_at=at.isoformat())
+
+    rows = db.query(Ticket).filter(Ticket.id.in_(ticket_ids)).all()
+    return SyncResponse(
+        results=[results[i] for i in ids],
+        tickets=[ticket_out(t, catalog.store_name(db, t.store_id)) for t in rows],
     )
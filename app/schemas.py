@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from pydantic import BaseModel, Field
 from typing import Optional
@@ -53,12 +54,29 @@ class StoreCreate(BaseModel):
     name: str
     cnpj: str
     network_id: Optional[str] = None  # ✅ opcional
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
 
 class StoreUpdate(BaseModel):
     name: Optional[str] = None
     cnpj: Optional[str] = None
     active: Optional[bool] = None
     network_id: Optional[str] = None  # ✅ opcional
+    # enviar os dois; null nos dois remove a localização
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+
+class ClientAccessBulk(BaseModel):
+    client_ids: list[str] = Field(min_length=1, max_length=500)
+    ids: list[str] = Field(default_factory=list, max_length=10000)  # lojas ou redes
+    mode: str = "grant"  # grant | revoke | sync
+
+class ClientAccessBulkOut(BaseModel):
+    mode: str
+    clients: int
+    added: int
+    removed: int
+    unchanged: int
 
 class StoreOut(BaseModel):
     id: str
@@ -66,6 +84,8 @@ class StoreOut(BaseModel):
     cnpj: str
     active: bool
     network_id: Optional[str] = None  # ✅ NOVO
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 
 # ---------- Tickets (Enums) ----------
@@ -100,6 +120,7 @@ class TicketOut(BaseModel):
     id: str
     store_id: str
     store_name: Optional[str] = None
+    network_id: Optional[str] = None
     status: str
     problem: str
     type: str
@@ -109,10 +130,44 @@ class TicketOut(BaseModel):
     assigned_tech_id: Optional[str] = None
     opened_at: Optional[str] = None
     updated_at: Optional[str] = None
+    sla_due_at: Optional[str] = None
+    sla_kind: Optional[str] = None  # ASSIGN | CLOSE
+    version: Optional[int] = None  # também no header ETag; devolver em If-Match ao alterar
+
+class TicketNearbyOut(TicketOut):
+    distance_km: float
+
+class RouteStopOut(TicketOut):
+    seq: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    leg_km: Optional[float] = None  # do ponto anterior (ou da posição inicial) até aqui
 
 class TicketDetail(TicketOut):
     resolution_text: Optional[str] = None
 
+class TicketAsOfOut(BaseModel):
+    """Estado reconstruído pelo replay do log (app/replay.py)."""
+    id: str
+    as_of: str
+    store_id: Optional[str] = None
+    status: str
+    requester_name: Optional[str] = None
+    local: Optional[str] = None
+    problem: Optional[str] = None
+    type: Optional[str] = None
+    priority: Optional[str] = None
+    assigned_tech_id: Optional[str] = None
+    opened_at: Optional[str] = None
+    assigned_at: Optional[str] = None
+    started_at: Optional[str] = None
+    closed_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    events: int  # eventos do chamado até as_of
+    events_replayed: int  # aplicados nesta consulta (depois do snapshot)
+    last_event_id: Optional[str] = None
+    snapshot_at: Optional[str] = None
+
 
 # ---------- Requests compatíveis com o FRONTEND ----------
 class AssignRequest(BaseModel):
@@ -135,3 +190,103 @@ class TicketUpdateOut(BaseModel):
     event_type: str
     note: Optional[str] = None
     payload_json: Optional[str] = None
+
+def update_out(u) -> TicketUpdateOut:
+    """Linha de ticket_updates (ou do arquivo) na resposta da API."""
+    return TicketUpdateOut(
+        id=u.id,
+        ticket_id=u.ticket_id,
+        created_by_user_id=u.created_by_user_id,
+        created_at=u.created_at.isoformat() if u.created_at else "",
+        event_type=u.event_type,
+        note=u.note,
+        payload_json=u.payload_json,
+    )
+
+class AuditEntryOut(TicketUpdateOut):
+    username: Optional[str] = None
+    store_id: Optional[str] = None
+    network_id: Optional[str] = None
+
+class TicketWithUpdates(BaseModel):
+    ticket: TicketDetail
+    updates: list[TicketUpdateOut] = []
+
+class TicketBatchOut(BaseModel):
+    items: list[TicketWithUpdates]
+    not_found: list[str] = []
+    forbidden: list[str] = []
+
+
+# ---------- Sync offline (app do técnico) ----------
+class SyncActionIn(BaseModel):
+    client_action_id: str = Field(min_length=1, max_length=100)
+    ticket_id: str
+    action: str  # start | pend | comment | close
+    client_ts: Optional[datetime] = None
+    message: Optional[str] = Field(default=None, max_length=4000)  # nota (start/pend) ou comentário
+    parecer: Optional[str] = Field(default=None, max_length=10000)  # close
+
+class SyncRequest(BaseModel):
+    actions: list[SyncActionIn] = Field(min_length=1, max_length=200)
+
+class SyncActionResult(BaseModel):
+    client_action_id: str
+    ticket_id: str
+    action: str
+    result: str  # APPLIED | DUPLICATE | REJECTED | SKIPPED
+    status_code: Optional[int] = None
+    detail: Optional[str] = None
+    applied_at: Optional[str] = None
+
+class SyncResponse(BaseModel):
+    results: list[SyncActionResult]
+    tickets: list[TicketOut]
+
+# ---------- Transições em massa (admin) ----------
+class TicketBulkTransition(BaseModel):
+    action: str  # reassign | cancel | reopen
+    # filtro (ao menos um; combinados com E)
+    tech_id: Optional[str] = None
+    store_id: Optional[str] = None
+    network_id: Optional[str] = None
+    statuses: Optional[list[str]] = Field(default=None, max_length=6)
+    ticket_ids: Optional[list[str]] = Field(default=None, max_length=10000)
+    to_username: Optional[str] = None  # reassign: técnico de destino
+    reason: Optional[str] = Field(default=None, max_length=500)  # vai no note da timeline
+    dry_run: bool = False  # só conta, sem alterar
+
+class TicketBulkTransitionOut(BaseModel):
+    action: str
+    operation_id: str  # "bulk" no payload dos eventos gerados
+    dry_run: bool
+    matched: int
+    changed: int
+    skipped: int
+    conflicts: int
+    by_status: dict[str, int]  # status de origem -> quantidade
+
+# ---------- Anexos ----------
+class AttachmentCreate(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    content_type: str = Field(min_length=1, max_length=100)
+    size: int = Field(gt=0)
+    kind: str = "OUTRO"  # ANTES | DEPOIS | OUTRO
+
+class AttachmentOut(BaseModel):
+    id: str
+    ticket_id: str
+    update_id: Optional[str] = None
+    uploaded_by_user_id: str
+    kind: str
+    filename: str
+    content_type: str
+    size: int
+    received: int
+    status: str
+    variants_status: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    created_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    chunk_size: Optional[int] = None
@@ -0,0 +1,81 @@
+"""
+Busca das listagens do admin (`?q=`).
+
+- username / CNPJ: prefixo (LIKE 'q%'), servido por índice btree text_pattern_ops no Postgres
+- nome da loja: contém, sem acento e sem caixa, servido por índice GIN pg_trgm no Postgres
+  (no SQLite cai num LIKE simples em lower(name))
+"""
+import logging
+
+from sqlalchemy import func, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# unaccent() não é IMMUTABLE; o wrapper permite usar a expressão em índice
+_PG_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_stores_name_trgm ON stores USING gin (f_unaccent(lower(name)) gin_trgm_ops)",
+)
+
+_pg_fuzzy = False
+
+# o que fuzzy_contains precisa no banco; criado por ensure_search_indexes
+_PG_CAPABILITY_SQL = text(
+    "SELECT to_regprocedure('public.f_unaccent(text)') IS NOT NULL"
+    " AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+)
+
+
+def ensure_search_indexes(engine: Engine) -> None:
+    """Extensões e índices de busca no Postgres (sem efeito no SQLite). Roda uma vez, no deploy."""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            for ddl in _PG_SEARCH_DDL:
+                conn.execute(text(ddl))
+    except Exception:
+        # sem permissão para criar extensão: segue com LIKE em lower(name)
+        logger.warning("search: pg_trgm/unaccent indisponível, usando LIKE simples", exc_info=True)
+    detect_search_capabilities(engine)
+
+
+def detect_search_capabilities(engine: Engine) -> bool:
+    """
+    Liga a busca sem acento se f_unaccent/pg_trgm existem no banco. Só leitura: roda na subida
+    de cada worker (com `python -m app.serve` o DDL roda só no processo pai e o flag não chega aos workers).
+    """
+    global _pg_fuzzy
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.connect() as conn:
+            _pg_fuzzy = bool(conn.execute(_PG_CAPABILITY_SQL).scalar())
+    except Exception:
+        logger.warning("search: falha ao checar pg_trgm/unaccent, usando LIKE simples", exc_info=True)
+        _pg_fuzzy = False
+    if not _pg_fuzzy:
+        logger.warning("search: f_unaccent/pg_trgm ausentes, usando LIKE simples")
+    return _pg_fuzzy
+
+
+def escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def prefix_match(col, q: str):
+    return col.like(escape_like(q) + "%", escape="\\")
+
+
+def fuzzy_contains(col, q: str):
+    pattern = "%" + escape_like(q.lower()) + "%"
+    if _pg_fuzzy:
+        return func.f_unaccent(func.lower(col)).like(func.f_unaccent(pattern), escape="\\")
+    return func.lower(col).like(pattern, escape="\\")
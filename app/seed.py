@@ -1,15 +1,45 @@
 
-import uuid
-from app.models import User, ROLE_ADMIN
+from sqlalchemy.orm import Session
+
+from app.models import User, CatalogVersion, ROLE_ADMIN, ROLE_SYSTEM
 from app.security import hash_password
 from app.database import SessionLocal
+from app.ids import new_id
+
+# autor dos eventos automáticos (despacho): inativo, não faz login
+SYSTEM_USERNAME = "sistema"
+_system_user_id = None
+
+
+def _ensure_system_user(db: Session) -> str:
+    u = db.query(User).filter(User.username == SYSTEM_USERNAME).first()
+    if not u:
+        u = User(
+            id=new_id(),
+            username=SYSTEM_USERNAME,
+            password_hash="!",  # não é um hash válido: nenhuma senha confere
+            role=ROLE_SYSTEM,
+            must_change_password=False,
+            active=False,
+        )
+        db.add(u)
+        db.commit()
+    return u.id
+
+
+def system_user_id(db: Session) -> str:
+    global _system_user_id
+    if _system_user_id is None:
+        _system_user_id = _ensure_system_user(db)
+    return _system_user_id
+
 
 def seed_data():
     db = SessionLocal()
     try:
         if not db.query(User).filter(User.username == "admin").first():
             db.add(User(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 username="admin",
                 password_hash=hash_password("040126"),
                 role=ROLE_ADMIN,
@@ -17,5 +47,13 @@ def seed_data():
                 active=True,
             ))
             db.commit()
+
+        _ensure_system_user(db)
+
+        # contadores de versão: catálogo (lojas/redes) e vínculos de acesso dos clientes
+        for key in ("catalog", "access"):
+            if not db.query(CatalogVersion).filter(CatalogVersion.name == key).first():
+                db.add(CatalogVersion(name=key, version=0))
+                db.commit()
     finally:
         db.close()
@@ -0,0 +1,290 @@
+"""
+Launcher de produção (vários workers uvicorn no mesmo socket).
+
+    python -m app.serve                 # workers pelo CPU/memória do container
+    python -m app.serve --workers 4
+    python -m app.serve bench           # throughput de GET /tickets/: 1 worker x N workers
+
+- Workers: WEB_CONCURRENCY, ou min(CPUs do container, memória / SERVE_WORKER_MEMORY_MB).
+- uvloop e httptools quando instalados (senão asyncio/h11).
+- Schema, índices e seed rodam uma vez aqui no processo pai; os workers só sobem a app.
+- O despacho automático roda em um worker só (lock em arquivo; se ele morrer, o substituto assume).
+- Restart sem derrubar o serviço: `kill -HUP <pid do pai>` troca os workers um por vez.
+"""
+import argparse
+import fcntl
+import math
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+from typing import Optional
+
+DB_PREPARED_ENV = "APP_DB_PREPARED"
+SERVE_LOCK_DIR_ENV = "SERVE_LOCK_DIR"
+
+SERVE_HOST = os.getenv("HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("PORT", "10000"))
+SERVE_WORKER_MEMORY_MB = int(os.getenv("SERVE_WORKER_MEMORY_MB", "200"))
+SERVE_MAX_WORKERS = int(os.getenv("SERVE_MAX_WORKERS", "8"))
+# maior que o idle timeout do proxy do Render, senão o proxy reaproveita conexão já fechada (502)
+SERVE_KEEPALIVE_SECONDS = int(os.getenv("SERVE_KEEPALIVE_SECONDS", "75"))
+SERVE_BACKLOG = int(os.getenv("SERVE_BACKLOG", "2048"))
+SERVE_GRACEFUL_SECONDS = int(os.getenv("SERVE_GRACEFUL_SECONDS", "30"))
+
+_held_locks: dict[str, int] = {}
+
+
+# ---------- dimensionamento ----------
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit() -> int:
+    """CPUs disponíveis, respeitando a cota do cgroup (container) quando houver."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = _read("/sys/fs/cgroup/cpu.max")  # cgroup v2: "<quota> <period>" ou "max <period>"
+    if quota and not quota.startswith("max"):
+        q, period = (int(x) for x in quota.split())
+        cpus = min(cpus, max(1, math.ceil(q / period)))
+    else:
+        q, period = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if q and period and int(q) > 0:
+            cpus = min(cpus, max(1, math.ceil(int(q) / int(period))))
+    return max(1, cpus)
+
+
+def memory_limit_bytes() -> Optional[int]:
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        raw = _read(path)
+        if raw and raw.isdigit() and int(raw) < 1 << 60:  # "sem limite" vem como max ou um número enorme
+            return int(raw)
+    meminfo = _read("/proc/meminfo")
+    if meminfo:
+        for line in meminfo.splitlines():
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def default_workers() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    workers = cpu_limit()  # worker async: um por núcleo basta
+    mem = memory_limit_bytes()
+    if mem:
+        workers = min(workers, max(1, mem // (SERVE_WORKER_MEMORY_MB * 1024 * 1024)))
+    return max(1, min(workers, SERVE_MAX_WORKERS))
+
+
+# ---------- um worker só para tarefas únicas ----------
+def worker_singleton(name: str) -> bool:
+    """
+    True se este processo deve rodar a tarefa `name`. Fora do launcher (uvicorn
+    direto, testes) é sempre True; com o launcher, só o worker que pegar o lock.
+    """
+    lock_dir = os.getenv(SERVE_LOCK_DIR_ENV)
+    if not lock_dir:
+        return True
+    if name in _held_locks:
+        return True
+    fd = os.open(os.path.join(lock_dir, f"{name}.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+    _held_locks[name] = fd  # fica aberto até o processo morrer (o SO libera o lock)
+    return True
+
+
+# ---------- servidor ----------
+def serve(workers: int, host: str = SERVE_HOST, port: int = SERVE_PORT) -> None:
+    # roda schema/índices/seed uma vez, antes de subir os workers
+    from app.main import prepare_database  # noqa: F401  (o import já prepara o banco)
+    from app.database import engine, replica_engine
+
+    engine.dispose()
+    replica_engine.dispose()
+    os.environ[DB_PREPARED_ENV] = "1"
+    lock_dir = os.environ.setdefault(SERVE_LOCK_DIR_ENV, tempfile.mkdtemp(prefix="app-serve-"))
+
+    loop = "uvloop" if find_spec("uvloop") else "asyncio"
+    http = "httptools" if find_spec("httptools") else "h11"
+    print(f"app.serve: {workers} worker(s), loop={loop}, http={http}, {host}:{port}", flush=True)
+
+    try:
+        _run_uvicorn(workers, host, port, loop, http)
+    finally:
+        shutil.rmtree(lock_dir, ignore_errors=True)
+
+
+def _run_uvicorn(workers: int, host: str, port: int, loop: str, http: str) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=SERVE_BACKLOG,
+        timeout_keep_alive=SERVE_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=SERVE_GRACEFUL_SECONDS,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        access_log=os.getenv("SERVE_ACCESS_LOG", "0") == "1",
+    )
+
+
+# ---------- benchmark ----------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int, timeout: float = 60) -> None:
+    import http.client
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/docs")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("servidor não subiu")
+
+
+def _client(args: tuple) -> tuple[int, int]:
+    """Um cliente keep-alive fazendo GET em loop por `seconds`. Retorna (ok, erros)."""
+    import http.client
+
+    port, path, token, seconds = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    headers = {"Authorization": f"Bearer {token}"}
+    ok = errors = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                ok += 1
+            else:
+                errors += 1
+        except OSError:
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    return ok, errors
+
+
+def _seed_bench_data(n_tickets: int) -> None:
+    from app.main import prepare_database  # noqa: F401
+    from app.database import SessionLocal
+    from app.ids import new_id
+    from app.models import Network, Store, Ticket, User, ROLE_ADMIN
+    from app.sla import apply_sla
+    from datetime import datetime
+
+    db = SessionLocal()
+    try:
+        have = db.query(Ticket).count()
+        if have >= n_tickets:
+            return
+        admin = db.query(User).filter(User.role == ROLE_ADMIN).first()
+        net = Network(id=new_id(), name=f"Bench {secrets.token_hex(4)}", active=True)
+        db.add(net)
+        stores = [
+            Store(id=new_id(), name=f"Loja bench {i}", cnpj=f"{secrets.randbelow(10**14):014d}", network_id=net.id, active=True)
+            for i in range(20)
+        ]
+        db.add_all(stores)
+        db.flush()
+        for i in range(n_tickets - have):
+            store = stores[i % len(stores)]
+            t = Ticket(
+                id=new_id(), store_id=store.id, network_id=net.id, store_name=store.name, opened_by_admin_id=admin.id,
+                problem="Equipamento não liga", type="REPARO", priority="NORMAL" if i % 5 else "URGENTE",
+                status="ABERTO", opened_at=datetime.utcnow(), updated_at=datetime.utcnow(),
+            )
+            apply_sla(t)
+            db.add(t)
+        db.commit()
+    finally:
+        db.close()
+
+
+def bench(workers: list[int], seconds: int, clients: int, path: str, n_tickets: int) -> list[dict]:
+    import http.client
+    import json
+    from concurrent.futures import ProcessPoolExecutor
+
+    _seed_bench_data(n_tickets)
+    results = []
+    for n in workers:
+        port = _free_port()
+        env = {**os.environ, "JOBS_ENABLED": "0", "DISPATCH_ENABLED": "0"}
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "app.serve", "--workers", str(n), "--port", str(port), "--host", "127.0.0.1"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_ready(port)
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            conn.request(
+                "POST", "/auth/login",
+                body=json.dumps({"username": os.getenv("BENCH_USER", "admin"), "password": os.getenv("BENCH_PASSWORD", "040126")}),
+                headers={"Content-Type": "application/json"},
+            )
+            token = json.loads(conn.getresponse().read())["access_token"]
+
+            with ProcessPoolExecutor(max_workers=clients) as pool:
+                out = list(pool.map(_client, [(port, path, token, seconds)] * clients))
+            ok = sum(o for o, _ in out)
+            errors = sum(e for _, e in out)
+            results.append({"workers": n, "requests": ok, "errors": errors, "req_per_second": round(ok / seconds, 1)})
+        finally:
+            proc.terminate()
+            proc.wait(timeout=SERVE_GRACEFUL_SECONDS + 5)
+    return results
+
+
+def main(argv: list[str]) -> None:
+    if argv[:1] == ["bench"]:
+        p = argparse.ArgumentParser(prog="python -m app.serve bench")
+        p.add_argument("--workers", type=int, default=default_workers(), help="comparado com 1 worker")
+        p.add_argument("--seconds", type=int, default=15)
+        p.add_argument("--clients", type=int, default=16)
+        p.add_argument("--tickets", type=int, default=500)
+        p.add_argument("--path", default="/tickets/?limit=50")
+        a = p.parse_args(argv[1:])
+        for r in bench(sorted({1, a.workers}), a.seconds, a.clients, a.path, a.tickets):
+            print(r)
+        return
+
+    p = argparse.ArgumentParser(prog="python -m app.serve")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--host", default=SERVE_HOST)
+    p.add_argument("--port", type=int, default=SERVE_PORT)
+    a = p.parse_args(argv)
+    serve(a.workers or default_workers(), a.host, a.port)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
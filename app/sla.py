@@ -0,0 +1,134 @@
+"""
+SLA dos chamados.
+
+Política por prioridade (e opcionalmente prioridade:tipo), em minutos:
+- assign: prazo para sair de ABERTO
+- close:  prazo para concluir (o tempo em PENDENTE não conta)
+
+Colunas mantidas em cada transição (ver apply_sla / sla_transition):
+- sla_due_at:        próximo prazo ativo (indexado) — NULL quando pausado ou encerrado
+- sla_kind:          ASSIGN | CLOSE
+- sla_close_due_at:  prazo de conclusão já somando as pausas
+- sla_paused_at / sla_paused_seconds: controle da pausa em PENDENTE
+
+Política customizada via SLA_POLICIES (JSON), ex.:
+    {"URGENTE": {"assign": 30, "close": 240}, "NORMAL:VISITA": {"close": 4320}}
+
+Backfill dos chamados existentes:
+    python -m app.sla backfill
+"""
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Ticket
+
+SLA_AT_RISK_MINUTES = int(os.getenv("SLA_AT_RISK_MINUTES", "60"))
+
+
+class SlaPolicy(NamedTuple):
+    assign: timedelta
+    close: timedelta
+
+
+_DEFAULT_MINUTES = {
+    "URGENTE": {"assign": 60, "close": 8 * 60},
+    "NORMAL": {"assign": 4 * 60, "close": 48 * 60},
+}
+_FALLBACK = _DEFAULT_MINUTES["NORMAL"]
+
+
+def _load_policies() -> dict:
+    policies = {k: dict(v) for k, v in _DEFAULT_MINUTES.items()}
+    raw = os.getenv("SLA_POLICIES")
+    if raw:
+        for key, value in json.loads(raw).items():
+            policies.setdefault(key, {}).update(value)
+    return policies
+
+
+_POLICIES = _load_policies()
+
+
+def sla_policy(priority: Optional[str], ticket_type: Optional[str]) -> SlaPolicy:
+    base = _POLICIES.get(priority or "", _FALLBACK)
+    minutes = {**_FALLBACK, **base, **_POLICIES.get(f"{priority}:{ticket_type}", {})}
+    return SlaPolicy(timedelta(minutes=minutes["assign"]), timedelta(minutes=minutes["close"]))
+
+
+def utc_naive(dt: Optional[datetime]) -> Optional[datetime]:
+    """Normaliza para UTC sem tzinfo (o padrão do datetime.utcnow() usado no projeto)."""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def apply_sla(t: Ticket, now: Optional[datetime] = None) -> None:
+    """Recalcula as colunas de SLA a partir do estado atual do ticket."""
+    now = now or datetime.utcnow()
+    policy = sla_policy(t.priority, t.type)
+    opened = utc_naive(t.opened_at) or now
+
+    t.sla_close_due_at = opened + policy.close + timedelta(seconds=t.sla_paused_seconds or 0)
+
+    if t.status == "ABERTO":
+        t.sla_due_at = opened + policy.assign
+        t.sla_kind = "ASSIGN"
+    elif t.status in ("ATRIBUIDO", "EM_ATENDIMENTO"):
+        t.sla_due_at = t.sla_close_due_at
+        t.sla_kind = "CLOSE"
+    else:
+        # PENDENTE (pausado), CONCLUIDO, CANCELADO
+        t.sla_due_at = None
+        t.sla_kind = None
+
+
+def sla_transition(t: Ticket, old_status: str, now: Optional[datetime] = None) -> None:
+    """Chamar depois de mudar t.status: contabiliza a pausa de PENDENTE e recalcula os prazos."""
+    now = now or datetime.utcnow()
+    if old_status != "PENDENTE" and t.status == "PENDENTE":
+        t.sla_paused_at = now
+    elif old_status == "PENDENTE" and t.status != "PENDENTE":
+        paused_at = utc_naive(t.sla_paused_at)
+        if paused_at:
+            t.sla_paused_seconds = (t.sla_paused_seconds or 0) + int((now - paused_at).total_seconds())
+        t.sla_paused_at = None
+    apply_sla(t, now)
+
+
+def backfill_sla(db: Session, batch_size: int = 500) -> int:
+    """Preenche o SLA de chamados antigos (sla_close_due_at nulo), em lotes."""
+    total = 0
+    while True:
+        rows = (
+            db.query(Ticket)
+            .filter(Ticket.sla_close_due_at.is_(None))
+            .order_by(Ticket.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return total
+        for t in rows:
+            if t.status == "PENDENTE" and not t.sla_paused_at:
+                t.sla_paused_at = utc_naive(t.updated_at)
+            apply_sla(t)
+        db.commit()
+        total += len(rows)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["backfill"]:
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            print(f"{backfill_sla(db)} chamados com SLA preenchido")
+        finally:
+            db.close()
+    else:
+        print(__doc__)
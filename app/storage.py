@@ -0,0 +1,75 @@
+"""
+Armazenamento de arquivos dos anexos.
+
+O backend é escolhido por ATTACHMENTS_BACKEND (hoje só "local": disco em
+ATTACHMENTS_DIR). Um backend novo precisa implementar a mesma interface de
+LocalStorage; `local_path` devolve None quando o arquivo não está em disco
+local (aí o download não usa sendfile).
+"""
+import os
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import anyio
+
+ATTACHMENTS_BACKEND = os.getenv("ATTACHMENTS_BACKEND", "local")
+ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", "./data/attachments")
+
+
+class StorageLimitExceeded(Exception):
+    pass
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def path(self, key: str) -> Path:
+        p = (self.root / key).resolve()
+        if self.root not in p.parents:
+            raise ValueError(f"chave inválida: {key}")
+        return p
+
+    def _open_at(self, key: str, offset: int):
+        p = self.path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        f = open(p, "r+b" if p.exists() else "w+b")
+        # descarta o que sobrou de um chunk interrompido depois do offset confirmado
+        f.truncate(offset)
+        f.seek(offset)
+        return f
+
+    async def write_at(self, key: str, offset: int, chunks: AsyncIterator[bytes], limit: int) -> int:
+        """Grava o stream a partir de `offset` sem juntar em memória. Retorna os bytes gravados."""
+        f = await anyio.to_thread.run_sync(self._open_at, key, offset)
+        written = 0
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if written > limit:
+                    raise StorageLimitExceeded()
+                await anyio.to_thread.run_sync(f.write, chunk)
+            await anyio.to_thread.run_sync(f.flush)
+        finally:
+            await anyio.to_thread.run_sync(f.close)
+        return written
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def local_path(self, key: str) -> Optional[str]:
+        return str(self.path(key))
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+
+def _build_storage():
+    if ATTACHMENTS_BACKEND == "local":
+        return LocalStorage(ATTACHMENTS_DIR)
+    raise RuntimeError(f"ATTACHMENTS_BACKEND desconhecido: {ATTACHMENTS_BACKEND}")
+
+
+storage = _build_storage()
@@ -0,0 +1,26 @@
+"""
+Miniaturas dos anexos de imagem.
+
+Roda dentro do pool de processos de app.attachments: este módulo não importa
+nada do app (banco, modelos), para o processo filho subir rápido.
+Requer Pillow; sem ele render_variants levanta ImportError e o anexo fica sem miniatura.
+"""
+import os
+
+
+def render_variants(src: str, targets: dict[str, tuple[str, int]]) -> tuple[int, int]:
+    """Gera um JPEG por alvo {nome: (destino, lado_maximo)}. Retorna (largura, altura) do original."""
+    from PIL import Image, ImageOps
+
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)  # fotos de celular vêm rotacionadas via EXIF
+        size = im.size
+        if im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        for dst, side in targets.values():
+            variant = im.copy()
+            variant.thumbnail((side, side))
+            tmp = dst + ".tmp"
+            variant.save(tmp, "JPEG", quality=82, optimize=True)
+            os.replace(tmp, dst)
+    return size
@@ -0,0 +1,240 @@
+"""
+Transições administrativas em massa (POST /tickets/bulk-transition).
+
+Ações, sobre os chamados que casam com o filtro:
+- reassign: passa para outro técnico (ABERTO vira ATRIBUIDO; os demais mantêm o status)
+- cancel:   ABERTO/ATRIBUIDO/EM_ATENDIMENTO/PENDENTE -> CANCELADO
+- reopen:   CONCLUIDO/CANCELADO -> ABERTO, sem técnico (o parecer anterior vai para a timeline)
+
+Em blocos de BULK_TRANSITION_CHUNK chamados, cada bloco uma transação: 1 SELECT das linhas
+(FOR UPDATE no Postgres), SLA calculado em memória, 1 UPDATE executemany com
+"WHERE version = ?", eventos da timeline e spans do rollup inseridos em lote.
+Se outro commit mexeu num chamado do bloco no meio, o bloco é refeito.
+"""
+import json
+import os
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.dispatch import dispatcher, DISPATCH_ENABLED
+from app.ids import new_id
+from app.models import Ticket, TicketClosure, TicketUpdate, Store, User
+from app.queue_cache import touch as touch_queue
+from app.rollup import record_status_changes
+from app.sla import sla_transition
+
+BULK_ACTIONS = ("reassign", "cancel", "reopen")
+BULK_TRANSITION_CHUNK = int(os.getenv("BULK_TRANSITION_CHUNK", "500"))
+BULK_TRANSITION_RETRIES = 3
+
+OPEN_STATUSES = ("ABERTO", "ATRIBUIDO", "EM_ATENDIMENTO", "PENDENTE")
+FROM_STATUSES = {
+    "reassign": OPEN_STATUSES,
+    "cancel": OPEN_STATUSES,
+    "reopen": ("CONCLUIDO", "CANCELADO"),
+}
+
+_tickets = Ticket.__table__
+# colunas reescritas pela transição (o resto da linha não muda)
+_WRITTEN = (
+    "status", "assigned_tech_id", "assigned_at", "started_at", "closed_at", "updated_at",
+    "sla_due_at", "sla_kind", "sla_close_due_at", "sla_paused_at", "sla_paused_seconds",
+)
+_READ = ("id", "store_id", "type", "priority", "opened_at", "version", *_WRITTEN)
+
+_UPDATE = (
+    update(_tickets)
+    .where(_tickets.c.id == bindparam("_id"), _tickets.c.version == bindparam("_version"))
+    .values(version=_tickets.c.version + 1)
+)
+
+
+class _StaleChunk(Exception):
+    pass
+
+
+def bulk_filter(
+    tech_id: Optional[str] = None,
+    store_id: Optional[str] = None,
+    network_id: Optional[str] = None,
+    statuses: Optional[list[str]] = None,
+    ticket_ids: Optional[list[str]] = None,
+) -> list:
+    conds = []
+    if tech_id:
+        conds.append(Ticket.assigned_tech_id == tech_id)
+    if store_id:
+        conds.append(Ticket.store_id == store_id)
+    if network_id:
+        conds.append(Ticket.store_id.in_(select(Store.id).where(Store.network_id == network_id)))
+    if statuses:
+        conds.append(Ticket.status.in_(statuses))
+    if ticket_ids:
+        conds.append(Ticket.id.in_(ticket_ids))
+    return conds
+
+
+def _event(ticket_id: str, user_id: str, event_type: str, now: datetime, payload: dict, note: Optional[str]) -> dict:
+    return {
+        "id": new_id(),
+        "ticket_id": ticket_id,
+        "created_by_user_id": user_id,
+        "created_at": now,
+        "event_type": event_type,
+        "note": note,
+        "payload_json": json.dumps(payload, ensure_ascii=False),
+    }
+
+
+def _transition(t, action: str, to_tech: Optional[User], now: datetime) -> bool:
+    """Muda `t` em memória. False = nada a fazer (ex.: já é do técnico de destino)."""
+    if action == "reassign":
+        if t.assigned_tech_id == to_tech.id:
+            return False
+        t.assigned_tech_id = to_tech.id
+        t.assigned_at = now
+        if t.status == "ABERTO":
+            t.status = "ATRIBUIDO"
+    elif action == "cancel":
+        t.status = "CANCELADO"
+        t.closed_at = now
+    else:  # reopen
+        t.status = "ABERTO"
+        t.assigned_tech_id = None
+        t.assigned_at = None
+        t.started_at = None
+        t.closed_at = None
+    t.updated_at = now
+    return True
+
+
+def _apply_chunk(db: Session, ids: list[str], action: str, user: User, to_tech: Optional[User],
+                 note: Optional[str], op_id: str, now: datetime) -> list:
+    """Aplica a ação a um bloco (sem commit). Retorna [(t, status antigo, técnico antigo)] dos que mudaram."""
+    q = select(*[_tickets.c[c] for c in _READ]).where(
+        _tickets.c.id.in_(ids), _tickets.c.status.in_(FROM_STATUSES[action])
+    )
+    if db.bind.dialect.name == "postgresql":
+        q = q.with_for_update()
+    rows = db.execute(q).all()
+
+    resolutions = {}
+    if action == "reopen":
+        resolutions = dict(
+            db.query(TicketClosure.ticket_id, TicketClosure.resolution_text)
+            .filter(TicketClosure.ticket_id.in_([r.id for r in rows]))
+            .all()
+        )
+
+    changed, params, events = [], [], []
+    for r in rows:
+        t = SimpleNamespace(**r._mapping)
+        old_status, old_tech = t.status, t.assigned_tech_id
+        if not _transition(t, action, to_tech, now):
+            continue
+        if t.status != old_status:
+            sla_transition(t, old_status, now)
+
+        params.append({"_id": t.id, "_version": t.version, **{c: getattr(t, c) for c in _WRITTEN}})
+        if t.assigned_tech_id != old_tech:
+            events.append(_event(t.id, user.id, "ASSIGN", now, {
+                "username": to_tech.username if to_tech else None,
+                "tech_id": t.assigned_tech_id,
+                "from_tech_id": old_tech,
+                "bulk": op_id,
+            }, note))
+        if t.status != old_status:
+            payload = {"from": old_status, "to": t.status, "bulk": op_id}
+            if t.id in resolutions:
+                payload["resolution_text"] = resolutions[t.id]
+            events.append(_event(t.id, user.id, "STATUS_CHANGE", now, payload, note))
+        touch_queue(db, t, old_status, old_tech)
+        changed.append((t, old_status, old_tech))
+
+    if not params:
+        return changed
+
+    res = db.execute(_UPDATE, params)
+    if db.bind.dialect.supports_sane_multi_rowcount and res.rowcount != len(params):
+        raise _StaleChunk()
+
+    if resolutions:
+        # reabrir exige nova conclusão: o parecer antigo fica no STATUS_CHANGE
+        db.execute(delete(TicketClosure).where(TicketClosure.ticket_id.in_(list(resolutions))))
+    db.execute(insert(TicketUpdate.__table__), events)
+    record_status_changes(db, changed, now)
+    return changed
+
+
+def _after_commit(changed: list) -> None:
+    if not DISPATCH_ENABLED:
+        return
+    for t, old_status, _ in changed:
+        if t.status == "ABERTO":
+            dispatcher.enqueue(t)
+        elif old_status == "ABERTO":
+            dispatcher.discard(t.id)
+
+
+def apply_bulk_transition(
+    db: Session,
+    user: User,
+    action: str,
+    conds: list,
+    to_tech: Optional[User] = None,
+    note: Optional[str] = None,
+    dry_run: bool = False,
+    chunk: int = BULK_TRANSITION_CHUNK,
+) -> dict:
+    """Aplica `action` a todos os chamados de `conds` nos status de origem da ação. Commit por bloco."""
+    op_id = new_id()
+    eligible = [*conds, Ticket.status.in_(FROM_STATUSES[action])]
+    summary = {
+        "action": action, "operation_id": op_id, "dry_run": dry_run,
+        "matched": 0, "changed": 0, "skipped": 0, "conflicts": 0, "by_status": {},
+    }
+
+    if dry_run:
+        by_status = dict(
+            db.query(Ticket.status, func.count(Ticket.id)).filter(*eligible).group_by(Ticket.status).all()
+        )
+        summary.update(matched=sum(by_status.values()), by_status=by_status)
+        return summary
+
+    base = select(Ticket.id).where(*eligible).order_by(Ticket.id)
+    by_status: dict[str, int] = {}
+    last = None
+    while True:
+        # keyset por id: o que já mudou de status sai do filtro, o que foi ignorado não volta
+        q = base if last is None else base.where(Ticket.id > last)
+        ids = db.execute(q.limit(chunk)).scalars().all()
+        if not ids:
+            break
+        last = ids[-1]
+        summary["matched"] += len(ids)
+
+        for _ in range(BULK_TRANSITION_RETRIES):
+            now = datetime.utcnow()
+            try:
+                changed = _apply_chunk(db, ids, action, user, to_tech, note, op_id, now)
+                db.commit()
+                break
+            except _StaleChunk:
+                db.rollback()
+        else:
+            summary["conflicts"] += len(ids)
+            continue
+
+        _after_commit(changed)
+        summary["changed"] += len(changed)
+        # já do técnico de destino, ou saiu do status de origem antes do UPDATE
+        summary["skipped"] += len(ids) - len(changed)
+        for _, old_status, _ in changed:
+            by_status[old_status] = by_status.get(old_status, 0) + 1
+
+    summary["by_status"] = by_status
+    return summary
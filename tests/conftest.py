@@ -0,0 +1,74 @@
+"""
+Testes de comportamento contra a app inteira (TestClient) num SQLite temporário.
+
+Rodar: pip install -r requirements-dev.txt && python -m pytest -q
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="rioautocom-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/test.sqlite"
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ["JOBS_ENABLED"] = "0"  # jobs rodam só quando o teste chama runner.run_pending()
+os.environ["DISPATCH_ENABLED"] = "0"
+os.environ.setdefault("ATTACHMENTS_DIR", f"{_DB_DIR}/att")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def login(client, username: str, password: str) -> dict:
+    r = client.post("/auth/login", json={"username": username, "password": password})
+    assert r.status_code == 200, r.text
+    return {"Authorization": "Bearer " + r.json()["access_token"]}
+
+
+@pytest.fixture(scope="session")
+def admin(client):
+    return login(client, "admin", "040126")
+
+
+@pytest.fixture
+def world(client, admin):
+    """Rede + loja + técnico + cliente com acesso à rede, com nomes únicos por teste."""
+    suffix = uuid.uuid4().hex[:8]
+    net = client.post("/admin/networks", json={"name": f"Rede {suffix}"}, headers=admin).json()
+    store = client.post(
+        "/admin/stores",
+        json={"name": f"Loja {suffix}", "cnpj": uuid.uuid4().hex[:14], "network_id": net["id"]},
+        headers=admin,
+    ).json()
+    tech = client.post(
+        "/admin/users", json={"username": f"tech{suffix}", "role": "TECH", "password": "1234"}, headers=admin
+    ).json()
+    cli = client.post("/admin/users", json={"username": f"cli{suffix}", "role": "CLIENT"}, headers=admin).json()
+    client.post(f"/admin/clients/{cli['id']}/networks/{net['id']}", headers=admin)
+    return {
+        "network": net,
+        "store": store,
+        "tech": tech,
+        "tech_headers": login(client, f"tech{suffix}", "1234"),
+        "client": cli,
+        "client_headers": login(client, f"cli{suffix}", "402365"),
+    }
+
+
+@pytest.fixture
+def new_ticket(client, admin, world):
+    def make(**fields) -> dict:
+        body = {"store_id": world["store"]["id"], "problem": "equipamento não liga", "type": "SUPORTE",
+                "priority": "NORMAL", **fields}
+        r = client.post("/tickets/", json=body, headers=admin)
+        assert r.status_code == 200, r.text
+        return r.json()
+    return make
@@ -0,0 +1,38 @@
+import uuid
+
+
+def test_store_search_pages_through_cursor(client, admin):
+    tag = str(uuid.uuid4().int)[:6]
+    for i in range(7):
+        r = client.post("/admin/stores", json={"name": f"Padaria São João {tag} {i}", "cnpj": f"99{tag}{i}"},
+                        headers=admin)
+        assert r.status_code == 200, r.text
+
+    names, cursor = [], None
+    while True:
+        params = {"q": f"joão {tag}", "limit": 3, **({"cursor": cursor} if cursor else {})}
+        r = client.get("/admin/stores", params=params, headers=admin)
+        assert r.status_code == 200, r.text
+        assert len(r.json()) <= 3
+        names += [s["name"] for s in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    # sem acento e sem caixa, sem repetir nem pular entre páginas
+    assert sorted(names) == sorted(f"Padaria São João {tag} {i}" for i in range(7))
+
+
+def test_store_search_matches_cnpj(client, admin):
+    tag = str(uuid.uuid4().int)[:6]
+    client.post("/admin/stores", json={"name": f"Loja {tag}", "cnpj": f"88{tag}0"}, headers=admin)
+
+    r = client.get("/admin/stores", params={"q": f"88{tag}"}, headers=admin)
+
+    assert [s["name"] for s in r.json()] == [f"Loja {tag}"]
+
+
+def test_invalid_cursor_is_400(client, admin):
+    r = client.get("/admin/users", params={"cursor": "garbage", "limit": 2}, headers=admin)
+
+    assert r.status_code == 400
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from app.archive import archive_batch
+from app.database import SessionLocal
+from app.models import Ticket
+
+
+def _closed_ticket(client, world, new_ticket) -> dict:
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    client.post(f"/tickets/{ticket['id']}/start", headers=tech)
+    r = client.post(f"/tickets/{ticket['id']}/close", json={"parecer": "troca da fonte de alimentação"}, headers=tech)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_archived_ticket_is_still_readable(client, admin, world, new_ticket):
+    ticket = _closed_ticket(client, world, new_ticket)
+    db = SessionLocal()
+    try:
+        assert archive_batch(db, datetime.utcnow() + timedelta(seconds=1)) >= 1
+        assert db.get(Ticket, ticket["id"]) is None
+    finally:
+        db.close()
+
+    detail = client.get(f"/tickets/{ticket['id']}", headers=world["client_headers"])
+    updates = client.get(f"/tickets/{ticket['id']}/updates", headers=admin)
+    batch = client.get("/tickets/batch", params={"ids": ticket["id"]}, headers=admin)
+
+    assert detail.status_code == 200 and detail.json()["ticket"]["status"] == "CONCLUIDO"
+    assert detail.json()["ticket"]["resolution_text"] == "troca da fonte de alimentação"
+    assert [u["event_type"] for u in updates.json()][0] == "CREATE"
+    assert "CLOSE" in {u["event_type"] for u in updates.json()}
+    assert [i["ticket"]["id"] for i in batch.json()["items"]] == [ticket["id"]]
+
+
+def test_open_tickets_are_not_archived(client, world, new_ticket):
+    ticket = new_ticket()
+    db = SessionLocal()
+    try:
+        archive_batch(db, datetime.utcnow() + timedelta(seconds=1))
+        assert db.get(Ticket, ticket["id"]) is not None
+    finally:
+        db.close()
@@ -0,0 +1,41 @@
+def _create(client, ticket_id, headers, data: bytes):
+    return client.post(
+        f"/tickets/{ticket_id}/attachments",
+        json={"filename": "../../laudo.pdf", "content_type": "application/pdf", "size": len(data)},
+        headers=headers,
+    )
+
+
+def test_chunked_upload_resumes_from_the_server_offset(client, world, new_ticket):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    data = b"%PDF-1.4 " + bytes(range(256)) * 40
+    half = len(data) // 2
+
+    assert _create(client, ticket["id"], tech, data).status_code == 403  # técnico ainda não atribuído
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    created = _create(client, ticket["id"], tech, data)
+    assert created.status_code == 201, created.text
+    url = f"/tickets/{ticket['id']}/attachments/{created.json()['id']}"
+    assert created.json()["filename"] == "laudo.pdf"
+
+    first = client.patch(url, content=data[:half], headers={**tech, "Upload-Offset": "0"})
+    # o cliente perdeu a resposta e reenvia do zero: o servidor diz de onde continuar
+    stale = client.patch(url, content=data[half:], headers={**tech, "Upload-Offset": "0"})
+    offset = client.head(url, headers=tech).headers["upload-offset"]
+    too_big = client.patch(url, content=data[half:] + b"xx", headers={**tech, "Upload-Offset": offset})
+    last = client.patch(url, content=data[half:], headers={**tech, "Upload-Offset": offset})
+
+    assert first.json()["received"] == half
+    assert (stale.status_code, stale.headers["upload-offset"]) == (409, str(half))
+    assert offset == str(half)
+    assert too_big.status_code == 413
+    assert last.status_code == 200 and last.json()["status"] == "READY"
+
+    viewer = world["client_headers"]
+    whole = client.get(f"{url}/content", headers={**viewer, "Accept-Encoding": "gzip, br"})
+    part = client.get(f"{url}/content", headers={**viewer, "Range": "bytes=0-99", "Accept-Encoding": "gzip"})
+    assert whole.content == data
+    assert "content-encoding" not in whole.headers  # nem "identity": a rota fica fora da compressão
+    assert part.status_code == 206
+    assert part.content == data[:100]
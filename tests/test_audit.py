@@ -0,0 +1,32 @@
+from app.pagination import NEXT_CURSOR_HEADER
+
+
+def test_network_filter_returns_only_that_networks_events(client, admin, world, new_ticket):
+    mine = new_ticket()
+    client.post(f"/tickets/{mine['id']}/assign", headers=world["tech_headers"])
+
+    events = client.get(
+        "/admin/audit", params={"network_id": world["network"]["id"], "limit": 500}, headers=admin
+    ).json()
+
+    assert {e["ticket_id"] for e in events} == {mine["id"]}
+    assert {e["network_id"] for e in events} == {world["network"]["id"]}
+    assert {e["event_type"] for e in events} == {"CREATE", "ASSIGN", "STATUS_CHANGE"}
+
+
+def test_cursor_pages_newest_first_without_gaps(client, admin, world, new_ticket):
+    ticket = new_ticket()
+    for i in range(5):
+        client.post(f"/tickets/{ticket['id']}/comment", json={"message": f"nota {i}"}, headers=admin)
+    params = {"network_id": world["network"]["id"], "limit": 2}
+
+    seen, cursor = [], None
+    while True:
+        r = client.get("/admin/audit", params={**params, **({"cursor": cursor} if cursor else {})}, headers=admin)
+        seen += r.json()
+        cursor = r.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    assert [e["note"] for e in seen if e["event_type"] == "COMMENT"] == [f"nota {i}" for i in reversed(range(5))]
+    assert len(seen) == len({e["id"] for e in seen}) == 6
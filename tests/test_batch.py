@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.database import engine
+
+
+@contextmanager
+def count_queries():
+    n = [0]
+
+    def before(*_):
+        n[0] += 1
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield n
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+def _batch(client, headers, ids, **params):
+    r = client.get("/tickets/batch", params={"ids": ",".join(ids), **params}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_query_count_does_not_grow_with_the_batch(client, admin, world, new_ticket):
+    ids = [new_ticket()["id"] for _ in range(12)]
+    _batch(client, admin, ids[:1], updates_limit=2)  # aquece catálogo/usuário
+
+    with count_queries() as small:
+        _batch(client, admin, ids[:2], updates_limit=2)
+    with count_queries() as large:
+        out = _batch(client, admin, ids, updates_limit=2)
+
+    assert len(out["items"]) == 12
+    assert large[0] == small[0]
+
+
+def test_not_found_and_forbidden_are_reported_per_id(client, admin, world, new_ticket):
+    mine = new_ticket()
+    other_store = client.post("/admin/stores", json={"name": "Sem acesso", "cnpj": mine["id"][-14:]}, headers=admin).json()
+    foreign = client.post("/tickets/", json={"store_id": other_store["id"], "problem": "sem acesso", "type": "SUPORTE",
+                                             "priority": "NORMAL"}, headers=admin).json()
+
+    out = _batch(client, world["client_headers"], [mine["id"], "nope", foreign["id"]])
+
+    assert [i["ticket"]["id"] for i in out["items"]] == [mine["id"]]
+    assert out["not_found"] == ["nope"]
+    assert out["forbidden"] == [foreign["id"]]
+
+
+def test_updates_limit_returns_the_latest_events(client, admin, new_ticket):
+    ticket = new_ticket()
+    for i in range(4):
+        client.post(f"/tickets/{ticket['id']}/comment", json={"message": f"n{i}"}, headers=admin)
+
+    [item] = _batch(client, admin, [ticket["id"]], updates_limit=2)["items"]
+
+    assert [u["note"] for u in item["updates"]] == ["n2", "n3"]
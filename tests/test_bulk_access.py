@@ -0,0 +1,63 @@
+import uuid
+
+from app.database import SessionLocal
+from app.models import ClientAccess
+
+
+def _clients(client, admin, n: int) -> list[str]:
+    return [
+        client.post("/admin/users", json={"username": f"cli{uuid.uuid4().hex[:8]}", "role": "CLIENT"},
+                    headers=admin).json()["id"]
+        for _ in range(n)
+    ]
+
+
+def _stores(client, admin, n: int) -> list[str]:
+    return [
+        client.post("/admin/stores", json={"name": f"L{i}", "cnpj": uuid.uuid4().hex[:14]}, headers=admin).json()["id"]
+        for i in range(n)
+    ]
+
+
+def test_grant_sync_and_revoke_store_access(client, admin):
+    clients, stores = _clients(client, admin, 3), _stores(client, admin, 30)
+    url = "/admin/clients/stores/bulk"
+
+    granted = client.post(url, json={"client_ids": clients, "ids": stores[:20]}, headers=admin).json()
+    synced = client.post(url, json={"client_ids": clients, "ids": stores[10:], "mode": "sync"}, headers=admin).json()
+    unknown = client.post(url, json={"client_ids": clients[:1], "ids": stores[10:12] + ["nada"], "mode": "revoke"},
+                          headers=admin)
+    revoked = client.post(url, json={"client_ids": clients[:1], "ids": stores[10:12], "mode": "revoke"},
+                          headers=admin).json()
+
+    assert granted["added"] == 60
+    assert (synced["added"], synced["removed"], synced["unchanged"]) == (30, 30, 30)
+    assert unknown.status_code == 404  # nada é aplicado se algum id não existe
+    assert revoked["removed"] == 2
+    db = SessionLocal()
+    try:
+        assert db.query(ClientAccess).filter(ClientAccess.user_id.in_(clients)).count() == 58
+    finally:
+        db.close()
+
+
+def test_bulk_access_rejects_non_clients_and_unknown_mode(client, admin, world):
+    stores = _stores(client, admin, 1)
+    url = "/admin/clients/stores/bulk"
+
+    as_tech = client.post(url, json={"client_ids": [world["tech"]["id"]], "ids": stores}, headers=admin)
+    bad_mode = client.post(url, json={"client_ids": [world["client"]["id"]], "ids": stores, "mode": "x"},
+                           headers=admin)
+
+    assert as_tech.status_code == 404
+    assert bad_mode.status_code == 400
+
+
+def test_network_sync_with_empty_list_revokes_everything(client, admin, world):
+    cli = world["client"]["id"]
+
+    r = client.post("/admin/clients/networks/bulk", json={"client_ids": [cli], "ids": [], "mode": "sync"},
+                    headers=admin).json()
+
+    assert r["removed"] == 1
+    assert client.get("/stores/", headers=world["client_headers"]).json() == []
@@ -0,0 +1,125 @@
+import json
+import uuid
+
+from sqlalchemy import func, update
+
+import app.transitions as transitions
+from app.database import SessionLocal
+from app.models import Ticket, TicketStatusSpan, User
+from app.replay import check_chunk
+from app.transitions import apply_bulk_transition, bulk_filter
+
+
+def _tech(client, admin):
+    username = f"tech{uuid.uuid4().hex[:8]}"
+    user = client.post("/admin/users", json={"username": username, "role": "TECH", "password": "1234"},
+                       headers=admin).json()
+    return user
+
+
+def _bulk(client, admin, **body):
+    return client.post("/tickets/bulk-transition", json=body, headers=admin)
+
+
+def test_validation(client, admin, world):
+    assert _bulk(client, admin, action="cancel").status_code == 400  # sem filtro
+    assert _bulk(client, admin, action="reassign", tech_id=world["tech"]["id"]).status_code == 400
+    assert _bulk(client, admin, action="explode", store_id=world["store"]["id"]).status_code == 400
+    r = client.post("/tickets/bulk-transition", json={"action": "cancel", "store_id": world["store"]["id"]},
+                    headers=world["tech_headers"])
+    assert r.status_code == 403
+
+
+def test_reassign_keeps_status_and_records_events(client, admin, world, new_ticket, monkeypatch):
+    monkeypatch.setattr(transitions, "BULK_TRANSITION_CHUNK", 2)
+    tech = world["tech_headers"]
+    ids = [new_ticket()["id"] for _ in range(5)]
+    for tid in ids:
+        client.post(f"/tickets/{tid}/assign", headers=tech)
+    client.post(f"/tickets/{ids[0]}/start", headers=tech)
+    other = _tech(client, admin)
+
+    dry = _bulk(client, admin, action="reassign", tech_id=world["tech"]["id"], to_username=other["username"],
+                dry_run=True).json()
+    out = _bulk(client, admin, action="reassign", tech_id=world["tech"]["id"], to_username=other["username"],
+                reason="férias").json()
+
+    assert dry["matched"] == 5 and dry["changed"] == 0
+    assert out["changed"] == 5 and out["by_status"] == {"ATRIBUIDO": 4, "EM_ATENDIMENTO": 1}
+    detail = client.get(f"/tickets/{ids[0]}", headers=admin).json()
+    assert detail["ticket"]["assigned_tech_id"] == other["id"] and detail["ticket"]["status"] == "EM_ATENDIMENTO"
+    last = detail["updates"][-1]
+    assert last["event_type"] == "ASSIGN" and last["note"] == "férias"
+    assert json.loads(last["payload_json"])["bulk"] == out["operation_id"]
+    assert check_chunk(ids)["mismatches"] == []
+
+
+def test_cancel_then_reopen_keeps_the_old_resolution_in_the_log(client, admin, world, new_ticket):
+    tech = world["tech_headers"]
+    closed, open_ = new_ticket(), new_ticket()
+    client.post(f"/tickets/{closed['id']}/assign", headers=tech)
+    client.post(f"/tickets/{closed['id']}/start", headers=tech)
+    client.post(f"/tickets/{closed['id']}/close", json={"parecer": "troca do roteador feita"}, headers=tech)
+
+    cancel = _bulk(client, admin, action="cancel", store_id=world["store"]["id"]).json()
+    reopen = _bulk(client, admin, action="reopen", ticket_ids=[closed["id"], open_["id"]]).json()
+
+    assert cancel["changed"] == 1 and cancel["by_status"] == {"ABERTO": 1}
+    assert reopen["changed"] == 2
+    detail = client.get(f"/tickets/{closed['id']}", headers=admin).json()
+    assert detail["ticket"]["status"] == "ABERTO" and detail["ticket"]["assigned_tech_id"] is None
+    assert detail["ticket"]["resolution_text"] is None
+    reopened = [u for u in detail["updates"] if u["event_type"] == "STATUS_CHANGE"][-1]
+    assert json.loads(reopened["payload_json"])["resolution_text"] == "troca do roteador feita"
+    # pode ser concluído de novo
+    client.post(f"/tickets/{closed['id']}/assign", headers=tech)
+    client.post(f"/tickets/{closed['id']}/start", headers=tech)
+    r = client.post(f"/tickets/{closed['id']}/close", json={"parecer": "agora resolvido de vez"}, headers=tech)
+    assert r.status_code == 200
+    assert check_chunk([closed["id"], open_["id"]])["mismatches"] == []
+
+
+def test_one_open_span_per_ticket_after_bulk(client, admin, world, new_ticket):
+    ids = [new_ticket()["id"] for _ in range(3)]
+    _bulk(client, admin, action="cancel", ticket_ids=ids)
+    _bulk(client, admin, action="reopen", ticket_ids=ids)
+
+    db = SessionLocal()
+    try:
+        open_spans = dict(
+            db.query(TicketStatusSpan.ticket_id, func.count())
+            .filter(TicketStatusSpan.ticket_id.in_(ids), TicketStatusSpan.ended_at.is_(None))
+            .group_by(TicketStatusSpan.ticket_id)
+        )
+    finally:
+        db.close()
+    assert open_spans == {tid: 1 for tid in ids}
+
+
+def test_chunk_changed_by_another_commit_is_retried_then_reported(world, new_ticket, monkeypatch):
+    ids = [new_ticket()["id"] for _ in range(3)]
+    db = SessionLocal()
+    try:
+        admin_user = db.query(User).filter(User.username == "admin").one()
+        original = transitions.sla_transition
+        races = {"left": 1}
+
+        def racing(t, old, now):
+            if races["left"]:
+                races["left"] -= 1
+                other = SessionLocal()
+                other.execute(update(Ticket).where(Ticket.id == t.id).values(version=Ticket.version + 1))
+                other.commit()
+                other.close()
+            return original(t, old, now)
+
+        monkeypatch.setattr(transitions, "sla_transition", racing)
+        retried = apply_bulk_transition(db, admin_user, "cancel", bulk_filter(ticket_ids=ids), chunk=10)
+
+        races["left"] = 10**6  # toda tentativa esbarra: o bloco é desistido
+        reopen = apply_bulk_transition(db, admin_user, "reopen", bulk_filter(ticket_ids=ids), chunk=10)
+    finally:
+        db.close()
+
+    assert retried["changed"] == 3 and retried["conflicts"] == 0
+    assert reopen["changed"] == 0 and reopen["conflicts"] == 3
@@ -0,0 +1,27 @@
+from app.catalog import catalog
+
+
+def test_store_rename_is_written_through_to_tickets(client, admin, world, new_ticket):
+    ticket = new_ticket()
+    before = catalog.version
+
+    r = client.patch(f"/admin/stores/{world['store']['id']}", json={"name": "Loja Renomeada"}, headers=admin)
+
+    assert r.status_code == 200, r.text
+    # write-through: o catálogo local avança junto com a versão do banco, sem recarregar
+    assert catalog.version == before + 1
+    detail = client.get(f"/tickets/{ticket['id']}", headers=admin).json()
+    assert detail["ticket"]["store_name"] == "Loja Renomeada"
+
+
+def test_inactive_store_rejects_new_tickets(client, admin, world):
+    client.patch(f"/admin/stores/{world['store']['id']}", json={"active": False}, headers=admin)
+
+    r = client.post(
+        "/tickets/",
+        json={"store_id": world["store"]["id"], "problem": "equipamento não liga", "type": "SUPORTE",
+              "priority": "NORMAL"},
+        headers=admin,
+    )
+
+    assert r.status_code == 404
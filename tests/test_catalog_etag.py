@@ -0,0 +1,44 @@
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/stores/", "/networks/", "/stores/?fields=name"])
+def test_catalog_lists_answer_304_for_matching_etag(client, world, path):
+    headers = world["client_headers"]
+    first = client.get(path, headers=headers)
+
+    again = client.get(path, headers={**headers, "If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_losing_network_access_changes_the_etag(client, admin, world):
+    headers = world["client_headers"]
+    etag = client.get("/stores/", headers=headers).headers["etag"]
+
+    client.delete(f"/admin/clients/{world['client']['id']}/networks/{world['network']['id']}", headers=admin)
+    r = client.get("/stores/", headers={**headers, "If-None-Match": etag})
+
+    assert r.status_code == 200
+    assert r.json() == []
+
+
+def test_admin_store_write_changes_the_etag(client, admin, world):
+    etag = client.get("/admin/stores", headers=admin).headers["etag"]
+
+    client.patch(f"/admin/stores/{world['store']['id']}", json={"name": "Outro Nome"}, headers=admin)
+    r = client.get("/admin/stores", headers={**admin, "If-None-Match": etag})
+
+    assert r.status_code == 200
+
+
+def test_staff_lists_are_public_and_client_lists_private(client, admin, world):
+    staff = client.get("/stores/", headers=world["tech_headers"])
+    admin_list = client.get("/admin/stores", headers=admin)
+    own = client.get("/stores/", headers=world["client_headers"])
+
+    assert staff.headers["cache-control"].startswith("public")
+    assert admin_list.headers["cache-control"].startswith("public")
+    assert own.headers["cache-control"].startswith("private")
+    assert "Authorization" in own.headers["vary"] and "Authorization" in staff.headers["vary"]
@@ -0,0 +1,63 @@
+import uuid
+
+from sqlalchemy import update
+
+import app.denorm as denorm
+from app.database import SessionLocal
+from app.jobs import runner
+from app.models import Ticket
+
+
+def test_store_rename_and_move_rewrite_ticket_columns(client, admin, world, new_ticket):
+    ids = {new_ticket()["id"] for _ in range(5)}
+    other = client.post("/admin/networks", json={"name": f"Rede {uuid.uuid4().hex[:8]}"}, headers=admin).json()
+
+    r = client.patch(f"/admin/stores/{world['store']['id']}", json={"name": "Loja Movida", "network_id": other["id"]},
+                     headers=admin)
+
+    assert r.status_code == 200, r.text
+    # a rede muda no mesmo commit: o cliente (só da rede antiga) perde o acesso antes do job
+    assert client.get("/tickets/", headers=world["client_headers"]).json() == []
+    assert client.get("/tickets/overdue", headers=world["client_headers"]).json() == []
+    before_job = client.get("/tickets/", params={"network_id": other["id"]}, headers=admin).json()
+    assert {t["id"] for t in before_job} == ids
+    runner.run_pending()
+
+    moved = client.get("/tickets/", params={"network_id": other["id"]}, headers=admin).json()
+    assert {t["id"] for t in moved} == ids
+    assert {t["store_name"] for t in moved} == {"Loja Movida"}
+    assert client.get("/tickets/", params={"network_id": world["network"]["id"]}, headers=admin).json() == []
+    # o cliente só tinha acesso à rede antiga
+    assert client.get("/tickets/", headers=world["client_headers"]).json() == []
+
+
+def test_backfill_fills_tickets_without_columns(world, new_ticket):
+    ids = [new_ticket()["id"] for _ in range(3)]
+    db = SessionLocal()
+    try:
+        db.execute(update(Ticket).where(Ticket.id.in_(ids)).values(store_name=None, network_id=None))
+        db.commit()
+
+        assert denorm.backfill(db, batch_size=2) >= 3
+
+        rows = db.query(Ticket.store_name, Ticket.network_id).filter(Ticket.id.in_(ids)).all()
+        assert set(rows) == {(world["store"]["name"], world["network"]["id"])}
+    finally:
+        db.close()
+
+
+def test_tickets_without_columns_follow_the_store_network(client, admin, world, new_ticket):
+    ticket_id = new_ticket()["id"]
+    db = SessionLocal()
+    try:
+        db.execute(update(Ticket).where(Ticket.id == ticket_id).values(store_name=None, network_id=None))
+        db.commit()
+    finally:
+        db.close()
+
+    # backfill ainda não rodou: escopo do cliente e filtro por rede usam a rede da loja
+    mine = client.get("/tickets/", headers=world["client_headers"]).json()
+    by_network = client.get("/tickets/", params={"network_id": world["network"]["id"]}, headers=admin).json()
+
+    assert ticket_id in {t["id"] for t in mine}
+    assert ticket_id in {t["id"] for t in by_network}
@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.database import SessionLocal
+from app.dispatch import Dispatcher
+from app.models import Ticket
+from app.seed import SYSTEM_USERNAME
+
+
+def test_automatic_assign_is_attributed_to_the_system_user(client, admin, world, new_ticket):
+    ticket = new_ticket()
+    d = Dispatcher()
+    d.enqueue(SimpleNamespace(id=ticket["id"], priority=ticket["priority"], opened_at=datetime.utcnow()))
+
+    db = SessionLocal()
+    try:
+        assert d.run_once(db) == 1
+        tech_id = db.get(Ticket, ticket["id"]).assigned_tech_id
+    finally:
+        db.close()
+
+    events = client.get(
+        "/admin/audit", params={"event_type": "ASSIGN", "payload.tech_id": tech_id, "limit": 500}, headers=admin
+    ).json()
+    [event] = [e for e in events if e["ticket_id"] == ticket["id"]]
+    assert event["username"] == SYSTEM_USERNAME
+    assert event["created_by_user_id"] != tech_id
+    payload = json.loads(event["payload_json"])
+    assert payload["auto"] is True and payload["tech_id"] == tech_id
+
+
+def test_system_user_is_hidden_from_admin_and_cannot_log_in(client, admin):
+    users = client.get("/admin/users", params={"q": SYSTEM_USERNAME}, headers=admin).json()
+
+    assert users == []
+    assert client.post("/auth/login", json={"username": SYSTEM_USERNAME, "password": "!"}).status_code == 401
+
+
+def test_catch_up_picks_tickets_created_in_other_workers(new_ticket):
+    d = Dispatcher()
+    db = SessionLocal()
+    try:
+        d.rebuild(db)
+        # criado "em outro worker": o dispatcher deste processo não recebeu enqueue()
+        ticket = new_ticket()
+        assert ticket["id"] not in d.queue._queued
+
+        d.catch_up(db)
+    finally:
+        db.close()
+
+    assert ticket["id"] in d.queue._queued
+
+
+def test_manual_run_is_refused_outside_the_dispatcher_worker(client, admin):
+    # DISPATCH_ENABLED=0 nos testes: este processo não tem a thread nem a fila do despacho
+    r = client.post("/admin/dispatch/run", params={"rebuild": True}, headers=admin)
+
+    assert r.status_code == 409
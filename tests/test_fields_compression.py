@@ -0,0 +1,54 @@
+import pytest
+
+from app.compression import COMPRESS_MIN_SIZE
+
+
+def test_fields_projects_the_ticket_list(client, world, new_ticket):
+    ticket = new_ticket()
+
+    r = client.get("/tickets/", params={"fields": "status,store_name"}, headers=world["client_headers"])
+
+    assert r.status_code == 200
+    # id vem sempre
+    assert r.json() == [{"id": ticket["id"], "status": "ABERTO", "store_name": world["store"]["name"]}]
+
+
+def test_fields_on_detail_and_updates(client, world, new_ticket):
+    ticket = new_ticket()
+    headers = world["client_headers"]
+
+    detail = client.get(f"/tickets/{ticket['id']}", params={"fields": "status,resolution_text"}, headers=headers)
+    updates = client.get(f"/tickets/{ticket['id']}/updates", params={"fields": "event_type"}, headers=headers)
+
+    assert detail.json()["ticket"] == {"id": ticket["id"], "status": "ABERTO", "resolution_text": None}
+    (update,) = updates.json()
+    assert update == {"id": update["id"], "event_type": "CREATE"}
+
+
+def test_unknown_field_is_400(client, world):
+    r = client.get("/tickets/", params={"fields": "status,nope"}, headers=world["client_headers"])
+
+    assert r.status_code == 400
+
+
+def test_large_responses_are_gzipped_small_ones_are_not(client, world, new_ticket):
+    for _ in range(5):
+        new_ticket(problem="equipamento não liga " * 20)
+    headers = {**world["client_headers"], "Accept-Encoding": "gzip"}
+
+    large = client.get("/tickets/", headers=headers)
+    small = client.get("/tickets/", params={"fields": "status", "limit": 1}, headers=headers)
+
+    assert large.headers["content-encoding"] == "gzip" and len(large.json()) == 5
+    assert int(large.headers["content-length"]) < len(large.content)
+    assert len(small.content) < COMPRESS_MIN_SIZE and "content-encoding" not in small.headers
+
+
+def test_brotli_when_the_client_accepts_it(client, world, new_ticket):
+    pytest.importorskip("brotli")
+    for _ in range(5):
+        new_ticket(problem="equipamento não liga " * 20)
+
+    r = client.get("/tickets/", headers={**world["client_headers"], "Accept-Encoding": "br, gzip"})
+
+    assert r.headers["content-encoding"] == "br" and len(r.json()) == 5
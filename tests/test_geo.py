@@ -0,0 +1,57 @@
+import random
+import uuid
+
+from app.geo import GeoGrid, haversine_km, route_order
+
+
+def test_grid_matches_brute_force():
+    rng = random.Random(7)
+    points = {str(i): (rng.uniform(-23.1, -22.7), rng.uniform(-43.6, -43.0)) for i in range(500)}
+    grid = GeoGrid()
+    for item_id, (lat, lon) in points.items():
+        grid.upsert(item_id, lat, lon)
+
+    got = grid.within(-22.91, -43.18, 12)
+
+    expected = sorted(
+        (i, haversine_km(-22.91, -43.18, lat, lon)) for i, (lat, lon) in points.items()
+        if haversine_km(-22.91, -43.18, lat, lon) <= 12
+    )
+    assert sorted(got) == expected
+    assert [km for _, km in got] == sorted(km for _, km in got)
+
+
+def test_grid_moves_and_removes():
+    grid = GeoGrid()
+    grid.upsert("loja", -22.90, -43.17)
+    grid.upsert("loja", -10.0, -40.0)
+    assert grid.within(-22.90, -43.17, 5) == []
+
+    grid.upsert("loja", None, None)  # sem coordenadas sai do índice
+    assert len(grid) == 0
+
+
+def test_route_visits_points_on_a_line_in_order():
+    points = [(-22.9, -43.0 - 0.05 * k) for k in (3, 0, 4, 1, 2)]
+
+    order = route_order((-22.9, -42.9), points)
+
+    assert [points[i] for i in order] == sorted(points, key=lambda p: -p[1])
+
+
+def test_nearby_tickets_sorted_by_distance(client, admin, world, new_ticket):
+    def store(lat, lon):
+        body = {"name": f"Loja {uuid.uuid4().hex[:6]}", "cnpj": uuid.uuid4().hex[:14],
+                "network_id": world["network"]["id"], "latitude": lat, "longitude": lon}
+        return client.post("/admin/stores", json=body, headers=admin).json()["id"]
+
+    tijuca, centro, sp = store(-22.9249, -43.2320), store(-22.9068, -43.1729), store(-23.55, -46.63)
+    ids = [new_ticket(store_id=s)["id"] for s in (tijuca, centro, sp)]
+
+    r = client.get("/tickets/nearby", params={"lat": -22.91, "lon": -43.18, "radius": 20},
+                   headers=world["tech_headers"])
+
+    assert r.status_code == 200, r.text
+    mine = [t["id"] for t in r.json() if t["id"] in ids]
+    assert mine == [ids[1], ids[0]]
+    assert client.get("/tickets/nearby", params={"lat": 0, "lon": 0}, headers=world["client_headers"]).status_code == 403
@@ -0,0 +1,53 @@
+import uuid
+
+
+def test_retry_replays_first_response_without_reexecuting(client, world, new_ticket, admin):
+    ticket = new_ticket()
+    key = {"Idempotency-Key": str(uuid.uuid4())}
+    headers = {**world["client_headers"], **key}
+
+    first = client.post(f"/tickets/{ticket['id']}/comment", json={"message": "oi"}, headers=headers)
+    retry = client.post(f"/tickets/{ticket['id']}/comment", json={"message": "oi"}, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    updates = client.get(f"/tickets/{ticket['id']}/updates", headers=admin).json()
+    assert sum(u["event_type"] == "COMMENT" for u in updates) == 1
+
+
+def test_same_key_with_other_body_is_rejected(client, world, new_ticket):
+    ticket = new_ticket()
+    headers = {**world["client_headers"], "Idempotency-Key": str(uuid.uuid4())}
+    client.post(f"/tickets/{ticket['id']}/comment", json={"message": "oi"}, headers=headers)
+
+    r = client.post(f"/tickets/{ticket['id']}/comment", json={"message": "outro"}, headers=headers)
+
+    assert r.status_code == 422
+
+
+def test_replay_of_compressed_response_keeps_encoding_and_headers(client, admin, world):
+    body = {"store_id": world["store"]["id"], "problem": "x" * 2048, "type": "SUPORTE", "priority": "NORMAL"}
+    headers = {**admin, "Idempotency-Key": str(uuid.uuid4()), "Accept-Encoding": "gzip"}
+
+    first = client.post("/tickets/", json=body, headers=headers)
+    retry = client.post("/tickets/", json=body, headers=headers)
+
+    assert first.headers["content-encoding"] == "gzip"
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.headers["content-encoding"] == "gzip"
+    assert retry.headers["content-type"] == first.headers["content-type"]
+    assert retry.headers.get("etag") == first.headers.get("etag")
+    # httpx descomprime pelo Content-Encoding: JSON válido = gzip uma vez só, do corpo original
+    assert retry.json() == first.json()
+
+
+def test_replay_without_accept_encoding_is_plain_json(client, admin, world):
+    body = {"store_id": world["store"]["id"], "problem": "y" * 2048, "type": "SUPORTE", "priority": "NORMAL"}
+    key = str(uuid.uuid4())
+
+    first = client.post("/tickets/", json=body, headers={**admin, "Idempotency-Key": key, "Accept-Encoding": "gzip"})
+    retry = client.post("/tickets/", json=body, headers={**admin, "Idempotency-Key": key, "Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in retry.headers
+    assert retry.json()["id"] == first.json()["id"]
@@ -0,0 +1,35 @@
+import threading
+import time
+import uuid
+
+from app.ids import new_id, uuid7
+
+
+def test_uuid7_layout_and_timestamp():
+    before = time.time_ns() // 1_000_000
+    u = uuid7()
+    after = time.time_ns() // 1_000_000
+
+    assert u.version == 7
+    assert u.variant == uuid.RFC_4122
+    # pode ter emprestado o ms seguinte se o contador estourou
+    assert before <= u.int >> 80 <= after + 1
+
+
+def test_ids_sort_in_creation_order_across_threads():
+    ids: list[list[str]] = [[] for _ in range(4)]
+
+    def make(out: list[str]) -> None:
+        for _ in range(2000):
+            out.append(new_id())
+
+    threads = [threading.Thread(target=make, args=(out,)) for out in ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # dentro de cada thread, ordem de criação = ordem de texto (cai no fim do índice)
+    for out in ids:
+        assert out == sorted(out)
+    assert len({i for out in ids for i in out}) == 8000
@@ -0,0 +1,26 @@
+from app.profiling import PROFILE_HEADER
+
+
+def test_admin_can_profile_a_request_and_read_it_back(client, admin, new_ticket):
+    new_ticket()
+
+    r = client.get("/tickets/", params={"limit": 50}, headers={**admin, PROFILE_HEADER: "1"})
+    profile_id = r.headers["x-profile-id"]
+    listed = client.get("/admin/profiles", headers=admin).json()
+    detail = client.get(f"/admin/profiles/{profile_id}", headers=admin).json()
+    collapsed = client.get(f"/admin/profiles/{profile_id}/collapsed", headers=admin)
+
+    assert r.status_code == 200
+    assert profile_id in {p["id"] for p in listed}
+    assert detail["sql"]["queries"] > 0
+    assert collapsed.status_code == 200
+
+
+def test_profile_header_is_ignored_for_non_admins(client, world):
+    tech = world["tech_headers"]
+
+    r = client.get("/tickets/", headers={**tech, PROFILE_HEADER: "1"})
+
+    assert r.status_code == 200
+    assert "x-profile-id" not in r.headers
+    assert client.get("/admin/profiles", headers=tech).status_code == 403
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.database as database
+from app.database import PRIMARY_STICKY_HEADER
+from app.queue_cache import MicroCache, queue_cache, QUEUE_SCOPE
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    # "réplica" = outro engine no mesmo arquivo: basta para ver de onde a sessão leu
+    engine = create_engine(database.DATABASE_URL)
+    monkeypatch.setattr(database, "replica_engine", engine)
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    yield engine
+    engine.dispose()
+
+
+def _queue_sources() -> set[str]:
+    """De onde vieram as entradas válidas (geração atual) da fila."""
+    with queue_cache.lock:
+        gen = queue_cache._generations.get(QUEUE_SCOPE, 0)
+        return {key[1] for key, (_, g, _) in queue_cache._entries.items() if key[0] == QUEUE_SCOPE and g == gen}
+
+
+def test_sticky_reader_does_not_get_the_replica_cached_queue(client, world, new_ticket, replica):
+    queue_cache.invalidate(QUEUE_SCOPE)
+    tech = world["tech_headers"]
+    client.cookies.clear()  # o cookie de read-your-writes das escritas anteriores
+
+    from_replica = client.get("/tickets/", params={"open_only": True}, headers=tech)
+    ticket = new_ticket()
+    client.cookies.clear()
+    # a escrita invalida a fila; quem está grudado no primário ganha entrada própria, lida do primário
+    sticky = {**tech, PRIMARY_STICKY_HEADER: f"{time.time() + 10:.3f}"}
+    from_primary = client.get("/tickets/", params={"open_only": True}, headers=sticky)
+
+    assert from_replica.status_code == from_primary.status_code == 200
+    assert ticket["id"] in {t["id"] for t in from_primary.json()}
+    assert _queue_sources() == {"primary"}
+    client.get("/tickets/", params={"open_only": True}, headers=tech)
+    assert _queue_sources() == {"primary", "replica"}
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = MicroCache(ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return ["fila"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(("queue", "all"), compute)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.stats()["misses"] + cache.stats()["coalesced"] < 8:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [["fila"]] * 8
+    assert cache.get_or_compute(("queue", "all"), compute) == ["fila"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_result_computed_before_invalidation_is_not_kept():
+    cache = MicroCache(ttl=60)
+
+    def compute_and_race():
+        cache.invalidate("queue")  # uma escrita commitou enquanto a query rodava
+        return "velho"
+
+    assert cache.get_or_compute(("queue", "all"), compute_and_race) == "velho"
+    assert cache.get_or_compute(("queue", "all"), lambda: "novo") == "novo"
+    cache.invalidate("mine:outro")
+    assert cache.get_or_compute(("queue", "all"), lambda: "outro") == "novo"
@@ -0,0 +1,139 @@
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models import Ticket, TicketUpdate
+from app.replay import check_chunk, snapshot_ticket
+
+
+def _mark() -> str:
+    time.sleep(0.002)
+    ts = datetime.utcnow().isoformat()
+    time.sleep(0.002)
+    return ts
+
+
+def _as_of(client, headers, ticket_id, ts):
+    r = client.get(f"/tickets/{ticket_id}/as-of", params={"ts": ts}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _snapshot(ticket_id: str, every: int) -> int:
+    db = SessionLocal()
+    try:
+        n = snapshot_ticket(db, ticket_id, every)
+        db.commit()
+        return n
+    finally:
+        db.close()
+
+
+def test_as_of_rebuilds_the_ticket_at_each_instant(client, admin, world, new_ticket):
+    ticket = new_ticket(local="sala 1")
+    tech = world["tech_headers"]
+    created = _mark()
+    for i in range(6):
+        client.patch(f"/tickets/{ticket['id']}", json={"local": f"sala {i + 2}"}, headers=admin)
+    edited = _mark()
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    client.post(f"/tickets/{ticket['id']}/start", headers=tech)
+    started = _mark()
+
+    before = client.get(f"/tickets/{ticket['id']}/as-of", params={"ts": "2000-01-01T00:00:00"}, headers=admin)
+    at_created = _as_of(client, admin, ticket["id"], created)
+    at_edited = _as_of(client, admin, ticket["id"], edited)
+    at_started = _as_of(client, admin, ticket["id"], started)
+
+    assert before.status_code == 404
+    assert (at_created["status"], at_created["local"], at_created["problem"]) == ("ABERTO", "sala 1", ticket["problem"])
+    assert at_edited["local"] == "sala 7" and at_edited["assigned_tech_id"] is None and at_edited["events"] == 7
+    assert at_started["status"] == "EM_ATENDIMENTO" and at_started["assigned_tech_id"] == world["tech"]["id"]
+    assert at_started["snapshot_at"] is None and at_started["events_replayed"] == at_started["events"]
+
+
+def test_snapshots_give_the_same_state_with_fewer_events(client, admin, world, new_ticket):
+    ticket = new_ticket()
+    for i in range(11):
+        client.patch(f"/tickets/{ticket['id']}", json={"local": f"L{i}"}, headers=admin)
+    ts = _mark()
+    full = _as_of(client, admin, ticket["id"], ts)
+
+    assert _snapshot(ticket["id"], every=5) == 2
+    from_snapshot = _as_of(client, admin, ticket["id"], ts)
+
+    assert from_snapshot["snapshot_at"] is not None and from_snapshot["events_replayed"] == 2
+    ignore = ("snapshot_at", "events_replayed")
+    assert {k: v for k, v in from_snapshot.items() if k not in ignore} == {k: v for k, v in full.items() if k not in ignore}
+
+
+def test_event_after_a_snapshot_is_not_lost(client, admin, world, new_ticket):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    offline_start = datetime.utcnow()
+    for i in range(3):
+        client.post(f"/tickets/{ticket['id']}/comment", json={"message": f"c{i}"}, headers=admin)
+    assert _snapshot(ticket["id"], every=5) == 1
+
+    # ação offline com horário anterior ao snapshot: tem que entrar depois dele no log
+    client.post("/tickets/sync", json={"actions": [{
+        "client_action_id": str(uuid.uuid4()), "ticket_id": ticket["id"], "action": "start",
+        "client_ts": offline_start.isoformat(),
+    }]}, headers=tech)
+
+    assert _as_of(client, admin, ticket["id"], _mark())["status"] == "EM_ATENDIMENTO"
+
+
+def test_legacy_create_without_fields_uses_the_first_edit(client, admin, new_ticket):
+    ticket = new_ticket(priority="URGENTE")
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(TicketUpdate)
+            .where(TicketUpdate.ticket_id == ticket["id"], TicketUpdate.event_type == "CREATE")
+            .values(payload_json='{"status": "ABERTO"}')
+        )
+        db.commit()
+    finally:
+        db.close()
+    client.patch(f"/tickets/{ticket['id']}", json={"problem": "outro problema"}, headers=admin)
+
+    at_open = _as_of(client, admin, ticket["id"], ticket["opened_at"])
+
+    assert at_open["problem"] == ticket["problem"] and at_open["priority"] == "URGENTE"
+
+
+def test_check_finds_rows_that_disagree_with_the_log(client, admin, world, new_ticket):
+    good, bad = new_ticket(), new_ticket()
+    client.post(f"/tickets/{good['id']}/assign", headers=world["tech_headers"])
+    db = SessionLocal()
+    try:
+        db.execute(update(Ticket).where(Ticket.id == bad["id"]).values(status="PENDENTE"))
+        db.commit()
+    finally:
+        db.close()
+
+    out = check_chunk([good["id"], bad["id"]])
+
+    assert out["tickets"] == 2
+    assert [(m["ticket_id"], m["field"]) for m in out["mismatches"]] == [(bad["id"], "status")]
+
+
+def test_reopen_clears_started_at_in_the_replay(client, admin, world, new_ticket):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    client.post(f"/tickets/{ticket['id']}/start", headers=tech)
+    client.post(f"/tickets/{ticket['id']}/close", json={"parecer": "troca da fonte feita"}, headers=tech)
+    r = client.post("/tickets/bulk-transition", json={"action": "reopen", "ticket_ids": [ticket["id"]]}, headers=admin)
+    assert r.status_code == 200, r.text
+
+    state = _as_of(client, admin, ticket["id"], _mark())
+
+    assert state["status"] == "ABERTO"
+    assert state["started_at"] is None and state["closed_at"] is None
+    assert check_chunk([ticket["id"]])["mismatches"] == []
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.database as database
+from app.database import Base, PRIMARY_STICKY_COOKIE, PRIMARY_STICKY_HEADER
+
+
+@pytest.fixture
+def empty_replica(monkeypatch, tmp_path):
+    """Réplica que ainda não recebeu nada (atraso máximo): mesmo schema, sem dados."""
+    engine = create_engine(f"sqlite:///{tmp_path}/replica.sqlite")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "replica_engine", engine)
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    yield engine
+    engine.dispose()
+
+
+def test_write_makes_the_client_read_from_the_primary(client, admin, world, empty_replica):
+    r = client.post("/tickets/", json={
+        "store_id": world["store"]["id"], "problem": "sem sinal", "type": "SUPORTE", "priority": "NORMAL",
+    }, headers=admin)
+    ticket_id = r.json()["id"]
+
+    assert r.headers[PRIMARY_STICKY_HEADER]
+    assert client.cookies.get(PRIMARY_STICKY_COOKIE)
+    assert client.get(f"/tickets/{ticket_id}", headers=admin).status_code == 200
+
+    sticky_until = r.headers[PRIMARY_STICKY_HEADER]
+    client.cookies.clear()
+    # sem cookie nem header: lê da réplica, que ainda não tem o chamado
+    assert client.get(f"/tickets/{ticket_id}", headers=admin).status_code == 404
+    # app que guarda o header em vez do cookie
+    r = client.get(f"/tickets/{ticket_id}", headers={**admin, PRIMARY_STICKY_HEADER: sticky_until})
+    assert r.status_code == 200
+
+
+def test_failed_write_does_not_pin_to_the_primary(client, admin, empty_replica):
+    client.cookies.clear()
+
+    r = client.post("/tickets/", json={"store_id": "nope", "problem": "sem sinal", "type": "SUPORTE",
+                                       "priority": "NORMAL"}, headers=admin)
+
+    assert r.status_code == 404
+    assert PRIMARY_STICKY_HEADER not in r.headers
+    assert not client.cookies.get(PRIMARY_STICKY_COOKIE)
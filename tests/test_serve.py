@@ -0,0 +1,36 @@
+import fcntl
+import os
+
+import pytest
+
+import app.serve as serve
+
+
+@pytest.mark.parametrize(
+    "cpus, mem_mb, expected",
+    [(4, None, 4), (4, 500, 2), (1, 100, 1), (32, 64 * 1024, serve.SERVE_MAX_WORKERS)],
+)
+def test_default_workers_respects_cpu_memory_and_cap(monkeypatch, cpus, mem_mb, expected):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(serve, "cpu_limit", lambda: cpus)
+    monkeypatch.setattr(serve, "memory_limit_bytes", lambda: mem_mb and mem_mb * 1024 * 1024)
+    monkeypatch.setattr(serve, "SERVE_WORKER_MEMORY_MB", 200)
+
+    assert serve.default_workers() == expected
+
+
+def test_worker_singleton_holds_a_file_lock(monkeypatch, tmp_path):
+    monkeypatch.setenv(serve.SERVE_LOCK_DIR_ENV, str(tmp_path))
+    try:
+        assert serve.worker_singleton("dispatch")
+        assert serve.worker_singleton("dispatch")  # o mesmo processo continua dono
+
+        # outro worker (outra descrição de arquivo) não consegue o lock
+        fd = os.open(tmp_path / "dispatch.lock", os.O_RDWR)
+        try:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.close(fd)
+    finally:
+        os.close(serve._held_locks.pop("dispatch"))
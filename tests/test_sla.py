@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import app.sla as sla
+from app.models import Ticket
+from app.sla import apply_sla, sla_transition
+
+
+def test_time_in_pendente_does_not_count_towards_close():
+    opened = datetime(2026, 1, 5, 8, 0)
+    t = Ticket(status="ATRIBUIDO", priority="URGENTE", type="REPARO", opened_at=opened)
+    apply_sla(t, opened)
+    due = t.sla_close_due_at
+
+    t.status = "PENDENTE"
+    sla_transition(t, "ATRIBUIDO", opened + timedelta(hours=1))
+    assert (t.sla_due_at, t.sla_kind) == (None, None)
+
+    t.status = "EM_ATENDIMENTO"
+    sla_transition(t, "PENDENTE", opened + timedelta(hours=3))
+
+    assert t.sla_paused_seconds == 2 * 3600
+    assert t.sla_due_at == t.sla_close_due_at == due + timedelta(hours=2)
+    assert t.sla_kind == "CLOSE"
+
+
+def test_overdue_and_at_risk_lists(client, world, new_ticket, monkeypatch):
+    monkeypatch.setitem(sla._POLICIES, "URGENTE", {"assign": 0, "close": 30})
+    ticket = new_ticket(priority="URGENTE")
+    tech = world["tech_headers"]
+
+    overdue = client.get("/tickets/overdue", params={"kind": "ASSIGN"}, headers=world["client_headers"]).json()
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    at_risk = client.get("/tickets/at-risk", params={"within_minutes": 60}, headers=tech).json()
+
+    assert ticket["id"] in {t["id"] for t in overdue}
+    assert {"id": ticket["id"], "sla_kind": "CLOSE"} in [{"id": t["id"], "sla_kind": t["sla_kind"]} for t in at_risk]
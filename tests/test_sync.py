@@ -0,0 +1,78 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+
+def _sync(client, headers, *actions):
+    r = client.post("/tickets/sync", json={"actions": list(actions)}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _action(ticket_id, action, client_ts=None, **kw):
+    return {"client_action_id": str(uuid.uuid4()), "ticket_id": ticket_id, "action": action,
+            "client_ts": client_ts.isoformat() if client_ts else None, **kw}
+
+
+def test_offline_action_keeps_event_log_append_only(client, admin, world, new_ticket):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    assert client.post(f"/tickets/{ticket['id']}/assign", headers=tech).status_code == 200
+    started_offline = datetime.utcnow()
+    time.sleep(0.01)
+    # enquanto o técnico está sem sinal, o cliente comenta
+    client.post(f"/tickets/{ticket['id']}/comment", json={"message": "alguma novidade?"}, headers=world["client_headers"])
+
+    out = _sync(client, tech, _action(ticket["id"], "start", started_offline))
+
+    assert out["results"][0]["result"] == "APPLIED"
+    assert out["tickets"][0]["status"] == "EM_ATENDIMENTO"
+    updates = client.get(f"/tickets/{ticket['id']}/updates", headers=admin).json()
+    times = [u["created_at"] for u in updates]
+    assert times == sorted(times)
+    last = updates[-1]
+    assert last["event_type"] == "STATUS_CHANGE"
+    # o horário do app fica no payload; a linha entra depois de tudo que já estava no log
+    assert json.loads(last["payload_json"])["offline_at"] == started_offline.isoformat()
+    assert datetime.fromisoformat(last["created_at"]) > started_offline
+
+
+def test_resent_action_is_duplicate(client, world, new_ticket):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    action = _action(ticket["id"], "comment", message="cheguei na loja")
+
+    first = _sync(client, tech, action)
+    again = _sync(client, tech, action)
+
+    assert first["results"][0]["result"] == "APPLIED"
+    assert again["results"][0]["result"] == "DUPLICATE"
+
+
+def test_rejected_action_skips_the_rest_of_the_ticket(client, world, new_ticket):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+
+    out = _sync(
+        client, tech,
+        _action(ticket["id"], "pend"),  # ATRIBUIDO não pode pendenciar
+        _action(ticket["id"], "start"),
+    )
+
+    assert [r["result"] for r in out["results"]] == ["REJECTED", "SKIPPED"]
+    assert out["results"][0]["status_code"] == 409
+    assert out["tickets"][0]["status"] == "ATRIBUIDO"
+
+
+def test_client_ts_in_the_future_is_clamped_to_now(client, world, new_ticket):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+
+    out = _sync(client, tech, _action(ticket["id"], "start", datetime.utcnow() + timedelta(days=1)))
+
+    applied_at = datetime.fromisoformat(out["results"][0]["applied_at"])
+    assert applied_at <= datetime.utcnow()
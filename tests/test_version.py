@@ -0,0 +1,94 @@
+from sqlalchemy import update
+
+import app.routers.tickets as tickets_router
+from app.database import SessionLocal
+from app.models import Ticket
+
+
+def test_if_match_with_stale_version_is_412_with_current_state(client, admin, new_ticket):
+    ticket = new_ticket(local="sala 1")
+    assert ticket["version"] == 1
+
+    ok = client.patch(f"/tickets/{ticket['id']}", json={"local": "sala 2"}, headers={**admin, "If-Match": '"1"'})
+    stale = client.patch(f"/tickets/{ticket['id']}", json={"local": "sala 3"}, headers={**admin, "If-Match": '"1"'})
+
+    assert ok.status_code == 200 and ok.headers["etag"] == '"2"' and ok.json()["version"] == 2
+    assert stale.status_code == 412
+    assert stale.headers["etag"] == '"2"'
+    assert stale.json()["detail"]["ticket"]["local"] == "sala 2"
+
+
+def test_weak_and_wildcard_if_match_are_accepted(client, admin, new_ticket):
+    ticket = new_ticket()
+
+    weak = client.patch(f"/tickets/{ticket['id']}", json={"local": "a"}, headers={**admin, "If-Match": 'W/"1"'})
+    star = client.patch(f"/tickets/{ticket['id']}", json={"local": "b"}, headers={**admin, "If-Match": "*"})
+    none = client.patch(f"/tickets/{ticket['id']}", json={"local": "c"}, headers=admin)
+
+    assert [r.status_code for r in (weak, star, none)] == [200, 200, 200]
+    assert none.json()["version"] == 4
+
+
+def test_get_sends_the_version_as_etag(client, admin, new_ticket):
+    ticket = new_ticket()
+
+    r = client.get(f"/tickets/{ticket['id']}", headers=admin)
+
+    assert r.headers["etag"] == '"1"'
+
+
+def test_concurrent_commit_between_read_and_write_is_412(client, world, new_ticket, monkeypatch):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    client.post(f"/tickets/{ticket['id']}/start", headers=tech)
+    original = tickets_router.apply_pend
+
+    def racing(db, t, user, **kw):
+        # outro processo grava depois da leitura e antes do UPDATE deste
+        other = SessionLocal()
+        other.execute(update(Ticket).where(Ticket.id == t.id).values(version=Ticket.version + 1, local="outro"))
+        other.commit()
+        other.close()
+        return original(db, t, user, **kw)
+
+    monkeypatch.setattr(tickets_router, "apply_pend", racing)
+    r = client.post(f"/tickets/{ticket['id']}/pend", headers=tech)
+    monkeypatch.undo()
+
+    assert r.status_code == 412
+    current = r.json()["detail"]["ticket"]
+    assert current["local"] == "outro" and current["status"] == "EM_ATENDIMENTO"
+    retry = client.post(f"/tickets/{ticket['id']}/pend", headers={**tech, "If-Match": f'"{current["version"]}"'})
+    assert retry.status_code == 200 and retry.json()["status"] == "PENDENTE"
+
+
+def test_sync_reports_version_conflict_as_rejected_412(client, world, new_ticket, monkeypatch):
+    ticket = new_ticket()
+    tech = world["tech_headers"]
+    client.post(f"/tickets/{ticket['id']}/assign", headers=tech)
+    original = tickets_router.apply_start
+
+    def racing(db, t, user, **kw):
+        other = SessionLocal()
+        other.execute(update(Ticket).where(Ticket.id == t.id).values(version=Ticket.version + 1))
+        other.commit()
+        other.close()
+        return original(db, t, user, **kw)
+
+    monkeypatch.setattr(tickets_router, "apply_start", racing)
+    r = client.post("/tickets/sync", json={"actions": [
+        {"client_action_id": f"start-{ticket['id']}", "ticket_id": ticket["id"], "action": "start"},
+    ]}, headers=tech)
+
+    [result] = r.json()["results"]
+    assert result["result"] == "REJECTED" and result["status_code"] == 412
+
+
+def test_missing_if_match_is_428_when_required(client, admin, new_ticket, monkeypatch):
+    ticket = new_ticket()
+    monkeypatch.setattr(tickets_router, "TICKET_REQUIRE_IF_MATCH", True)
+
+    r = client.patch(f"/tickets/{ticket['id']}", json={"local": "x"}, headers=admin)
+
+    assert r.status_code == 428